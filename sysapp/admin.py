@@ -1,15 +1,46 @@
-from django.contrib import admin
+from django.contrib import admin, messages
 from django.contrib.auth.admin import UserAdmin
 from django.contrib.auth.models import User
+from django.core.exceptions import ValidationError
+from django.db import transaction
+from django.http import HttpResponseRedirect
 from django.utils.html import format_html
 from .models import Sede, Carrera, Materia, Funcionario, AsistenciaFuncionario, Alumno, Pago, CanjeEstrellas, Egreso, \
-    CuentaBancaria, PerfilUsuario
+    CuentaBancaria, PerfilUsuario, ReservaRecibos, SecuenciaRecibo
 from django.contrib.admin import AdminSite
 
 AdminSite.has_permission = lambda self, request: (
     request.user.is_active and request.user.is_superuser
 )
 
+
+class CajaCerradaAdminMixin:
+    """
+    Una eliminación que llega (directa o en cascada) a un pago o egreso de un
+    día con la caja cerrada se rechaza en pre_delete; se informa en lugar de
+    devolver un error 500.
+    """
+
+    def delete_view(self, request, object_id, extra_context=None):
+        try:
+            return super().delete_view(request, object_id, extra_context)
+        except ValidationError as e:
+            self.message_user(request, e.messages[0], messages.ERROR)
+            return HttpResponseRedirect(request.get_full_path())
+
+    def delete_queryset(self, request, queryset):
+        # Acción "eliminar seleccionados": todo o nada
+        with transaction.atomic():
+            super().delete_queryset(request, queryset)
+
+    def changelist_view(self, request, extra_context=None):
+        try:
+            return super().changelist_view(request, extra_context)
+        except ValidationError as e:
+            self.message_user(request, e.messages[0], messages.ERROR)
+            return HttpResponseRedirect(request.get_full_path())
+
+
 @admin.register(CanjeEstrellas)
 class CanjeEstrellasAdmin(admin.ModelAdmin):
     list_display = ['alumno', 'cantidad', 'concepto', 'fecha', 'usuario_registro']
@@ -24,7 +55,7 @@ class CanjeEstrellasAdmin(admin.ModelAdmin):
 
 
 @admin.register(Sede)
-class SedeAdmin(admin.ModelAdmin):
+class SedeAdmin(CajaCerradaAdminMixin, admin.ModelAdmin):
     list_display = ['nombre', 'telefono', 'activa', 'total_alumnos', 'total_funcionarios']
     list_filter = ['activa']
     search_fields = ['nombre', 'direccion']
@@ -39,7 +70,7 @@ class SedeAdmin(admin.ModelAdmin):
 
 
 @admin.register(Carrera)
-class CarreraAdmin(admin.ModelAdmin):
+class CarreraAdmin(CajaCerradaAdminMixin, admin.ModelAdmin):
     list_display = ['nombre', 'naturalidad', 'duracion_meses', 'activa', 'total_materias']
     list_filter = ['naturalidad', 'activa']
     search_fields = ['nombre']
@@ -106,7 +137,7 @@ class AsistenciaFuncionarioAdmin(admin.ModelAdmin):
 
 
 @admin.register(Alumno)
-class AlumnoAdmin(admin.ModelAdmin):
+class AlumnoAdmin(CajaCerradaAdminMixin, admin.ModelAdmin):
     list_display = ['nombre_completo', 'cedula', 'carrera', 'sede', 'curso_actual',
                     'estado_pagos_display', 'total_puntos_display', 'activo']
     list_filter = ['carrera', 'sede', 'activo', 'curso_actual']
@@ -163,7 +194,7 @@ class AlumnoAdmin(admin.ModelAdmin):
 
 
 @admin.register(Pago)
-class PagoAdmin(admin.ModelAdmin):
+class PagoAdmin(CajaCerradaAdminMixin, admin.ModelAdmin):
     list_display = ['numero_recibo', 'alumno_display', 'fecha', 'numero_cuota',
                     'importe_total_display', 'puntos_display', 'metodo_pago', 'es_matricula', 'sede']
     # ✅ Cambiado: 'estrellas' → 'puntos', agregado 'metodo_pago' y 'es_matricula'
@@ -244,7 +275,7 @@ class PagoAdmin(admin.ModelAdmin):
 
 
 @admin.register(Egreso)
-class EgresoAdmin(admin.ModelAdmin):
+class EgresoAdmin(CajaCerradaAdminMixin, admin.ModelAdmin):
     list_display = ['numero_comprobante', 'fecha', 'categoria', 'monto_display', 'sede', 'usuario_registro']
     list_filter = ['fecha', 'categoria', 'sede']
     search_fields = ['numero_comprobante', 'concepto', 'observaciones']
@@ -289,6 +320,22 @@ class CuentaBancariaAdmin(admin.ModelAdmin):
     list_filter  = ['activa']
     search_fields = ['entidad', 'titular']
 
+@admin.register(SecuenciaRecibo)
+class SecuenciaReciboAdmin(admin.ModelAdmin):
+    list_display = ['sede', 'serie', 'prefijo', 'digitos', 'siguiente', 'activa']
+    list_filter  = ['sede', 'activa']
+
+
+@admin.register(ReservaRecibos)
+class ReservaRecibosAdmin(admin.ModelAdmin):
+    list_display    = ['secuencia', 'desde', 'hasta', 'cantidad', 'usuario', 'fecha']
+    list_filter     = ['secuencia__sede']
+    readonly_fields = ['secuencia', 'desde', 'hasta', 'cantidad', 'usuario', 'fecha']
+
+    def has_add_permission(self, request):
+        # Las reservas se hacen desde pagos/recibos/reservar/, que avanza la secuencia
+        return False
+
 @admin.register(PerfilUsuario)
 class PerfilUsuarioAdmin(admin.ModelAdmin):
     list_display  = ['user', 'sede']
@@ -0,0 +1,350 @@
+"""
+Índice de búsqueda en memoria para el autocompletado.
+
+Cada worker mantiene, por modelo, un índice invertido de n-gramas
+(subcadenas de 1 a 3 caracteres) sobre el texto normalizado de los campos
+buscables: sin mayúsculas ni tildes. Una consulta se resuelve intersectando
+las listas de ids de sus n-gramas y verificando la subcadena contra el texto
+guardado, sin tocar la base; a la base solo se le piden las k filas
+resultantes por clave primaria.
+
+La primera búsqueda del worker lanza la carga del índice en un hilo aparte
+y, hasta que termina, las búsquedas van a la base (como las filas viejas, ver
+abajo). Después se mantiene con las señales pre_save/post_save/post_delete
+de los modelos indexados (ver signals.py).
+Solo un cambio del texto buscable cuenta: quien lo hace anota los pks en
+CambioBusqueda y avanza 'busqueda:<índice>' en invalidacion.py; los demás
+workers releen de la base esas filas y nada más. Además se reconstruye
+completo cada BUSQUEDA_INDICE_TTL segundos, en un hilo aparte: mientras
+tanto se sigue respondiendo con el índice anterior.
+
+Memoria: cada fila ocupa unos 3 KB (texto más ~70 n-gramas en conjuntos de
+ids), así que un millón de pagos serían ~3 GB por worker. Por eso cada
+índice guarda solo las BUSQUEDA_INDICE_MAX_FILAS filas más nuevas (por
+defecto 100.000, ~300 MB en el peor caso, el de pagos); si ahí no alcanzan
+los resultados, el resto se busca en la base entre las filas más viejas,
+sobre las claves normalizadas con índice trigram (migración 0025).
+"""
+import heapq
+import threading
+import time
+from datetime import timedelta
+from functools import reduce
+from operator import or_
+
+from django.conf import settings
+from django.db import connections, transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from . import invalidacion
+from .models import Alumno, CambioBusqueda, Carrera, Funcionario, Pago, normalizar_busqueda
+
+LONGITUD_NGRAMA = 3
+
+# Los cambios se releen con este margen hacia atrás: cubre transacciones que
+# confirman fuera de orden y relojes algo distintos entre hosts
+MARGEN_CAMBIOS = timedelta(seconds=60)
+# Pasado este tiempo se purgan; un índice que quedó más atrás se reconstruye
+RETENCION_CAMBIOS = timedelta(hours=1)
+
+
+def _ngramas(texto):
+    """Todas las subcadenas de 1 a LONGITUD_NGRAMA caracteres de cada palabra."""
+    ngramas = set()
+    for palabra in texto.split():
+        for i in range(len(palabra)):
+            for n in range(1, LONGITUD_NGRAMA + 1):
+                if i + n <= len(palabra):
+                    ngramas.add(palabra[i:i + n])
+    return ngramas
+
+
+def _ngramas_consulta(token):
+    if len(token) <= LONGITUD_NGRAMA:
+        return {token}
+    return {token[i:i + LONGITUD_NGRAMA] for i in range(len(token) - LONGITUD_NGRAMA + 1)}
+
+
+class IndiceBusqueda:
+    """Índice invertido de un modelo sobre los `campos` dados (admite lookups como 'alumno__nombre')."""
+
+    def __init__(self, nombre, modelo, campos, campos_base):
+        self.nombre = nombre
+        self.modelo = modelo
+        self.campos = tuple(campos)
+        # Lookups para buscar en la base las filas que quedan fuera del índice
+        self.campos_base = tuple(campos_base)
+        # Campos propios del modelo de los que depende el texto ('alumno__nombre' → 'alumno')
+        self.campos_propios = {campo.split('__', 1)[0] for campo in self.campos}
+        self._textos = {}
+        self._postings = {}
+        self._cargado_en = None
+        self._piso = None  # menor pk indexado si quedaron filas afuera
+        self._cambios_desde = None
+        self._cambios_aplicados = {}
+        self._reconstruyendo = False
+        self._lock = threading.RLock()
+
+    # ── Carga ────────────────────────────────────────────
+
+    def _filas(self, queryset):
+        for pk, *valores in queryset.values_list('pk', *self.campos).iterator(chunk_size=2000):
+            yield pk, normalizar_busqueda(*valores)
+
+    def reconstruir(self):
+        """Arma el índice nuevo sin bloquear las búsquedas y lo reemplaza de una vez."""
+        desde = timezone.now()
+        filas = self.modelo.objects.order_by()
+        maximo = getattr(settings, 'BUSQUEDA_INDICE_MAX_FILAS', 100000)
+        piso = self.modelo.objects.order_by('-pk').values_list('pk', flat=True)[maximo - 1:maximo].first() if maximo else None
+        if piso is not None:
+            filas = filas.filter(pk__gte=piso)
+        textos, postings = {}, {}
+        for pk, texto in self._filas(filas):
+            textos[pk] = texto
+            for ngrama in _ngramas(texto):
+                postings.setdefault(ngrama, set()).add(pk)
+        with self._lock:
+            self._textos, self._postings, self._piso = textos, postings, piso
+            self._cargado_en = time.monotonic()
+            self._cambios_desde, self._cambios_aplicados = desde, {}
+        # Lo que se escribió mientras se leía la tabla
+        self.aplicar_cambios()
+
+    def reconstruir_en_segundo_plano(self):
+        """Lanza reconstruir() en un hilo, salvo que ya haya uno en curso."""
+        with self._lock:
+            if self._reconstruyendo:
+                return
+            self._reconstruyendo = True
+        threading.Thread(target=self._reconstruir_hilo, name=f'indice-{self.nombre}', daemon=True).start()
+
+    def _reconstruir_hilo(self):
+        try:
+            self.reconstruir()
+        finally:
+            with self._lock:
+                self._reconstruyendo = False
+            connections.close_all()
+
+    def _asegurar_cargado(self):
+        """Lanza la carga o la reconstrucción en segundo plano; False si todavía no hay índice."""
+        if not self.cargado:
+            # Primera carga del worker: no se arma dentro de la petición
+            self.reconstruir_en_segundo_plano()
+            return False
+        if time.monotonic() - self._cargado_en >= getattr(settings, 'BUSQUEDA_INDICE_TTL', 300):
+            self.reconstruir_en_segundo_plano()
+        return True
+
+    @property
+    def cargado(self):
+        return self._cargado_en is not None
+
+    def vencer(self):
+        """Descarta el índice; se vuelve a cargar en la próxima búsqueda."""
+        with self._lock:
+            self._textos, self._postings, self._piso = {}, {}, None
+            self._cargado_en = None
+            self._cambios_desde, self._cambios_aplicados = None, {}
+
+    def textos(self, pks):
+        """Texto indexado de `pks`: del índice si está cargado, si no de la base."""
+        if self.cargado:
+            with self._lock:
+                return {pk: self._textos[pk] for pk in pks if pk in self._textos}
+        return dict(self._filas(self.modelo.objects.filter(pk__in=pks)))
+
+    # ── Mantenimiento incremental ────────────────────────
+
+    def _quitar(self, pk):
+        texto = self._textos.pop(pk, None)
+        if texto is None:
+            return
+        for ngrama in _ngramas(texto):
+            ids = self._postings.get(ngrama)
+            if ids is not None:
+                ids.discard(pk)
+                if not ids:
+                    del self._postings[ngrama]
+
+    def _poner(self, pk, texto):
+        self._textos[pk] = texto
+        for ngrama in _ngramas(texto):
+            self._postings.setdefault(ngrama, set()).add(pk)
+
+    def poner(self, textos):
+        """Indexa `textos` ({pk: texto}) si el índice está cargado."""
+        if not self.cargado:
+            return
+        with self._lock:
+            for pk, texto in textos.items():
+                if self._piso is not None and pk < self._piso:
+                    continue  # fuera del índice: se busca en la base
+                if self._textos.get(pk) != texto:
+                    self._quitar(pk)
+                    self._poner(pk, texto)
+
+    def eliminar(self, pk):
+        if not self.cargado:
+            return
+        with self._lock:
+            self._quitar(pk)
+
+    def refrescar(self, pks):
+        """Relee de la base las filas `pks`; las que ya no existen se quitan."""
+        pks = list(pks)
+        for i in range(0, len(pks), 1000):
+            lote = pks[i:i + 1000]
+            textos = dict(self._filas(self.modelo.objects.filter(pk__in=lote)))
+            with self._lock:
+                for pk in set(lote) - textos.keys():
+                    self._quitar(pk)
+            self.poner(textos)
+
+    def aplicar_cambios(self):
+        """Aplica los cambios anotados en CambioBusqueda (por cualquier worker) desde la última vez."""
+        if not self.cargado:
+            return
+        ahora = timezone.now()
+        with self._lock:
+            desde, aplicados = self._cambios_desde, self._cambios_aplicados
+        if desde < ahora - RETENCION_CAMBIOS + MARGEN_CAMBIOS:
+            # Los cambios de ese período ya se purgaron
+            self.reconstruir_en_segundo_plano()
+            return
+        cambios = CambioBusqueda.objects.filter(
+            indice=self.nombre, fecha__gte=desde - MARGEN_CAMBIOS,
+        ).values_list('pk', 'objeto_id', 'fecha')
+        nuevos = [(pk, objeto_id, fecha) for pk, objeto_id, fecha in cambios if pk not in aplicados]
+        self.refrescar({objeto_id for _, objeto_id, _ in nuevos})
+        with self._lock:
+            if self._cambios_aplicados is not aplicados:
+                return  # se reconstruyó mientras tanto
+            # Se recuerdan los ya aplicados solo mientras caen dentro del margen
+            limite = ahora - MARGEN_CAMBIOS
+            self._cambios_aplicados = {pk: fecha for pk, fecha in aplicados.items() if fecha >= limite}
+            self._cambios_aplicados.update((pk, fecha) for pk, _, fecha in nuevos)
+            self._cambios_desde = ahora
+
+    # ── Consulta ─────────────────────────────────────────
+
+    def buscar(self, consulta, limite=10):
+        """Ids (más recientes primero) cuyo texto contiene todas las palabras de `consulta`."""
+        tokens = normalizar_busqueda(consulta).split()
+        if not tokens:
+            return []
+        if not self._asegurar_cargado():
+            return self._buscar_en_base(tokens, None, limite)
+        with self._lock:
+            ids = heapq.nlargest(limite, self._coincidencias(tokens))
+            piso = self._piso
+        if len(ids) < limite and piso is not None:
+            ids += self._buscar_en_base(tokens, piso, limite - len(ids))
+        return ids
+
+    def _coincidencias(self, tokens):
+        listas = []
+        for token in tokens:
+            for ngrama in _ngramas_consulta(token):
+                ids = self._postings.get(ngrama)
+                if not ids:
+                    return []
+                listas.append(ids)
+        listas.sort(key=len)
+        candidatos = set(listas[0])
+        for ids in listas[1:]:
+            candidatos &= ids
+            if not candidatos:
+                return []
+        return [pk for pk in candidatos if all(token in self._textos[pk] for token in tokens)]
+
+    def _buscar_en_base(self, tokens, piso, limite):
+        """Filas anteriores a `piso` (fuera del índice; todas si es None) que contienen todas las palabras."""
+        filtro = Q()
+        for token in tokens:
+            filtro &= reduce(or_, (Q(**{campo: token}) for campo in self.campos_base))
+        if piso is not None:
+            filtro &= Q(pk__lt=piso)
+        return list(self.modelo.objects.filter(filtro).order_by('-pk').values_list('pk', flat=True)[:limite])
+
+
+INDICES = {
+    'alumno': IndiceBusqueda(
+        'alumno', Alumno, ('nombre', 'apellido', 'cedula'),
+        ('busqueda_nombre__contains', 'cedula__icontains'),
+    ),
+    'pago': IndiceBusqueda(
+        'pago', Pago, ('numero_recibo', 'nombre_cliente', 'alumno__nombre', 'alumno__apellido'),
+        ('busqueda_nombre__contains', 'numero_recibo__icontains'),
+    ),
+    'carrera': IndiceBusqueda(
+        'carrera', Carrera, ('nombre', 'descripcion'),
+        ('nombre__icontains', 'descripcion__icontains'),
+    ),
+    'funcionario': IndiceBusqueda(
+        'funcionario', Funcionario, ('nombre', 'apellido', 'cedula'),
+        ('busqueda_nombre__contains', 'cedula__icontains'),
+    ),
+}
+
+
+def buscar_ids(nombre, consulta, limite=10):
+    return INDICES[nombre].buscar(consulta, limite)
+
+
+def filas_por_ids(queryset, ids):
+    """Trae las filas de `ids` en una sola consulta, en el mismo orden que `ids`."""
+    filas = queryset.in_bulk(ids)
+    return [filas[pk] for pk in ids if pk in filas]
+
+
+def afecta_indice(nombre, update_fields):
+    """Si un save() con estos update_fields puede cambiar el texto indexado."""
+    return update_fields is None or bool(INDICES[nombre].campos_propios.intersection(update_fields))
+
+
+def reindexar(nombre, queryset, anteriores=None):
+    """
+    Reindexa las filas de `queryset` y avisa a los demás workers de las que
+    cambiaron de texto. `anteriores` ({pk: texto}, p. ej. leído en pre_save)
+    es el texto previo; si no se da, se toma el del índice cargado y, sin
+    índice, todas cuentan como cambiadas. Devuelve los pks cambiados.
+    """
+    indice = INDICES[nombre]
+    nuevos = dict(indice._filas(queryset))
+    if anteriores is None:
+        anteriores = indice.textos(list(nuevos)) if indice.cargado else {}
+    cambiados = {pk: texto for pk, texto in nuevos.items() if anteriores.get(pk) != texto}
+    indice.poner(cambiados)
+    _avisar(nombre, cambiados)
+    return set(cambiados)
+
+
+def quitar_del_indice(nombre, pk):
+    INDICES[nombre].eliminar(pk)
+    _avisar(nombre, [pk])
+
+
+_purgado_en = None
+
+
+def _avisar(nombre, pks):
+    """Al confirmarse la transacción: anota los pks en CambioBusqueda y avanza el contador del índice."""
+    if not pks:
+        return
+    cambios = [CambioBusqueda(indice=nombre, objeto_id=pk) for pk in pks]
+    transaction.on_commit(lambda: _registrar(cambios))
+    invalidacion.avanzar(f'busqueda:{nombre}')
+
+
+def _registrar(cambios):
+    global _purgado_en
+    CambioBusqueda.objects.bulk_create(cambios, batch_size=1000)
+    if _purgado_en is None or time.monotonic() - _purgado_en > 600:
+        _purgado_en = time.monotonic()
+        CambioBusqueda.objects.filter(fecha__lt=timezone.now() - RETENCION_CAMBIOS).delete()
+
+
+invalidacion.al_cambiar('busqueda:', lambda espacio: INDICES[espacio.split(':', 1)[1]].aplicar_cambios())
@@ -0,0 +1,244 @@
+"""
+Importación de extractos bancarios (CSV) y conciliación contra los pagos por
+depósito.
+
+El archivo se lee línea a línea (no se carga entero) y solo se guardan los
+créditos, de a FILAS_POR_LOTE. Los pagos candidatos de cada lote salen de UNA
+consulta para su rango de fechas y quedan en un índice en memoria por monto;
+cada línea busca ahí el pago del mismo monto con la fecha más cercana dentro
+de ±DIAS_TOLERANCIA días, sin consultas por línea. Los movimientos del lote se
+graban con bulk_create y quedan como CONCILIADO, AMBIGUO o PENDIENTE para
+revisión.
+
+    importar_extracto(cuenta, request.FILES['archivo'], usuario=request.user)
+"""
+import csv
+import hashlib
+import re
+import uuid
+from datetime import datetime, timedelta
+from decimal import Decimal, InvalidOperation
+from itertools import chain, islice
+
+from django.db import IntegrityError, transaction
+from django.db.models import F
+
+from .models import ExtractoBancario, MovimientoBancario, Pago, normalizar_busqueda
+
+DIAS_TOLERANCIA = 3
+FILAS_POR_LOTE = 1000
+
+FORMATOS_FECHA = ('%d/%m/%Y', '%d-%m-%Y', '%Y-%m-%d', '%d/%m/%y', '%d.%m.%Y')
+
+# Columna → prefijos aceptados en el encabezado (normalizado), por prioridad
+COLUMNAS = {
+    'fecha':       ('fecha',),
+    'monto':       ('credito', 'monto', 'importe'),
+    'referencia':  ('referencia', 'comprobante', 'nro', 'numero'),
+    'descripcion': ('descripcion', 'concepto', 'detalle'),
+}
+
+
+def _lineas(archivo, huella):
+    """Texto de cada línea del archivo (bytes en UTF-8 o Windows-1252), actualizando la huella."""
+    for crudo in archivo:
+        huella.update(crudo)
+        try:
+            texto = crudo.decode('utf-8')
+        except UnicodeDecodeError:
+            texto = crudo.decode('cp1252', errors='replace')
+        yield texto.lstrip('\ufeff')
+
+
+def _columnas(encabezado):
+    nombres = [normalizar_busqueda(n) for n in encabezado]
+    posiciones = {}
+    for columna, prefijos in COLUMNAS.items():
+        for prefijo in prefijos:
+            indice = next((i for i, n in enumerate(nombres) if n.startswith(prefijo)), None)
+            if indice is not None:
+                posiciones[columna] = indice
+                break
+    faltantes = [c for c in ('fecha', 'monto') if c not in posiciones]
+    if faltantes:
+        raise ValueError(f'El extracto no tiene columna de {" ni de ".join(faltantes)}.')
+    return posiciones
+
+
+def _fecha(texto):
+    texto = texto.strip()
+    for formato in FORMATOS_FECHA:
+        try:
+            return datetime.strptime(texto, formato).date()
+        except ValueError:
+            continue
+    return None
+
+
+def _monto(texto):
+    """'1.500.000' / '1,500,000.00' / 'Gs. 1500000' → Decimal('1500000'); vacío → None."""
+    texto = re.sub(r'[^\d,.\-]', '', texto).strip(',.')
+    if not texto.strip('-'):
+        return None
+    separadores = [s for s in ',.' if s in texto]
+    if len(separadores) == 2:
+        decimal = ',' if texto.rfind(',') > texto.rfind('.') else '.'
+    elif separadores and len(texto) - texto.rfind(separadores[0]) - 1 != 3:
+        decimal = separadores[0]
+    else:
+        decimal = None
+    miles = ''.join(s for s in ',.' if s != decimal)
+    texto = texto.translate({ord(s): None for s in miles})
+    if decimal:
+        texto = texto.replace(decimal, '.')
+    try:
+        return Decimal(texto).quantize(Decimal('1'))
+    except InvalidOperation:
+        return None
+
+
+def leer_extracto(archivo, huella=None):
+    """
+    Genera (linea, fecha, monto, referencia, descripcion) por cada crédito del
+    CSV. Acepta ';' o ',' como separador; los débitos y las líneas sin monto
+    se omiten. Una fecha ilegible en una línea con monto es un ValueError.
+    """
+    lineas = _lineas(archivo, huella or hashlib.sha256())
+    primera = next(lineas, '')
+    if not primera.strip():
+        raise ValueError('El extracto está vacío.')
+    lector = csv.reader(chain([primera], lineas), delimiter=';' if ';' in primera else ',')
+    posiciones = _columnas(next(lector))
+    maximo = max(posiciones.values())
+
+    for numero, fila in enumerate(lector, start=2):
+        if len(fila) <= maximo:
+            fila = fila + [''] * (maximo + 1 - len(fila))
+        monto = _monto(fila[posiciones['monto']])
+        if monto is None or monto <= 0:
+            continue
+        fecha = _fecha(fila[posiciones['fecha']])
+        if fecha is None:
+            raise ValueError(f'Línea {numero}: fecha inválida "{fila[posiciones["fecha"]]}".')
+        yield (
+            numero, fecha, monto,
+            fila[posiciones['referencia']].strip()[:100] if 'referencia' in posiciones else '',
+            fila[posiciones['descripcion']].strip()[:255] if 'descripcion' in posiciones else '',
+        )
+
+
+def indice_pagos(cuenta, desde, hasta, tolerancia=DIAS_TOLERANCIA):
+    """
+    {monto_deposito: [(fecha, pago_id), ...]} con los pagos por depósito de la
+    cuenta en [desde - tolerancia, hasta + tolerancia] que todavía no están
+    conciliados. Una sola consulta.
+    """
+    pagos = (
+        Pago.objects
+        .filter(
+            cuenta_bancaria=cuenta,
+            metodo_pago__in=['DEPOSITO', 'MIXTO'],
+            monto_deposito__gt=0,
+            fecha__range=(desde - timedelta(days=tolerancia), hasta + timedelta(days=tolerancia)),
+        )
+        .filter(movimientos_bancarios__isnull=True)
+        .order_by('fecha', 'id')
+        .values_list('monto_deposito', 'fecha', 'id')
+    )
+    indice = {}
+    for monto, fecha, pago_id in pagos:
+        indice.setdefault(monto, []).append((fecha, pago_id))
+    return indice
+
+
+def conciliar(fecha, monto, indice, tolerancia=DIAS_TOLERANCIA):
+    """
+    (estado, pago_id, candidatos) para un crédito. El pago elegido se quita
+    del índice; si hay más de uno a la misma distancia queda AMBIGUO.
+    """
+    candidatos = [
+        (abs((fecha_pago - fecha).days), fecha_pago, pago_id)
+        for fecha_pago, pago_id in indice.get(monto, ())
+        if abs((fecha_pago - fecha).days) <= tolerancia
+    ]
+    if not candidatos:
+        return 'PENDIENTE', None, 0
+    candidatos.sort()
+    if len(candidatos) > 1 and candidatos[0][0] == candidatos[1][0]:
+        return 'AMBIGUO', None, len(candidatos)
+    _, fecha_pago, pago_id = candidatos[0]
+    indice[monto].remove((fecha_pago, pago_id))
+    return 'CONCILIADO', pago_id, len(candidatos)
+
+
+def _lotes(iterable, tamano):
+    """Listas de hasta `tamano` elementos de `iterable`, sin leerlo entero."""
+    iterable = iter(iterable)
+    while lote := list(islice(iterable, tamano)):
+        yield lote
+
+
+@transaction.atomic
+def importar_extracto(cuenta, archivo, usuario=None, nombre=None, tolerancia=DIAS_TOLERANCIA):
+    """Importa y concilia un extracto de `cuenta`; devuelve el ExtractoBancario creado."""
+    # La huella se conoce recién al terminar de leer: mientras tanto el extracto
+    # lleva una provisoria y, si resulta repetido, la transacción se deshace.
+    huella = hashlib.sha256()
+    extracto = ExtractoBancario.objects.create(
+        cuenta=cuenta,
+        archivo=(nombre or getattr(archivo, 'name', '') or 'extracto.csv')[:255],
+        huella=f'importando:{uuid.uuid4().hex}',
+        usuario=usuario,
+    )
+
+    for lote in _lotes(leer_extracto(archivo, huella), FILAS_POR_LOTE):
+        desde, hasta = min(l[1] for l in lote), max(l[1] for l in lote)
+        # Los pagos conciliados en lotes anteriores ya tienen movimiento y no vuelven
+        indice = indice_pagos(cuenta, desde, hasta, tolerancia)
+        movimientos = []
+        for numero, fecha, monto, referencia, descripcion in lote:
+            estado, pago_id, candidatos = conciliar(fecha, monto, indice, tolerancia)
+            extracto.cantidad_conciliados += estado == 'CONCILIADO'
+            movimientos.append(MovimientoBancario(
+                extracto=extracto, cuenta=cuenta, linea=numero, fecha=fecha, monto=monto,
+                referencia=referencia, descripcion=descripcion,
+                estado=estado, pago_id=pago_id, candidatos=candidatos,
+            ))
+        MovimientoBancario.objects.bulk_create(movimientos)
+        extracto.cantidad_movimientos += len(lote)
+        extracto.fecha_desde = min(filter(None, (extracto.fecha_desde, desde)))
+        extracto.fecha_hasta = max(filter(None, (extracto.fecha_hasta, hasta)))
+
+    extracto.huella = huella.hexdigest()
+    if ExtractoBancario.objects.filter(cuenta=cuenta, huella=extracto.huella).exists():
+        raise ValueError('Este extracto ya fue importado para la cuenta.')
+    extracto.save(update_fields=['huella', 'fecha_desde', 'fecha_hasta', 'cantidad_movimientos', 'cantidad_conciliados'])
+    return extracto
+
+
+@transaction.atomic
+def conciliar_manual(movimiento, pago, usuario=None):
+    """Asigna `pago` a un movimiento pendiente o ambiguo (revisión del extracto)."""
+    if movimiento.estado == 'CONCILIADO':
+        raise ValueError('El movimiento ya está conciliado.')
+    if pago.cuenta_bancaria_id != movimiento.cuenta_id:
+        raise ValueError('El pago no fue depositado en la cuenta del extracto.')
+    # Como en la conciliación automática, el crédito es la parte depositada del pago
+    if pago.monto_deposito != movimiento.monto:
+        raise ValueError(
+            f'El depósito del recibo {pago.numero_recibo} (Gs. {int(pago.monto_deposito or 0):,}) no coincide '
+            f'con el monto de la línea {movimiento.linea} (Gs. {int(movimiento.monto):,}).'
+        )
+    if MovimientoBancario.objects.filter(pago=pago).exists():
+        raise ValueError('El pago ya está conciliado con otro movimiento.')
+    movimiento.estado = 'CONCILIADO'
+    movimiento.pago = pago
+    movimiento.usuario_concilia = usuario
+    try:
+        # Otra conciliación simultánea pudo tomar el pago después de la verificación
+        with transaction.atomic():
+            movimiento.save(update_fields=['estado', 'pago', 'usuario_concilia'])
+    except IntegrityError:
+        raise ValueError('El pago ya está conciliado con otro movimiento.')
+    ExtractoBancario.objects.filter(pk=movimiento.extracto_id).update(cantidad_conciliados=F('cantidad_conciliados') + 1)
+    return movimiento
@@ -0,0 +1,179 @@
+"""
+Consultas sobre los cubos financieros mensuales (CuboIngresoMensual y
+CuboEgresoMensual).
+
+Una consulta elige dimensiones, medidas y filtros y suma celdas que ya están
+agregadas por mes, sin leer pagos ni egresos: comparar varios años recorre a
+lo sumo sedes × carreras × métodos × meses filas, no los movimientos.
+
+    consultar('ingresos', ['sede', 'anio'], ['importe_total'], metodo_pago='DEPOSITO')
+    pivotar('egresos', 'categoria', 'anio', 'monto', sede=3)
+"""
+from datetime import date
+
+from django.db.models import Sum
+from django.db.models.functions import ExtractMonth, ExtractYear
+
+from .models import Carrera, CuboEgresoMensual, CuboIngresoMensual, Egreso, Pago, Sede, primer_dia_mes
+
+MESES = [
+    'Enero', 'Febrero', 'Marzo', 'Abril', 'Mayo', 'Junio',
+    'Julio', 'Agosto', 'Septiembre', 'Octubre', 'Noviembre', 'Diciembre',
+]
+
+# Dimensión → (campo o expresión para agrupar, lookup para filtrar)
+_TIEMPO = {
+    'anio':         (ExtractYear('mes'), 'mes__year__in'),
+    'mes_del_anio': (ExtractMonth('mes'), 'mes__month__in'),
+    'mes':          ('mes', 'mes__in'),
+}
+
+NOMBRES_DIMENSION = {
+    'sede': 'Sede',
+    'carrera': 'Carrera',
+    'metodo_pago': 'Método de pago',
+    'categoria': 'Categoría',
+    'anio': 'Año',
+    'mes_del_anio': 'Mes',
+    'mes': 'Mes y año',
+}
+
+
+class Cubo:
+
+    def __init__(self, modelo, titulo, dimensiones, medidas):
+        self.modelo = modelo
+        self.titulo = titulo
+        self.dimensiones = dimensiones
+        self.medidas = medidas
+
+
+CUBOS = {
+    'ingresos': Cubo(
+        CuboIngresoMensual, 'Ingresos',
+        dimensiones={
+            'sede':        ('sede_id', 'sede_id__in'),
+            'carrera':     ('carrera_id', 'carrera_id__in'),
+            'metodo_pago': ('metodo_pago', 'metodo_pago__in'),
+            **_TIEMPO,
+        },
+        medidas={
+            'importe_total': 'Importe total',
+            'monto_efectivo': 'Efectivo',
+            'monto_deposito': 'Depósito',
+            'cantidad': 'Cantidad de pagos',
+        },
+    ),
+    'egresos': Cubo(
+        CuboEgresoMensual, 'Egresos',
+        dimensiones={
+            'sede':      ('sede_id', 'sede_id__in'),
+            'categoria': ('categoria', 'categoria__in'),
+            **_TIEMPO,
+        },
+        medidas={
+            'monto': 'Monto',
+            'cantidad': 'Cantidad de egresos',
+        },
+    ),
+}
+
+
+def _lista(valor):
+    return list(valor) if isinstance(valor, (list, tuple, set)) else [valor]
+
+
+def consultar(cubo, dimensiones=(), medidas=None, **filtros):
+    """
+    Suma `medidas` (por defecto, todas) agrupando por `dimensiones`.
+    Filtros: cualquier dimensión (un valor o una lista) y desde / hasta
+    (fechas; se toma el mes completo). Devuelve dicts ordenados por las
+    dimensiones, p. ej. {'sede': 1, 'anio': 2025, 'importe_total': ...}.
+    """
+    cubo = CUBOS[cubo]
+    medidas = list(medidas or cubo.medidas)
+    desconocidas = [n for n in [*dimensiones, *filtros] if n not in cubo.dimensiones and n not in ('desde', 'hasta')]
+    desconocidas += [m for m in medidas if m not in cubo.medidas]
+    if desconocidas:
+        raise ValueError(f'Dimensiones, medidas o filtros desconocidos para {cubo.titulo}: {", ".join(desconocidas)}')
+
+    celdas = cubo.modelo.objects.order_by()
+    for nombre, valor in filtros.items():
+        if valor is None or valor == '' or valor == []:
+            continue
+        if nombre == 'desde':
+            celdas = celdas.filter(mes__gte=primer_dia_mes(valor))
+        elif nombre == 'hasta':
+            celdas = celdas.filter(mes__lte=valor)
+        else:
+            celdas = celdas.filter(**{cubo.dimensiones[nombre][1]: _lista(valor)})
+
+    campos, expresiones, alias = [], {}, {}
+    for nombre in dimensiones:
+        agrupar = cubo.dimensiones[nombre][0]
+        if isinstance(agrupar, str):
+            campos.append(agrupar)
+            alias[agrupar] = nombre
+        else:
+            expresiones[nombre] = agrupar
+
+    filas = (
+        celdas.values(*campos, **expresiones)
+              .annotate(**{medida: Sum(medida) for medida in medidas})
+              .order_by(*campos, *expresiones)
+    )
+    return [
+        {alias.get(clave, clave): (valor or 0) if clave in medidas else valor for clave, valor in fila.items()}
+        for fila in filas
+    ]
+
+
+def etiquetas(dimension, valores):
+    """{valor: texto} para mostrar los valores de una dimensión."""
+    valores = set(valores)
+    if dimension == 'sede':
+        nombres = dict(Sede.objects.filter(pk__in=valores).values_list('pk', 'nombre'))
+    elif dimension == 'carrera':
+        nombres = dict(Carrera.objects.filter(pk__in=valores - {None}).values_list('pk', 'nombre'))
+        nombres[None] = 'Sin carrera'
+    elif dimension == 'metodo_pago':
+        nombres = dict(Pago.METODO_PAGO_CHOICES)
+    elif dimension == 'categoria':
+        nombres = dict(Egreso.CATEGORIA_CHOICES)
+    elif dimension == 'mes_del_anio':
+        nombres = {numero: MESES[numero - 1] for numero in valores if numero}
+    elif dimension == 'mes':
+        nombres = {mes: f'{MESES[mes.month - 1]} {mes.year}' for mes in valores if isinstance(mes, date)}
+    else:
+        nombres = {}
+    return {valor: nombres.get(valor, str(valor)) for valor in valores}
+
+
+def pivotar(cubo, filas, columnas, medida, **filtros):
+    """
+    Tabla dinámica de `medida`: `filas` × `columnas` (o una sola columna de
+    totales si `columnas` es None), con totales por fila y por columna.
+    """
+    dimensiones = [filas] if columnas is None else [filas, columnas]
+    celdas = consultar(cubo, dimensiones, [medida], **filtros)
+
+    claves_filas = list(dict.fromkeys(c[filas] for c in celdas))
+    claves_columnas = list(dict.fromkeys(c[columnas] for c in celdas)) if columnas else [None]
+    valores = {(c[filas], c[columnas] if columnas else None): c[medida] for c in celdas}
+
+    nombres_filas = etiquetas(filas, claves_filas)
+    nombres_columnas = etiquetas(columnas, claves_columnas) if columnas else {None: 'Total'}
+    claves_columnas.sort(key=lambda v: (v is None, v if columnas in _TIEMPO else nombres_columnas[v]))
+
+    tabla = []
+    for fila in sorted(claves_filas, key=lambda v: (v is None, v if filas in _TIEMPO else nombres_filas[v])):
+        montos = [valores.get((fila, columna), 0) for columna in claves_columnas]
+        tabla.append({'etiqueta': nombres_filas[fila], 'valores': montos, 'total': sum(montos)})
+
+    totales = [sum(f['valores'][i] for f in tabla) for i in range(len(claves_columnas))]
+    return {
+        'columnas': [nombres_columnas[c] for c in claves_columnas],
+        'filas': tabla,
+        'totales': totales,
+        'total': sum(totales),
+    }
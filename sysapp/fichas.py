@@ -0,0 +1,154 @@
+"""
+Armado de fichas díptico de alumnos, individuales o por lote.
+
+Para el lote (toda una sede, carrera o curso) los alumnos se recorren en
+bloques: por cada bloque se hace una sola consulta de pagos y se reparte en
+memoria, de modo que la cantidad de consultas no crece con la de alumnos.
+Cada ficha se renderiza y se entrega apenas está lista (generador), sin
+armar el documento completo en memoria.
+"""
+from bisect import bisect_left
+from datetime import timedelta
+from itertools import groupby
+
+from dateutil.relativedelta import relativedelta
+from django.template.loader import get_template
+from django.utils import timezone
+
+from .models import Alumno, Pago
+
+TEMPLATE_DIPTICO = 'alumnos/fichaDiptico.html'
+TEMPLATE_LOTE = 'alumnos/fichasLote.html'
+MARCA_FICHAS = '<!-- FICHAS -->'
+FICHAS_POR_BLOQUE = 100
+
+
+def numeros_cuota(numero_cuota):
+    """'3,4,5' → {3, 4, 5}. Ignora partes que no sean números."""
+    if not numero_cuota:
+        return set()
+    return {int(p) for p in str(numero_cuota).split(',') if p.strip().isdigit()}
+
+
+def cuotas_ficha(fecha_inicio, pagos):
+    """
+    Arma las 12 cuotas de la ficha a partir de fecha_inicio y las cruza en
+    memoria con `pagos` (cuotas no matrícula con fecha_vencimiento, ordenadas
+    por fecha_vencimiento). Un pago corresponde a la cuota si su vencimiento
+    cae a ±15 días del vencimiento teórico; si no, se busca por número exacto
+    de cuota ("3,4,5" cubre las cuotas 3, 4 y 5).
+    """
+    vencimientos_pagos = [p.fecha_vencimiento for p in pagos]
+    por_numero = {}
+    for p in pagos:
+        for n in numeros_cuota(p.numero_cuota):
+            por_numero.setdefault(n, p)
+
+    cuotas = []
+    for i in range(1, 13):
+        vencimiento = fecha_inicio + relativedelta(months=i)
+
+        rango_2_desde = vencimiento - timedelta(days=29)
+        rango_2_hasta = vencimiento - timedelta(days=3)
+        rango_1_desde = vencimiento - timedelta(days=2)
+        rango_1_hasta = vencimiento + timedelta(days=5)
+
+        ventana_desde = vencimiento - timedelta(days=15)
+        ventana_hasta = vencimiento + timedelta(days=15)
+
+        # Primer pago con vencimiento dentro de la ventana (búsqueda binaria)
+        pago_cuota = None
+        idx = bisect_left(vencimientos_pagos, ventana_desde)
+        if idx < len(pagos) and vencimientos_pagos[idx] <= ventana_hasta:
+            pago_cuota = pagos[idx]
+
+        if not pago_cuota:
+            pago_cuota = por_numero.get(i)
+
+        cuotas.append({
+            'numero':        i,
+            'vencimiento':   vencimiento,
+            'pago':          pago_cuota,
+            'recibo':        pago_cuota.numero_recibo if pago_cuota else None,
+            'fecha_pago':    pago_cuota.fecha         if pago_cuota else None,
+            'puntaje':       pago_cuota.puntos        if pago_cuota else None,
+            'rango_2_desde': rango_2_desde,
+            'rango_2_hasta': rango_2_hasta,
+            'rango_1_desde': rango_1_desde,
+            'rango_1_hasta': rango_1_hasta,
+        })
+    return cuotas
+
+
+def pagos_ficha(alumno_ids):
+    """Cuotas (no matrícula, con vencimiento) de varios alumnos, en orden para cuotas_ficha."""
+    return (
+        Pago.objects.filter(alumno_id__in=alumno_ids, es_matricula=False, fecha_vencimiento__isnull=False)
+        .only('id', 'alumno_id', 'numero_recibo', 'numero_cuota', 'fecha', 'fecha_vencimiento', 'puntos')
+        .order_by('alumno_id', 'fecha_vencimiento', 'id')
+    )
+
+
+def contexto_ficha(alumno, pagos):
+    """Contexto que espera fichaDiptico.html para un alumno y sus cuotas pagadas."""
+    cuotas = cuotas_ficha(alumno.fecha_inicio, pagos) if alumno.fecha_inicio else []
+    anio = alumno.fecha_inicio.year if alumno.fecha_inicio else timezone.now().year
+    return {
+        'alumno':         alumno,
+        'cuotas':         cuotas,
+        'cuotas_izq':     cuotas[:6],
+        'cuotas_der':     cuotas[6:],
+        'anio':           anio,
+        'anio_siguiente': anio + 1,
+        'tiene_inicio':   bool(alumno.fecha_inicio),
+    }
+
+
+def alumnos_lote(sede_id=None, carrera_id=None, curso=None):
+    """Alumnos activos a incluir en un lote de fichas, en orden alfabético."""
+    alumnos = Alumno.objects.filter(activo=True).select_related('sede', 'carrera')
+    if sede_id:
+        alumnos = alumnos.filter(sede_id=sede_id)
+    if carrera_id:
+        alumnos = alumnos.filter(carrera_id=carrera_id)
+    if curso:
+        alumnos = alumnos.filter(curso_actual=curso)
+    return alumnos.order_by('apellido', 'nombre', 'id')
+
+
+def generar_fichas(alumnos, por_bloque=FICHAS_POR_BLOQUE):
+    """
+    Genera el HTML de cada díptico de `alumnos`. Por bloque de alumnos se
+    hace una única consulta de pagos; ninguna consulta depende de un alumno.
+    """
+    template = get_template(TEMPLATE_DIPTICO)
+    bloque = []
+    for alumno in alumnos.iterator(chunk_size=por_bloque):
+        bloque.append(alumno)
+        if len(bloque) >= por_bloque:
+            yield from _renderizar_bloque(template, bloque)
+            bloque = []
+    if bloque:
+        yield from _renderizar_bloque(template, bloque)
+
+
+def _renderizar_bloque(template, alumnos):
+    ids_con_inicio = [a.id for a in alumnos if a.fecha_inicio]
+    pagos_por_alumno = {}
+    if ids_con_inicio:
+        for alumno_id, pagos in groupby(pagos_ficha(ids_con_inicio), key=lambda p: p.alumno_id):
+            pagos_por_alumno[alumno_id] = list(pagos)
+    for alumno in alumnos:
+        yield template.render(contexto_ficha(alumno, pagos_por_alumno.get(alumno.id, [])))
+
+
+def documento_lote(alumnos, titulo='Fichas de alumnos'):
+    """
+    Documento imprimible completo como generador de fragmentos: cabecera,
+    un díptico por alumno y cierre. Apto para StreamingHttpResponse o archivo.
+    """
+    documento = get_template(TEMPLATE_LOTE).render({'titulo': titulo})
+    cabecera, _, cierre = documento.partition(MARCA_FICHAS)
+    yield cabecera
+    yield from generar_fichas(alumnos)
+    yield cierre
@@ -1,10 +1,13 @@
 from django import forms
 from django.contrib.auth.models import User
+from django.core.exceptions import ValidationError
+from django.urls import reverse_lazy
 
 from .models import (
     Pago, Alumno, Funcionario, AsistenciaFuncionario,
-    Sede, Carrera, Materia, Egreso, CuentaBancaria,
+    Sede, Carrera, Materia, Egreso, CuentaBancaria, CierreCaja, solo_digitos, verificar_caja_abierta,
 )
+from . import referencias
 
 
 class UsuarioForm(forms.ModelForm):
@@ -42,6 +45,7 @@ class UsuarioForm(forms.ModelForm):
         from .models import Sede
         from django.contrib.auth.models import Group
         self.fields['sede'].queryset = Sede.objects.filter(activa=True).order_by('nombre')
+        referencias.opciones(self.fields['sede'], referencias.sedes(activas=True))
         self.fields['roles'].queryset = Group.objects.all().order_by('name')
 
         if not self.instance.pk:
@@ -117,6 +121,39 @@ class PerfilForm(forms.ModelForm):
             'email':      forms.EmailInput(attrs={'class': 'form-control'}),
         }
 
+def validar_caja_abierta(instance, sede, fecha):
+    """Error de formulario si el movimiento (nuevo o el original, al editar) cae en un día con la caja cerrada."""
+    try:
+        if instance.pk:
+            verificar_caja_abierta(instance.sede_id, instance.fecha)
+        verificar_caja_abierta(sede.pk if sede else None, fecha)
+    except ValidationError as e:
+        raise forms.ValidationError(e.messages)
+
+
+class SelectAjax(forms.Select):
+    """
+    <select> de un ModelChoiceField que solo renderiza la opción elegida;
+    las demás se buscan con el autocompletado indicado en `data-url`.
+    """
+
+    def optgroups(self, name, value, attrs=None):
+        todas = self.choices
+        elegidos = [v for v in value if v not in (None, '')]
+        opciones = [('', todas.field.empty_label or '')]
+        if elegidos:
+            campo = todas.field.to_field_name or 'pk'
+            try:
+                opciones += [todas.choice(obj) for obj in todas.queryset.filter(**{f'{campo}__in': elegidos})]
+            except (ValueError, TypeError, ValidationError):
+                pass
+        self.choices = opciones
+        try:
+            return super().optgroups(name, value, attrs)
+        finally:
+            self.choices = todas
+
+
 #  PAGO FORM
 class PagoForm(forms.ModelForm):
     es_matricula = forms.BooleanField(
@@ -175,7 +212,7 @@ class PagoForm(forms.ModelForm):
         widgets = {
             'numero_recibo':    forms.TextInput(attrs={'class': 'form-control', 'placeholder': 'Opcional'}),
             'fecha':            forms.DateInput(attrs={'class': 'form-control', 'type': 'date'}),
-            'alumno':           forms.Select(attrs={'class': 'form-select'}),
+            'alumno':           SelectAjax(attrs={'class': 'form-select', 'data-url': reverse_lazy('buscar_alumno')}),
             'sede':             forms.Select(attrs={'class': 'form-select', 'required': True}),
             'carrera':          forms.Select(attrs={'class': 'form-select', 'id': 'id_carrera'}),
             'numero_cuota':     forms.TextInput(attrs={'class': 'form-control', 'placeholder': 'Opcional. Ej: 3,4,5'}),
@@ -189,9 +226,12 @@ class PagoForm(forms.ModelForm):
 
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
-        self.fields['alumno'].queryset  = Alumno.objects.all().order_by('apellido', 'nombre')
+        self.fields['alumno'].queryset  = Alumno.objects.select_related('carrera')
+        self.fields['alumno'].label_from_instance = lambda a: f"{a.nombre_completo} ({a.cedula})" if a.cedula else a.nombre_completo
         self.fields['sede'].queryset    = Sede.objects.all().order_by('nombre')
         self.fields['carrera'].queryset = Carrera.objects.filter(activa=True).order_by('nombre')
+        referencias.opciones(self.fields['sede'], referencias.sedes())
+        referencias.opciones(self.fields['carrera'], referencias.carreras(activas=True))
         for f in ['numero_recibo', 'alumno', 'carrera', 'observaciones', 'foto_comprobante', 'puntos', 'carrera_otro', 'monto_efectivo', 'monto_deposito', 'cuenta_bancaria']:
             self.fields[f].required = False
         if self.instance.pk:
@@ -267,6 +307,7 @@ class PagoForm(forms.ModelForm):
                     f'debe coincidir con el importe total ({importe_total}).'
                 )
 
+        validar_caja_abierta(self.instance, cleaned_data.get('sede'), cleaned_data.get('fecha'))
         return cleaned_data
 
     def clean_importe_total(self):
@@ -291,6 +332,155 @@ class PagoForm(forms.ModelForm):
             numeros.append(parte)
         return ','.join(numeros)
 
+#  CARGA DE PAGOS EN LOTE
+class FilaPagoLoteForm(forms.Form):
+    """
+    Una fila de la carga en lote. Alumno (por cédula), carrera y cuenta son
+    campos simples: se resuelven todos juntos en PagoLoteFormSet.clean() con
+    una consulta por tabla, no una por fila.
+    """
+    numero_recibo = forms.CharField(required=False, max_length=50)
+    fecha = forms.DateField(required=False, widget=forms.DateInput(attrs={'type': 'date'}))
+    cedula = forms.CharField(required=False, max_length=20)
+    nombre_cliente = forms.CharField(required=False, max_length=200)
+    carrera = forms.IntegerField(required=False)
+    es_matricula = forms.BooleanField(required=False)
+    numero_cuota = forms.CharField(required=False, max_length=50)
+    fecha_vencimiento = forms.DateField(required=False, widget=forms.DateInput(attrs={'type': 'date'}))
+    concepto = forms.CharField(required=False)
+    importe_total = forms.DecimalField(required=False, max_digits=10, decimal_places=0, min_value=1)
+    metodo_pago = forms.ChoiceField(choices=Pago.METODO_PAGO_CHOICES, initial='EFECTIVO')
+    monto_efectivo = forms.DecimalField(required=False, max_digits=10, decimal_places=0, min_value=0)
+    monto_deposito = forms.DecimalField(required=False, max_digits=10, decimal_places=0, min_value=0)
+    cuenta_bancaria = forms.IntegerField(required=False)
+
+    clean_numero_cuota = PagoForm.clean_numero_cuota
+
+
+class BasePagoLoteFormSet(forms.BaseFormSet):
+    """
+    Valida las filas con las mismas reglas que PagoForm y deja en `self.pagos`
+    los Pago sin guardar (con puntos y multa ya calculados), listos para
+    bulk_create. Requiere `sede` y `fecha` (valores por defecto del lote).
+    """
+
+    def __init__(self, *args, sede=None, fecha=None, usuario=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.sede = sede
+        self.fecha = fecha
+        self.usuario = usuario
+        self.pagos = []
+
+    def clean(self):
+        if self.sede is None:
+            raise forms.ValidationError('Seleccione la sede del lote.')
+        if any(self.errors):
+            return
+        filas = [f for f in self.forms if f.has_changed()]
+        if not filas:
+            raise forms.ValidationError('Cargue al menos un pago.')
+        datos = [f.cleaned_data for f in filas]
+
+        # Una consulta por tabla para todo el lote
+        cedulas = {solo_digitos(d['cedula']) for d in datos if d['cedula']} - {''}
+        alumnos = {}
+        for alumno in Alumno.objects.filter(cedula_digitos__in=cedulas).select_related('carrera'):
+            alumnos.setdefault(alumno.cedula_digitos, []).append(alumno)
+        carreras = Carrera.objects.in_bulk({d['carrera'] for d in datos if d['carrera']})
+        cuentas = CuentaBancaria.objects.filter(activa=True).in_bulk({d['cuenta_bancaria'] for d in datos if d['cuenta_bancaria']})
+        recibos = [d['numero_recibo'].strip() for d in datos if d['numero_recibo'].strip()]
+        usados = set(Pago.objects.filter(numero_recibo__in=recibos).values_list('numero_recibo', flat=True))
+        cerrados = list(CierreCaja.objects.puntos_de_control().filter(sede=self.sede).values_list('fecha_desde', 'fecha_hasta'))
+
+        vistos = set()
+        for form, d in zip(filas, datos):
+            pago = self._pago(form, d, alumnos, carreras, cuentas)
+            if any(desde <= pago.fecha <= hasta for desde, hasta in cerrados):
+                form.add_error(None, f'La caja del {pago.fecha:%d/%m/%Y} ya está cerrada para esta sede.')
+            if pago.numero_recibo:
+                if pago.numero_recibo in usados:
+                    form.add_error('numero_recibo', f'El recibo {pago.numero_recibo} ya está registrado.')
+                elif pago.numero_recibo in vistos:
+                    form.add_error('numero_recibo', f'El recibo {pago.numero_recibo} está repetido en el lote.')
+                vistos.add(pago.numero_recibo)
+            if not form.errors:
+                pago.aplicar_puntos_y_multa()
+                self.pagos.append(pago)
+        if any(self.errors):
+            self.pagos = []
+
+    def _pago(self, form, d, alumnos, carreras, cuentas):
+        pago = Pago(
+            sede=self.sede,
+            fecha=d['fecha'] or self.fecha,
+            numero_recibo=d['numero_recibo'].strip() or None,
+            es_matricula=d['es_matricula'],
+            metodo_pago=d['metodo_pago'],
+            concepto=d['concepto'].strip(),
+            usuario_registro=self.usuario,
+        )
+
+        alumno = None
+        if d['nombre_cliente'].strip():
+            pago.nombre_cliente = d['nombre_cliente'].strip()
+        elif d['cedula']:
+            encontrados = alumnos.get(solo_digitos(d['cedula']), [])
+            if len(encontrados) > 1:
+                encontrados = [a for a in encontrados if a.sede_id == self.sede.pk] or encontrados
+            if not encontrados:
+                form.add_error('cedula', 'No hay un alumno con esa cédula.')
+            elif len(encontrados) > 1:
+                form.add_error('cedula', 'Hay varios alumnos con esa cédula; use el formulario individual.')
+            else:
+                alumno = encontrados[0]
+        else:
+            form.add_error('cedula', 'Ingrese la cédula del alumno o el nombre del cliente.')
+        pago.alumno = alumno
+
+        carrera = carreras.get(d['carrera']) if d['carrera'] else None
+        if d['carrera'] and carrera is None:
+            form.add_error('carrera', 'Carrera inexistente.')
+        pago.carrera = carrera or (alumno.carrera if alumno else None)
+
+        if pago.es_matricula:
+            pago.monto_unitario = pago.carrera.monto_matricula if pago.carrera else None
+            pago.fecha_vencimiento = None
+            pago.numero_cuota = None
+        else:
+            pago.monto_unitario = pago.carrera.monto_mensualidad if pago.carrera else None
+            pago.fecha_vencimiento = d['fecha_vencimiento']
+            pago.numero_cuota = d['numero_cuota']
+        pago.cantidad_cuotas = 1
+        pago.importe_total = d['importe_total'] or pago.monto_unitario or None
+        if not pago.importe_total:
+            form.add_error('importe_total', 'Ingrese el importe.')
+            return pago
+        if not pago.concepto:
+            pago.concepto = ('Matrícula' if pago.es_matricula else 'Cuota') + (f' - {pago.carrera.nombre}' if pago.carrera else '')
+
+        if pago.metodo_pago == 'EFECTIVO':
+            pago.monto_efectivo, pago.monto_deposito = pago.importe_total, 0
+        elif pago.metodo_pago == 'DEPOSITO':
+            pago.monto_efectivo, pago.monto_deposito = 0, pago.importe_total
+        else:
+            pago.monto_efectivo = d['monto_efectivo'] or 0
+            pago.monto_deposito = d['monto_deposito'] or 0
+            if pago.monto_efectivo + pago.monto_deposito != pago.importe_total:
+                form.add_error(None, f'La suma de efectivo ({pago.monto_efectivo}) y depósito ({pago.monto_deposito}) '
+                                     f'debe coincidir con el importe total ({pago.importe_total}).')
+
+        if pago.metodo_pago in ('DEPOSITO', 'MIXTO') and d['cuenta_bancaria']:
+            pago.cuenta_bancaria = cuentas.get(d['cuenta_bancaria'])
+            if pago.cuenta_bancaria is None:
+                form.add_error('cuenta_bancaria', 'Cuenta bancaria inexistente o inactiva.')
+
+        pago.busqueda_nombre = pago.clave_busqueda(alumno.nombre_completo if alumno else '')
+        return pago
+
+
+PagoLoteFormSet = forms.formset_factory(FilaPagoLoteForm, formset=BasePagoLoteFormSet, extra=10, max_num=200, validate_max=True)
+
+
 #  EGRESO FORM
 class EgresoForm(forms.ModelForm):
 
@@ -340,6 +530,7 @@ class EgresoForm(forms.ModelForm):
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
         self.fields['sede'].queryset           = Sede.objects.all().order_by('nombre')
+        referencias.opciones(self.fields['sede'], referencias.sedes())
         self.fields['funcionario'].queryset    = Funcionario.objects.filter(activo=True).order_by('apellido', 'nombre')
         self.fields['numero_comprobante'].required = False
         self.fields['observaciones'].required  = False
@@ -355,6 +546,7 @@ class EgresoForm(forms.ModelForm):
         # Si no es SUELDOS, limpiar el funcionario para no guardarlo
         if categoria != 'SUELDOS':
             cleaned_data['funcionario'] = None
+        validar_caja_abierta(self.instance, cleaned_data.get('sede'), cleaned_data.get('fecha'))
         return cleaned_data
 
 #  ASISTENCIA FORM
@@ -428,6 +620,8 @@ class AlumnoForm(forms.ModelForm):
 
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
+        referencias.opciones(self.fields['sede'], referencias.sedes())
+        referencias.opciones(self.fields['carrera'], referencias.carreras())
         for f in ['cedula', 'fecha_nacimiento', 'telefono', 'fecha_inicio', 'curso_actual',
                   'contacto_emergencia_nombre', 'contacto_emergencia_telefono',
                   'contacto_emergencia_relacion', 'activo']:
@@ -502,6 +696,7 @@ class MateriaForm(forms.ModelForm):
         super().__init__(*args, **kwargs)
         self.fields['docente'].queryset   = Funcionario.objects.filter(cargo='DOCENCIA', activo=True)
         self.fields['docente'].empty_label = "Sin asignar"
+        referencias.opciones(self.fields['docente'], referencias.docentes())
         self.fields['fecha_examen_parcial'].required = False
         self.fields['fecha_examen_final'].required   = False
 
@@ -540,4 +735,5 @@ class FichaAlumnoDatosForm(forms.ModelForm):
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
         self.fields['carrera'].queryset = Carrera.objects.filter(activa=True).order_by('nombre')
+        referencias.opciones(self.fields['carrera'], referencias.carreras(activas=True))
         self.fields['curso_actual'].required = False
\ No newline at end of file
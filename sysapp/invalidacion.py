@@ -0,0 +1,89 @@
+"""
+Invalidación de cachés entre workers (y hosts) sin un broker de mensajes.
+
+Cada espacio de caché ('referencias:carreras', 'notificaciones',
+'busqueda:alumno', ...) tiene un contador en ContadorInvalidacion. Quien
+escribe llama a avanzar(espacio) y el contador sube al confirmarse la
+transacción. Cada worker guarda una copia de todos los contadores y la
+refresca con una sola consulta, como mucho cada INVALIDACION_INTERVALO
+segundos, al empezar cada request (InvalidacionMiddleware).
+
+Hay dos formas de usarlo:
+- poner version(espacio) en la clave de caché: al subir el contador, las
+  entradas viejas dejan de leerse en todos los workers, sea la caché
+  compartida o local (LocMemCache);
+- registrar al_cambiar(prefijo, funcion) para poner al día o descartar
+  estado propio del worker (p. ej. el índice de busqueda.py) cuando otro
+  worker escribe.
+"""
+import threading
+import time
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F
+
+from .models import ContadorInvalidacion
+
+_lock = threading.Lock()
+_versiones = {}
+_sincronizado_en = None
+_suscriptores = []
+
+
+def al_cambiar(prefijo, funcion):
+    """Llama a `funcion(espacio)` cuando otro worker avanza un espacio que empieza con `prefijo`."""
+    _suscriptores.append((prefijo, funcion))
+
+
+def sincronizar(forzar=False):
+    """Relee los contadores si pasó el intervalo; avisa a los suscriptores de los que cambiaron."""
+    global _versiones, _sincronizado_en
+    intervalo = getattr(settings, 'INVALIDACION_INTERVALO', 1)
+    with _lock:
+        if not forzar and _sincronizado_en is not None and time.monotonic() - _sincronizado_en < intervalo:
+            return
+        nuevas = dict(ContadorInvalidacion.objects.values_list('espacio', 'version'))
+        cambiados = [] if _sincronizado_en is None else [
+            espacio for espacio, version in nuevas.items() if _versiones.get(espacio) != version
+        ]
+        _versiones, _sincronizado_en = nuevas, time.monotonic()
+    for espacio in cambiados:
+        for prefijo, funcion in _suscriptores:
+            if espacio.startswith(prefijo):
+                funcion(espacio)
+
+
+def version(espacio):
+    """Versión vigente de `espacio` según la última sincronización de este worker."""
+    if _sincronizado_en is None:
+        sincronizar()
+    return _versiones.get(espacio, 0)
+
+
+def _incrementar(espacio):
+    if not ContadorInvalidacion.objects.filter(espacio=espacio).update(version=F('version') + 1):
+        contador, creado = ContadorInvalidacion.objects.get_or_create(espacio=espacio, defaults={'version': 1})
+        if not creado:
+            ContadorInvalidacion.objects.filter(pk=contador.pk).update(version=F('version') + 1)
+    nueva = ContadorInvalidacion.objects.filter(espacio=espacio).values_list('version', flat=True).get()
+    # Este worker ya aplicó su propio cambio: no se avisa a sí mismo. Si en el
+    # medio otro worker también avanzó el espacio, la copia queda como estaba
+    # para que sincronizar() detecte ese cambio y avise a los suscriptores.
+    with _lock:
+        if _versiones.get(espacio, 0) == nueva - 1:
+            _versiones[espacio] = nueva
+
+
+def avanzar(espacio):
+    """Invalida `espacio` en todos los workers cuando se confirme la transacción en curso."""
+    transaction.on_commit(lambda: _incrementar(espacio))
+
+
+class InvalidacionMiddleware:
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        sincronizar()
+        return self.get_response(request)
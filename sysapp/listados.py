@@ -0,0 +1,79 @@
+"""
+Listados JSON de pagos y egresos paginados por keyset sobre (fecha, id).
+
+Cada página trae como máximo `limite` filas y un cursor opaco para pedir la
+siguiente (?despues=...) o la anterior (?antes=...); no se cuentan filas ni se
+calculan totales, así que la página N cuesta lo mismo que la primera.
+?campos=fecha,importe_total limita los campos devueltos y ?html=1 agrega las
+filas renderizadas con la plantilla de la tabla (scroll infinito).
+"""
+from django.http import JsonResponse
+from django.template.loader import get_template
+
+from .paginacion import paginar_keyset
+
+POR_PAGINA = 50
+POR_PAGINA_MAXIMO = 200
+
+
+def _importe(valor):
+    return int(valor) if valor is not None else None
+
+
+CAMPOS_PAGO = {
+    'uuid':           lambda p: str(p.uuid),
+    'fecha':          lambda p: p.fecha.isoformat(),
+    'numero_recibo':  lambda p: p.numero_recibo,
+    'sede':           lambda p: p.sede.nombre,
+    'alumno':         lambda p: p.alumno.nombre_completo if p.alumno else None,
+    'cliente':        lambda p: p.nombre_pagador,
+    'carrera':        lambda p: p.carrera.nombre if p.carrera else None,
+    'concepto':       lambda p: p.concepto,
+    'numero_cuota':   lambda p: p.numero_cuota,
+    'metodo_pago':    lambda p: p.metodo_pago,
+    'importe_total':  lambda p: _importe(p.importe_total),
+    'monto_efectivo': lambda p: _importe(p.monto_efectivo),
+    'monto_deposito': lambda p: _importe(p.monto_deposito),
+}
+
+CAMPOS_EGRESO = {
+    'uuid':               lambda e: str(e.uuid),
+    'fecha':              lambda e: e.fecha.isoformat(),
+    'numero_comprobante': lambda e: e.numero_comprobante,
+    'sede':               lambda e: e.sede.nombre,
+    'categoria':          lambda e: e.categoria,
+    'concepto':           lambda e: e.concepto,
+    'monto':              lambda e: _importe(e.monto),
+}
+
+
+def _limite(request):
+    try:
+        limite = int(request.GET.get('limite') or POR_PAGINA)
+    except ValueError:
+        limite = POR_PAGINA
+    return max(1, min(limite, POR_PAGINA_MAXIMO))
+
+
+def respuesta_pagina(request, queryset, orden, campos, plantilla_fila, nombre_fila):
+    """JsonResponse con una página de `queryset` en `orden` (terminado en id)."""
+    pedidos = [c.strip() for c in request.GET.get('campos', '').split(',') if c.strip()] or list(campos)
+    desconocidos = [c for c in pedidos if c not in campos]
+    if desconocidos:
+        return JsonResponse({'error': f'Campos desconocidos: {", ".join(desconocidos)}'}, status=400)
+
+    pagina = paginar_keyset(
+        queryset, orden,
+        despues=request.GET.get('despues'),
+        antes=request.GET.get('antes'),
+        por_pagina=_limite(request),
+    )
+    datos = {
+        'resultados': [{c: campos[c](fila) for c in pedidos} for fila in pagina['filas']],
+        'siguiente':  pagina['cursor_siguiente'] if pagina['hay_siguiente'] else None,
+        'anterior':   pagina['cursor_anterior'] if pagina['hay_anterior'] else None,
+    }
+    if request.GET.get('html'):
+        plantilla = get_template(plantilla_fila)
+        datos['html'] = ''.join(plantilla.render({nombre_fila: fila}, request) for fila in pagina['filas'])
+    return JsonResponse(datos)
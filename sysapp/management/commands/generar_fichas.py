@@ -0,0 +1,35 @@
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+from sysapp.fichas import alumnos_lote, documento_lote
+
+
+class Command(BaseCommand):
+    help = 'Genera en un solo documento HTML imprimible las fichas díptico de una sede, carrera y/o curso.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sede', type=int, help='ID de la sede.')
+        parser.add_argument('--carrera', type=int, help='ID de la carrera.')
+        parser.add_argument('--curso', type=int, help='Curso actual de los alumnos.')
+        parser.add_argument('--salida', help='Archivo de salida (por defecto, la salida estándar).')
+
+    def handle(self, *args, **options):
+        if not (options['sede'] or options['carrera']):
+            raise CommandError('Indicá al menos --sede o --carrera.')
+
+        alumnos = alumnos_lote(
+            sede_id=options['sede'], carrera_id=options['carrera'], curso=options['curso'],
+        )
+        total = alumnos.count()
+
+        destino = open(options['salida'], 'w', encoding='utf-8') if options['salida'] else sys.stdout
+        try:
+            for fragmento in documento_lote(alumnos):
+                destino.write(fragmento)
+        finally:
+            if options['salida']:
+                destino.close()
+
+        if options['salida']:
+            self.stdout.write(self.style.SUCCESS(f'{total} fichas generadas en {options["salida"]}.'))
@@ -0,0 +1,40 @@
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Count
+
+from sysapp.conciliacion import DIAS_TOLERANCIA, importar_extracto
+from sysapp.models import CuentaBancaria
+
+
+class Command(BaseCommand):
+    help = 'Importa un extracto bancario (CSV) de una cuenta y lo concilia con los pagos por depósito.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('cuenta', type=int, help='ID de la cuenta bancaria.')
+        parser.add_argument('archivo', help='Ruta del CSV del extracto.')
+        parser.add_argument('--tolerancia', type=int, default=DIAS_TOLERANCIA,
+                            help=f'Días de diferencia aceptados entre el crédito y el pago (por defecto {DIAS_TOLERANCIA}).')
+
+    def handle(self, *args, **options):
+        try:
+            cuenta = CuentaBancaria.objects.get(pk=options['cuenta'])
+        except CuentaBancaria.DoesNotExist:
+            raise CommandError(f'No existe la cuenta bancaria {options["cuenta"]}.')
+        ruta = Path(options['archivo'])
+        if not ruta.is_file():
+            raise CommandError(f'No existe el archivo {ruta}.')
+
+        with ruta.open('rb') as archivo:
+            try:
+                extracto = importar_extracto(cuenta, archivo, nombre=ruta.name, tolerancia=options['tolerancia'])
+            except ValueError as e:
+                raise CommandError(str(e))
+
+        por_estado = dict(extracto.movimientos.order_by().values_list('estado').annotate(Count('id')))
+        self.stdout.write(self.style.SUCCESS(
+            f'{extracto.cantidad_movimientos} créditos importados: '
+            f'{por_estado.get("CONCILIADO", 0)} conciliados, '
+            f'{por_estado.get("AMBIGUO", 0)} ambiguos, '
+            f'{por_estado.get("PENDIENTE", 0)} sin coincidencia.'
+        ))
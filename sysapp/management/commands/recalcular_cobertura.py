@@ -0,0 +1,45 @@
+from django.core.management.base import BaseCommand
+from django.db.models import OuterRef, Subquery
+
+from sysapp.models import Alumno, Pago
+
+
+class Command(BaseCommand):
+    help = 'Reconstruye el snapshot de cobertura de pagos (cobertura_hasta y último pago) de todos los alumnos.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000, help='Alumnos por lote de actualización.')
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+
+        ultimo_pago = Pago.objects.filter(
+            alumno=OuterRef('pk'),
+            es_matricula=False,
+            valido_hasta__isnull=False,
+        ).order_by('-valido_hasta', '-id')
+
+        alumnos = Alumno.objects.annotate(
+            _ultimo_pago_id=Subquery(ultimo_pago.values('id')[:1]),
+            _cobertura_hasta=Subquery(ultimo_pago.values('valido_hasta')[:1]),
+        ).only('id', 'cobertura_hasta', 'ultimo_pago').order_by('id')
+
+        pendientes = []
+        actualizados = 0
+        for alumno in alumnos.iterator(chunk_size=batch_size):
+            if (alumno.cobertura_hasta, alumno.ultimo_pago_id) == (alumno._cobertura_hasta, alumno._ultimo_pago_id):
+                continue
+            alumno.cobertura_hasta = alumno._cobertura_hasta
+            alumno.ultimo_pago_id = alumno._ultimo_pago_id
+            pendientes.append(alumno)
+            if len(pendientes) >= batch_size:
+                actualizados += self._guardar(pendientes)
+                pendientes = []
+        actualizados += self._guardar(pendientes)
+
+        self.stdout.write(self.style.SUCCESS(f'Cobertura recalculada: {actualizados} alumnos actualizados.'))
+
+    def _guardar(self, alumnos):
+        if alumnos:
+            Alumno.objects.bulk_update(alumnos, ['cobertura_hasta', 'ultimo_pago'])
+        return len(alumnos)
@@ -0,0 +1,25 @@
+from datetime import datetime
+
+from django.core.management.base import BaseCommand, CommandError
+
+from sysapp.models import CuboEgresoMensual, CuboIngresoMensual
+
+
+def _fecha(valor):
+    try:
+        return datetime.strptime(valor, '%Y-%m-%d').date()
+    except ValueError:
+        raise CommandError(f'Fecha inválida: {valor} (formato AAAA-MM-DD).')
+
+
+class Command(BaseCommand):
+    help = 'Reconstruye los cubos financieros mensuales a partir de los pagos y egresos.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--desde', type=_fecha, help='Fecha dentro del primer mes a recalcular (AAAA-MM-DD).')
+        parser.add_argument('--hasta', type=_fecha, help='Fecha dentro del último mes a recalcular (AAAA-MM-DD).')
+
+    def handle(self, *args, **options):
+        for cubo in (CuboIngresoMensual, CuboEgresoMensual):
+            celdas = cubo.reconstruir(desde=options['desde'], hasta=options['hasta'])
+            self.stdout.write(self.style.SUCCESS(f'{cubo._meta.verbose_name}: {celdas} celdas.'))
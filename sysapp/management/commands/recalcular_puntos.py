@@ -0,0 +1,48 @@
+from django.core.management.base import BaseCommand
+from django.db.models import IntegerField, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+
+from sysapp.models import Alumno, CanjeEstrellas, Pago
+
+
+class Command(BaseCommand):
+    help = 'Concilia el saldo de puntos materializado de cada alumno con sus pagos y canjes.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000, help='Alumnos por lote de actualización.')
+        parser.add_argument('--dry-run', action='store_true', help='Solo informar diferencias, sin guardar.')
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+
+        acumulados = Pago.objects.filter(
+            alumno=OuterRef('pk'),
+        ).order_by().values('alumno').annotate(t=Sum('puntos')).values('t')
+        canjeados = CanjeEstrellas.objects.filter(
+            alumno=OuterRef('pk'),
+        ).order_by().values('alumno').annotate(t=Sum('cantidad')).values('t')
+
+        alumnos = Alumno.objects.annotate(
+            _acumulados=Coalesce(Subquery(acumulados, output_field=IntegerField()), Value(0)),
+            _canjeados=Coalesce(Subquery(canjeados, output_field=IntegerField()), Value(0)),
+        ).only('id', 'nombre', 'apellido', 'saldo_puntos').order_by('id')
+
+        pendientes = []
+        diferencias = 0
+        for alumno in alumnos.iterator(chunk_size=batch_size):
+            saldo = alumno._acumulados - alumno._canjeados
+            if alumno.saldo_puntos == saldo:
+                continue
+            diferencias += 1
+            self.stdout.write(f'  {alumno.nombre_completo} (id {alumno.pk}): {alumno.saldo_puntos} → {saldo}')
+            alumno.saldo_puntos = saldo
+            pendientes.append(alumno)
+            if len(pendientes) >= batch_size and not options['dry_run']:
+                Alumno.objects.bulk_update(pendientes, ['saldo_puntos'])
+                pendientes = []
+
+        if pendientes and not options['dry_run']:
+            Alumno.objects.bulk_update(pendientes, ['saldo_puntos'])
+
+        accion = 'encontradas' if options['dry_run'] else 'corregidas'
+        self.stdout.write(self.style.SUCCESS(f'Saldos de puntos conciliados: {diferencias} diferencias {accion}.'))
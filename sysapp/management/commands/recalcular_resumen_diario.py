@@ -0,0 +1,27 @@
+from datetime import datetime
+
+from django.core.management.base import BaseCommand, CommandError
+
+from sysapp.models import ResumenDiario
+
+
+def _fecha(valor):
+    try:
+        return datetime.strptime(valor, '%Y-%m-%d').date()
+    except ValueError:
+        raise CommandError(f'Fecha inválida: {valor} (formato AAAA-MM-DD).')
+
+
+class Command(BaseCommand):
+    help = 'Reconstruye el resumen diario de caja (sede × fecha) a partir de los pagos y egresos.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--desde', type=_fecha, help='Primera fecha a recalcular (AAAA-MM-DD).')
+        parser.add_argument('--hasta', type=_fecha, help='Última fecha a recalcular (AAAA-MM-DD).')
+        parser.add_argument('--sede', type=int, help='ID de la sede (por defecto, todas).')
+
+    def handle(self, *args, **options):
+        filas = ResumenDiario.reconstruir(
+            desde=options['desde'], hasta=options['hasta'], sede_id=options['sede'],
+        )
+        self.stdout.write(self.style.SUCCESS(f'Resumen diario reconstruido: {filas} filas sede × fecha.'))
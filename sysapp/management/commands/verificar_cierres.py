@@ -0,0 +1,66 @@
+from datetime import datetime
+
+from django.core.management.base import BaseCommand, CommandError
+
+from sysapp.models import CAMPOS_TOTALES, CierreCaja, filtro_rango, movimientos_por_dia
+
+
+def _fecha(valor):
+    try:
+        return datetime.strptime(valor, '%Y-%m-%d').date()
+    except ValueError:
+        raise CommandError(f'Fecha inválida: {valor} (formato AAAA-MM-DD).')
+
+
+class Command(BaseCommand):
+    help = 'Verifica que los movimientos de cada cierre de caja no hayan cambiado después del cierre.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--desde', type=_fecha, help='Solo cierres que terminan en o después de esta fecha.')
+        parser.add_argument('--hasta', type=_fecha, help='Solo cierres que empiezan en o antes de esta fecha.')
+        parser.add_argument('--sede', type=int, help='ID de la sede (por defecto, todas).')
+        parser.add_argument('--todos', action='store_true',
+                            help='Incluir cierres reemplazados por un cierre posterior del mismo período.')
+
+    def handle(self, *args, **options):
+        cierres = CierreCaja.objects.filter(filtro_rango(sede_id=options['sede'])).select_related('sede')
+        if options['desde']:
+            cierres = cierres.filter(fecha_hasta__gte=options['desde'])
+        if options['hasta']:
+            cierres = cierres.filter(fecha_desde__lte=options['hasta'])
+        cierres = list(cierres.puntos_de_control()) if options['todos'] else cierres.vigentes()
+        if not cierres:
+            self.stdout.write('No hay cierres de caja para verificar.')
+            return
+
+        # Un GROUP BY por tabla para todo el período cubierto; cada cierre suma sus días
+        desde = min(c.fecha_desde for c in cierres)
+        hasta = max(c.fecha_hasta for c in cierres)
+        por_sede = {}
+        for (sede_id, fecha), grupo in movimientos_por_dia(filtro_rango(desde, hasta, options['sede'])).items():
+            por_sede.setdefault(sede_id, []).append((fecha, grupo))
+
+        alterados = 0
+        for cierre in sorted(cierres, key=lambda c: (c.sede.nombre, c.fecha_desde, c.fecha_cierre)):
+            actuales = dict.fromkeys(CAMPOS_TOTALES, 0)
+            for fecha, grupo in por_sede.get(cierre.sede_id, []):
+                if cierre.fecha_desde <= fecha <= cierre.fecha_hasta:
+                    for campo in CAMPOS_TOTALES:
+                        actuales[campo] += grupo[campo]
+
+            periodo = f'{cierre.sede.nombre} {cierre.fecha_desde:%d/%m/%Y}–{cierre.fecha_hasta:%d/%m/%Y}'
+            diferencias = [
+                f'{campo}: {getattr(cierre, campo)} → {actuales[campo]}'
+                for campo in CAMPOS_TOTALES if getattr(cierre, campo) != actuales[campo]
+            ]
+            if diferencias:
+                alterados += 1
+                self.stdout.write(self.style.ERROR(
+                    f'  [!!] {periodo} (cierre #{cierre.pk}, {cierre.fecha_cierre:%d/%m/%Y %H:%M}): ' + '; '.join(diferencias)
+                ))
+            else:
+                self.stdout.write(self.style.SUCCESS(f'  [OK] {periodo} (cierre #{cierre.pk})'))
+
+        if alterados:
+            raise CommandError(f'{alterados} cierres tienen movimientos que cambiaron después del cierre.')
+        self.stdout.write(self.style.SUCCESS(f'{len(cierres)} cierres verificados sin cambios.'))
@@ -0,0 +1,97 @@
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+
+from sysapp.models import (
+    Alumno, AsistenciaFuncionario, CuentaBancaria, Egreso, Pago, SolicitudEliminacion,
+    normalizar_busqueda, rango_mes,
+)
+
+
+def _consultas_frecuentes():
+    """
+    (descripción, queryset, índice esperado, solo_postgresql). El índice
+    esperado es un nombre o una tupla de columnas iniciales, para los índices
+    con nombre generado (p. ej. unique_together).
+    """
+    hoy = date.today()
+    return [
+        ('Estado de pagos (lista_alumnos, dashboard)',
+         Alumno.objects.with_estado_pagos().filter(pk=0), 'pago_alumno_cuota_idx', False),
+        ('Caja: ingresos por sede y fecha',
+         Pago.objects.filter(sede_id=0, fecha__range=(hoy, hoy)), 'pago_sede_fecha_idx', False),
+        ('Caja: egresos por sede y fecha',
+         Egreso.objects.filter(sede_id=0, fecha__range=(hoy, hoy)), 'egreso_sede_fecha_idx', False),
+        ('Listado de pagos',
+         Pago.objects.order_by('-fecha', '-id')[:50], 'pago_fecha_id_idx', False),
+        ('Listado de egresos',
+         Egreso.objects.order_by('-fecha', '-id')[:50], 'egreso_fecha_id_idx', False),
+        ('Asistencias del mes de un funcionario',
+         AsistenciaFuncionario.objects.filter(funcionario_id=0, fecha__range=rango_mes(hoy.year, hoy.month)),
+         ('funcionario_id', 'fecha'), False),
+        ('Solicitudes de eliminación pendientes',
+         SolicitudEliminacion.objects.filter(estado='PENDIENTE').order_by('-fecha_solicitud'),
+         'solicitud_pendiente_idx', False),
+        ('Cuenta bancaria (get_or_create sin distinguir mayúsculas)',
+         CuentaBancaria.objects.filter(entidad__iexact='x', titular__iexact='y'),
+         'cuenta_entidad_titular_ci_idx', True),
+        ('Búsqueda de pagos por nombre',
+         Pago.objects.filter(busqueda_nombre__contains=normalizar_busqueda('núñez')),
+         'sysapp_pago_busq_nombre_trgm', True),
+    ]
+
+
+def _indices_por_columnas(tabla, columnas):
+    with connection.cursor() as cursor:
+        restricciones = connection.introspection.get_constraints(cursor, tabla)
+    return {
+        nombre for nombre, info in restricciones.items()
+        if info['index'] or info['unique']
+        if tuple(info['columns'][:len(columnas)]) == tuple(columnas)
+    }
+
+
+def _plan(queryset):
+    """EXPLAIN de la consulta. En PostgreSQL se desalienta el seq scan para
+    que tablas pequeñas (desarrollo) no oculten si el índice es utilizable."""
+    with transaction.atomic():
+        if connection.vendor == 'postgresql':
+            with connection.cursor() as cursor:
+                cursor.execute('SET LOCAL enable_seqscan = off')
+        return queryset.explain()
+
+
+class Command(BaseCommand):
+    help = 'Verifica con EXPLAIN que las consultas frecuentes de las vistas usan sus índices.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--plan', action='store_true', help='Mostrar el plan completo de cada consulta.')
+
+    def handle(self, *args, **options):
+        es_postgresql = connection.vendor == 'postgresql'
+        fallas = []
+
+        for descripcion, queryset, esperado, solo_postgresql in _consultas_frecuentes():
+            if solo_postgresql and not es_postgresql:
+                self.stdout.write(f'  [--] {descripcion}: solo aplica en PostgreSQL')
+                continue
+
+            if isinstance(esperado, tuple):
+                nombres = _indices_por_columnas(queryset.model._meta.db_table, esperado)
+            else:
+                nombres = {esperado}
+
+            plan = _plan(queryset)
+            usado = next((n for n in nombres if n in plan), None)
+            if usado:
+                self.stdout.write(self.style.SUCCESS(f'  [OK] {descripcion}: {usado}'))
+            else:
+                fallas.append(descripcion)
+                self.stdout.write(self.style.ERROR(f'  [!!] {descripcion}: no usa {" / ".join(sorted(nombres)) or esperado}'))
+            if options['plan'] or not usado:
+                self.stdout.write(plan)
+
+        if fallas:
+            raise CommandError(f'{len(fallas)} consultas no usan el índice esperado.')
+        self.stdout.write(self.style.SUCCESS('Todas las consultas frecuentes usan sus índices.'))
@@ -0,0 +1,59 @@
+# Generated by Django 5.2.12 on 2026-10-17 00:34
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('sysapp', '0020_asistenciafuncionario_horas_trabajadas_and_more'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='pago',
+            name='monto_deposito',
+            field=models.DecimalField(blank=True, decimal_places=0, default=0, max_digits=10, null=True, verbose_name='Monto Depósito / Transferencia'),
+        ),
+        migrations.AddField(
+            model_name='pago',
+            name='monto_efectivo',
+            field=models.DecimalField(blank=True, decimal_places=0, default=0, max_digits=10, null=True, verbose_name='Monto Efectivo'),
+        ),
+        migrations.AddField(
+            model_name='pago',
+            name='tiene_multa',
+            field=models.BooleanField(default=False, verbose_name='Tiene multa por pago tardío'),
+        ),
+        migrations.AlterField(
+            model_name='egreso',
+            name='categoria',
+            field=models.CharField(choices=[('SERVICIOS', 'Servicios (Luz, Agua, Internet)'), ('SUELDOS', 'Honorarios y Viáticos'), ('MATERIALES', 'Materiales y Suministros'), ('MANTENIMIENTO', 'Mantenimiento'), ('ALQUILER', 'Alquiler'), ('IMPUESTOS', 'Impuestos y Tasas'), ('OTROS', 'Otros Gastos')], max_length=20, verbose_name='Categoría'),
+        ),
+        migrations.AlterField(
+            model_name='pago',
+            name='metodo_pago',
+            field=models.CharField(choices=[('EFECTIVO', 'Efectivo'), ('DEPOSITO', 'Depósito / Transferencia'), ('MIXTO', 'Mixto')], default='EFECTIVO', max_length=20, verbose_name='Método de Pago'),
+        ),
+        migrations.CreateModel(
+            name='CierreCaja',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('fecha_cierre', models.DateTimeField(default=django.utils.timezone.now)),
+                ('total_ingresos', models.DecimalField(decimal_places=0, max_digits=15)),
+                ('total_egresos', models.DecimalField(decimal_places=0, max_digits=15)),
+                ('balance', models.DecimalField(decimal_places=0, max_digits=15)),
+                ('sede', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='cierres', to='sysapp.sede')),
+                ('usuario', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='cierres', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Cierre de Caja',
+                'verbose_name_plural': 'Cierres de Caja',
+                'ordering': ['-fecha_cierre'],
+            },
+        ),
+    ]
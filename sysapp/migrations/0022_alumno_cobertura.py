@@ -0,0 +1,57 @@
+# Generated by Django 5.2.12 on 2026-10-17 00:34
+
+import datetime
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Case, OuterRef, Subquery, Value, When
+from django.utils import timezone
+
+
+def calcular_cobertura(apps, schema_editor):
+    Alumno = apps.get_model('sysapp', 'Alumno')
+    Pago = apps.get_model('sysapp', 'Pago')
+    hoy = timezone.now().date()
+
+    ultimo_pago = Pago.objects.filter(
+        alumno=OuterRef('pk'),
+        es_matricula=False,
+        valido_hasta__isnull=False,
+    ).order_by('-valido_hasta', '-id')
+
+    Alumno.objects.update(
+        cobertura_hasta=Subquery(ultimo_pago.values('valido_hasta')[:1]),
+        ultimo_pago_id=Subquery(ultimo_pago.values('id')[:1]),
+    )
+    Alumno.objects.update(estado_cobertura=Case(
+        When(cobertura_hasta__isnull=True, then=Value('SIN_PAGOS')),
+        When(cobertura_hasta__gt=hoy + datetime.timedelta(days=10), then=Value('AL_DIA')),
+        When(cobertura_hasta__gte=hoy, then=Value('CERCANO_VENCIMIENTO')),
+        default=Value('ATRASADO'),
+    ))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('sysapp', '0021_pago_metodo_pago_cierrecaja'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='alumno',
+            name='cobertura_hasta',
+            field=models.DateField(blank=True, editable=False, null=True, verbose_name='Cubierto hasta'),
+        ),
+        migrations.AddField(
+            model_name='alumno',
+            name='estado_cobertura',
+            field=models.CharField(choices=[('AL_DIA', 'Al día'), ('CERCANO_VENCIMIENTO', 'Por vencer'), ('ATRASADO', 'Atrasado'), ('SIN_PAGOS', 'Sin pagos')], default='SIN_PAGOS', editable=False, max_length=20, verbose_name='Estado de pagos'),
+        ),
+        migrations.AddField(
+            model_name='alumno',
+            name='ultimo_pago',
+            field=models.ForeignKey(blank=True, editable=False, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='sysapp.pago', verbose_name='Último pago de cuota'),
+        ),
+        migrations.RunPython(calcular_cobertura, migrations.RunPython.noop),
+    ]
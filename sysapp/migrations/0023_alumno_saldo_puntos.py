@@ -0,0 +1,39 @@
+# Generated by Django 5.2.12 on 2026-10-17 00:38
+
+from django.db import migrations, models
+from django.db.models import IntegerField, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+
+
+def calcular_saldo_puntos(apps, schema_editor):
+    Alumno = apps.get_model('sysapp', 'Alumno')
+    Pago = apps.get_model('sysapp', 'Pago')
+    CanjeEstrellas = apps.get_model('sysapp', 'CanjeEstrellas')
+
+    acumulados = Pago.objects.filter(
+        alumno=OuterRef('pk'),
+    ).order_by().values('alumno').annotate(t=Sum('puntos')).values('t')
+    canjeados = CanjeEstrellas.objects.filter(
+        alumno=OuterRef('pk'),
+    ).order_by().values('alumno').annotate(t=Sum('cantidad')).values('t')
+
+    Alumno.objects.update(saldo_puntos=(
+        Coalesce(Subquery(acumulados, output_field=IntegerField()), Value(0))
+        - Coalesce(Subquery(canjeados, output_field=IntegerField()), Value(0))
+    ))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('sysapp', '0022_alumno_cobertura'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='alumno',
+            name='saldo_puntos',
+            field=models.IntegerField(default=0, editable=False, verbose_name='Saldo de puntos'),
+        ),
+        migrations.RunPython(calcular_saldo_puntos, migrations.RunPython.noop),
+    ]
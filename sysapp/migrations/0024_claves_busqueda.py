@@ -0,0 +1,99 @@
+# Generated by Django 5.2.12 on 2026-10-17 00:44
+
+import re
+import unicodedata
+
+from django.db import migrations, models
+
+LOTE = 2000
+
+
+# Copias de normalizar_busqueda / solo_digitos de models.py al momento de la migración
+def normalizar_busqueda(*partes):
+    texto = unicodedata.normalize('NFKD', ' '.join(str(p) for p in partes if p).casefold())
+    return ' '.join(''.join(c for c in texto if not unicodedata.combining(c)).split())
+
+
+def solo_digitos(texto):
+    return re.sub(r'\D', '', str(texto or ''))
+
+
+def _actualizar_por_lotes(modelo, queryset, campos, calcular):
+    pendientes = []
+    for obj in queryset.order_by('pk').iterator(chunk_size=LOTE):
+        calcular(obj)
+        pendientes.append(obj)
+        if len(pendientes) >= LOTE:
+            modelo.objects.bulk_update(pendientes, campos)
+            pendientes = []
+    if pendientes:
+        modelo.objects.bulk_update(pendientes, campos)
+
+
+def calcular_claves(apps, schema_editor):
+    Alumno = apps.get_model('sysapp', 'Alumno')
+    Funcionario = apps.get_model('sysapp', 'Funcionario')
+    Pago = apps.get_model('sysapp', 'Pago')
+    Egreso = apps.get_model('sysapp', 'Egreso')
+
+    def persona(obj):
+        obj.busqueda_nombre = normalizar_busqueda(obj.nombre, obj.apellido)
+        obj.cedula_digitos = solo_digitos(obj.cedula)
+
+    def pago(obj):
+        nombre_alumno = f'{obj.alumno.nombre} {obj.alumno.apellido}' if obj.alumno_id else ''
+        obj.busqueda_nombre = normalizar_busqueda(nombre_alumno, obj.nombre_cliente)
+
+    def egreso(obj):
+        obj.busqueda_concepto = normalizar_busqueda(obj.concepto)
+
+    campos_persona = ['busqueda_nombre', 'cedula_digitos']
+    _actualizar_por_lotes(Alumno, Alumno.objects.only('id', 'nombre', 'apellido', 'cedula'), campos_persona, persona)
+    _actualizar_por_lotes(Funcionario, Funcionario.objects.only('id', 'nombre', 'apellido', 'cedula'), campos_persona, persona)
+    _actualizar_por_lotes(
+        Pago,
+        Pago.objects.select_related('alumno').only('id', 'nombre_cliente', 'alumno__nombre', 'alumno__apellido'),
+        ['busqueda_nombre'], pago,
+    )
+    _actualizar_por_lotes(Egreso, Egreso.objects.only('id', 'concepto'), ['busqueda_concepto'], egreso)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('sysapp', '0023_alumno_saldo_puntos'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='alumno',
+            name='busqueda_nombre',
+            field=models.CharField(default='', editable=False, max_length=255),
+        ),
+        migrations.AddField(
+            model_name='alumno',
+            name='cedula_digitos',
+            field=models.CharField(default='', editable=False, max_length=20),
+        ),
+        migrations.AddField(
+            model_name='egreso',
+            name='busqueda_concepto',
+            field=models.TextField(default='', editable=False),
+        ),
+        migrations.AddField(
+            model_name='funcionario',
+            name='busqueda_nombre',
+            field=models.CharField(default='', editable=False, max_length=255),
+        ),
+        migrations.AddField(
+            model_name='funcionario',
+            name='cedula_digitos',
+            field=models.CharField(default='', editable=False, max_length=20),
+        ),
+        migrations.AddField(
+            model_name='pago',
+            name='busqueda_nombre',
+            field=models.CharField(default='', editable=False, max_length=255),
+        ),
+        migrations.RunPython(calcular_claves, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,47 @@
+from django.db import migrations
+
+# Índices trigram (pg_trgm) para búsquedas por subcadena: LIKE '%texto%'
+# sobre las claves normalizadas y UPPER(...) LIKE UPPER('%texto%') (icontains)
+# sobre recibos y conceptos. Solo aplican en PostgreSQL; se crean con
+# CONCURRENTLY para no bloquear escrituras en tablas grandes.
+INDICES = [
+    ('sysapp_alumno_busq_nombre_trgm', 'sysapp_alumno', 'busqueda_nombre'),
+    ('sysapp_alumno_cedula_dig_trgm', 'sysapp_alumno', 'cedula_digitos'),
+    ('sysapp_funcionario_busq_nombre_trgm', 'sysapp_funcionario', 'busqueda_nombre'),
+    ('sysapp_funcionario_cedula_dig_trgm', 'sysapp_funcionario', 'cedula_digitos'),
+    ('sysapp_pago_busq_nombre_trgm', 'sysapp_pago', 'busqueda_nombre'),
+    ('sysapp_pago_recibo_trgm', 'sysapp_pago', '(UPPER(numero_recibo::text))'),
+    ('sysapp_pago_concepto_trgm', 'sysapp_pago', '(UPPER(concepto::text))'),
+    ('sysapp_egreso_busq_concepto_trgm', 'sysapp_egreso', 'busqueda_concepto'),
+    ('sysapp_egreso_comprobante_trgm', 'sysapp_egreso', '(UPPER(numero_comprobante::text))'),
+]
+
+
+def crear_indices(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+    for nombre, tabla, expresion in INDICES:
+        schema_editor.execute(
+            f'CREATE INDEX CONCURRENTLY IF NOT EXISTS {nombre} ON {tabla} USING gin ({expresion} gin_trgm_ops)'
+        )
+
+
+def eliminar_indices(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for nombre, _, _ in INDICES:
+        schema_editor.execute(f'DROP INDEX CONCURRENTLY IF EXISTS {nombre}')
+
+
+class Migration(migrations.Migration):
+
+    atomic = False
+
+    dependencies = [
+        ('sysapp', '0024_claves_busqueda'),
+    ]
+
+    operations = [
+        migrations.RunPython(crear_indices, eliminar_indices),
+    ]
@@ -0,0 +1,67 @@
+# Generated by Django 5.2.12 on 2026-10-17 00:46
+
+import django.db.models.functions.text
+from django.conf import settings
+from django.db import migrations, models
+
+
+class AddIndexConcurrently(migrations.AddIndex):
+    # Como AddIndexConcurrently de django.contrib.postgres (que no se puede
+    # importar sin psycopg): en PostgreSQL crea y borra el índice con
+    # CONCURRENTLY para no bloquear escrituras sobre pagos mientras se arma;
+    # en otros motores es un AddIndex común.
+
+    def database_forwards(self, app_label, schema_editor, from_state, to_state):
+        if schema_editor.connection.vendor != 'postgresql':
+            return super().database_forwards(app_label, schema_editor, from_state, to_state)
+        model = to_state.apps.get_model(app_label, self.model_name)
+        if self.allow_migrate_model(schema_editor.connection.alias, model):
+            schema_editor.add_index(model, self.index, concurrently=True)
+
+    def database_backwards(self, app_label, schema_editor, from_state, to_state):
+        if schema_editor.connection.vendor != 'postgresql':
+            return super().database_backwards(app_label, schema_editor, from_state, to_state)
+        model = from_state.apps.get_model(app_label, self.model_name)
+        if self.allow_migrate_model(schema_editor.connection.alias, model):
+            schema_editor.remove_index(model, self.index, concurrently=True)
+
+
+class Migration(migrations.Migration):
+
+    atomic = False
+
+    dependencies = [
+        ('sysapp', '0025_indices_trigram'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        AddIndexConcurrently(
+            model_name='cuentabancaria',
+            index=models.Index(django.db.models.functions.text.Upper('entidad'), django.db.models.functions.text.Upper('titular'), name='cuenta_entidad_titular_ci_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='egreso',
+            index=models.Index(fields=['sede', 'fecha'], name='egreso_sede_fecha_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='egreso',
+            index=models.Index(fields=['-fecha', '-id'], name='egreso_fecha_id_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='pago',
+            index=models.Index(condition=models.Q(('es_matricula', False)), fields=['alumno', 'valido_hasta'], name='pago_alumno_cuota_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='pago',
+            index=models.Index(fields=['sede', 'fecha'], name='pago_sede_fecha_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='pago',
+            index=models.Index(fields=['-fecha', '-id'], name='pago_fecha_id_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='solicitudeliminacion',
+            index=models.Index(condition=models.Q(('estado', 'PENDIENTE')), fields=['-fecha_solicitud'], name='solicitud_pendiente_idx'),
+        ),
+    ]
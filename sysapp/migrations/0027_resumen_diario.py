@@ -0,0 +1,60 @@
+# Generated by Django 5.2.12 on 2026-10-17 00:47
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Count, Sum
+
+
+def calcular_resumenes(apps, schema_editor):
+    ResumenDiario = apps.get_model('sysapp', 'ResumenDiario')
+    Pago = apps.get_model('sysapp', 'Pago')
+    Egreso = apps.get_model('sysapp', 'Egreso')
+
+    filas = {}
+    ingresos = Pago.objects.order_by().values('sede_id', 'fecha').annotate(
+        total_ingresos=Sum('importe_total'),
+        total_efectivo=Sum('monto_efectivo'),
+        total_deposito=Sum('monto_deposito'),
+        cantidad_pagos=Count('id'),
+    )
+    egresos = Egreso.objects.order_by().values('sede_id', 'fecha').annotate(
+        total_egresos=Sum('monto'),
+        cantidad_egresos=Count('id'),
+    )
+    for grupo in list(ingresos) + list(egresos):
+        clave = (grupo.pop('sede_id'), grupo.pop('fecha'))
+        fila = filas.setdefault(clave, ResumenDiario(sede_id=clave[0], fecha=clave[1]))
+        for campo, valor in grupo.items():
+            setattr(fila, campo, valor or 0)
+    ResumenDiario.objects.bulk_create(filas.values(), batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('sysapp', '0026_indices_consultas_frecuentes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ResumenDiario',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('fecha', models.DateField()),
+                ('total_ingresos', models.DecimalField(decimal_places=0, default=0, max_digits=15)),
+                ('total_efectivo', models.DecimalField(decimal_places=0, default=0, max_digits=15)),
+                ('total_deposito', models.DecimalField(decimal_places=0, default=0, max_digits=15)),
+                ('total_egresos', models.DecimalField(decimal_places=0, default=0, max_digits=15)),
+                ('cantidad_pagos', models.IntegerField(default=0)),
+                ('cantidad_egresos', models.IntegerField(default=0)),
+                ('sede', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='resumenes_diarios', to='sysapp.sede')),
+            ],
+            options={
+                'verbose_name': 'Resumen Diario',
+                'verbose_name_plural': 'Resúmenes Diarios',
+                'ordering': ['-fecha'],
+                'constraints': [models.UniqueConstraint(fields=('sede', 'fecha'), name='resumen_diario_sede_fecha_uniq')],
+            },
+        ),
+        migrations.RunPython(calcular_resumenes, migrations.RunPython.noop),
+    ]
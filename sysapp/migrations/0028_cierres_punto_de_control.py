@@ -0,0 +1,49 @@
+# Generated by Django 5.2.12 on 2026-10-17 00:54
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('sysapp', '0027_resumen_diario'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='cierrecaja',
+            name='cantidad_egresos',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='cierrecaja',
+            name='cantidad_pagos',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='cierrecaja',
+            name='fecha_desde',
+            field=models.DateField(blank=True, null=True, verbose_name='Desde'),
+        ),
+        migrations.AddField(
+            model_name='cierrecaja',
+            name='fecha_hasta',
+            field=models.DateField(blank=True, null=True, verbose_name='Hasta'),
+        ),
+        migrations.AddField(
+            model_name='cierrecaja',
+            name='total_deposito',
+            field=models.DecimalField(decimal_places=0, default=0, max_digits=15),
+        ),
+        migrations.AddField(
+            model_name='cierrecaja',
+            name='total_efectivo',
+            field=models.DecimalField(decimal_places=0, default=0, max_digits=15),
+        ),
+        migrations.AddIndex(
+            model_name='cierrecaja',
+            index=models.Index(fields=['sede', 'fecha_desde', 'fecha_hasta'], name='cierre_sede_rango_idx'),
+        ),
+    ]
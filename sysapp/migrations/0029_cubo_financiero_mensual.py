@@ -0,0 +1,92 @@
+# Generated by Django 5.2.12 on 2026-10-17 00:56
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Count, Sum
+from django.db.models.functions import TruncMonth
+
+
+def calcular_cubos(apps, schema_editor):
+    Pago = apps.get_model('sysapp', 'Pago')
+    Egreso = apps.get_model('sysapp', 'Egreso')
+    CuboIngresoMensual = apps.get_model('sysapp', 'CuboIngresoMensual')
+    CuboEgresoMensual = apps.get_model('sysapp', 'CuboEgresoMensual')
+
+    ingresos = Pago.objects.order_by().values('sede_id', 'carrera_id', 'metodo_pago', mes=TruncMonth('fecha')).annotate(
+        cantidad=Count('id'),
+        importe_total=Sum('importe_total'),
+        monto_efectivo=Sum('monto_efectivo'),
+        monto_deposito=Sum('monto_deposito'),
+    )
+    CuboIngresoMensual.objects.bulk_create([
+        CuboIngresoMensual(
+            sede_id=g['sede_id'], carrera_id=g['carrera_id'], metodo_pago=g['metodo_pago'], mes=g['mes'],
+            cantidad=g['cantidad'], importe_total=g['importe_total'] or 0,
+            monto_efectivo=g['monto_efectivo'] or 0, monto_deposito=g['monto_deposito'] or 0,
+        )
+        for g in ingresos
+    ], batch_size=1000)
+
+    egresos = Egreso.objects.order_by().values('sede_id', 'categoria', mes=TruncMonth('fecha')).annotate(
+        cantidad=Count('id'),
+        monto=Sum('monto'),
+    )
+    CuboEgresoMensual.objects.bulk_create([
+        CuboEgresoMensual(
+            sede_id=g['sede_id'], categoria=g['categoria'], mes=g['mes'],
+            cantidad=g['cantidad'], monto=g['monto'] or 0,
+        )
+        for g in egresos
+    ], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('sysapp', '0028_cierres_punto_de_control'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CuboEgresoMensual',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('mes', models.DateField(help_text='Primer día del mes', verbose_name='Mes')),
+                ('cantidad', models.IntegerField(default=0)),
+                ('categoria', models.CharField(choices=[('SERVICIOS', 'Servicios (Luz, Agua, Internet)'), ('SUELDOS', 'Honorarios y Viáticos'), ('MATERIALES', 'Materiales y Suministros'), ('MANTENIMIENTO', 'Mantenimiento'), ('ALQUILER', 'Alquiler'), ('IMPUESTOS', 'Impuestos y Tasas'), ('OTROS', 'Otros Gastos')], max_length=20)),
+                ('monto', models.DecimalField(decimal_places=0, default=0, max_digits=15)),
+                ('sede', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='sysapp.sede')),
+            ],
+            options={
+                'verbose_name': 'Cubo de Egresos Mensual',
+                'verbose_name_plural': 'Cubo de Egresos Mensual',
+                'ordering': ['-mes'],
+                'abstract': False,
+                'indexes': [models.Index(fields=['mes', 'sede'], name='cubo_egreso_mes_sede_idx')],
+                'constraints': [models.UniqueConstraint(fields=('sede', 'categoria', 'mes'), name='cubo_egreso_celda_uniq')],
+            },
+        ),
+        migrations.CreateModel(
+            name='CuboIngresoMensual',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('mes', models.DateField(help_text='Primer día del mes', verbose_name='Mes')),
+                ('cantidad', models.IntegerField(default=0)),
+                ('metodo_pago', models.CharField(choices=[('EFECTIVO', 'Efectivo'), ('DEPOSITO', 'Depósito / Transferencia'), ('MIXTO', 'Mixto')], max_length=20)),
+                ('importe_total', models.DecimalField(decimal_places=0, default=0, max_digits=15)),
+                ('monto_efectivo', models.DecimalField(decimal_places=0, default=0, max_digits=15)),
+                ('monto_deposito', models.DecimalField(decimal_places=0, default=0, max_digits=15)),
+                ('carrera', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='sysapp.carrera')),
+                ('sede', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='sysapp.sede')),
+            ],
+            options={
+                'verbose_name': 'Cubo de Ingresos Mensual',
+                'verbose_name_plural': 'Cubo de Ingresos Mensual',
+                'ordering': ['-mes'],
+                'abstract': False,
+                'indexes': [models.Index(fields=['mes', 'sede'], name='cubo_ingreso_mes_sede_idx')],
+                'constraints': [models.UniqueConstraint(condition=models.Q(('carrera__isnull', False)), fields=('sede', 'carrera', 'metodo_pago', 'mes'), name='cubo_ingreso_celda_uniq'), models.UniqueConstraint(condition=models.Q(('carrera__isnull', True)), fields=('sede', 'metodo_pago', 'mes'), name='cubo_ingreso_sin_carrera_uniq')],
+            },
+        ),
+        migrations.RunPython(calcular_cubos, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,70 @@
+# Generated by Django 5.2.12 on 2026-10-17 01:03
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('sysapp', '0029_cubo_financiero_mensual'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ExtractoBancario',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('archivo', models.CharField(max_length=255, verbose_name='Archivo')),
+                ('huella', models.CharField(editable=False, max_length=64)),
+                ('fecha_importacion', models.DateTimeField(auto_now_add=True)),
+                ('fecha_desde', models.DateField(blank=True, null=True, verbose_name='Desde')),
+                ('fecha_hasta', models.DateField(blank=True, null=True, verbose_name='Hasta')),
+                ('cantidad_movimientos', models.IntegerField(default=0)),
+                ('cantidad_conciliados', models.IntegerField(default=0)),
+                ('cuenta', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='extractos', to='sysapp.cuentabancaria')),
+                ('usuario', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='extractos', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Extracto Bancario',
+                'verbose_name_plural': 'Extractos Bancarios',
+                'ordering': ['-fecha_importacion'],
+            },
+        ),
+        migrations.CreateModel(
+            name='MovimientoBancario',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('linea', models.IntegerField(verbose_name='Línea')),
+                ('fecha', models.DateField(verbose_name='Fecha')),
+                ('monto', models.DecimalField(decimal_places=0, max_digits=15, verbose_name='Monto')),
+                ('referencia', models.CharField(blank=True, default='', max_length=100, verbose_name='Referencia')),
+                ('descripcion', models.CharField(blank=True, default='', max_length=255, verbose_name='Descripción')),
+                ('estado', models.CharField(choices=[('CONCILIADO', 'Conciliado'), ('AMBIGUO', 'Varios pagos posibles'), ('PENDIENTE', 'Sin coincidencia')], default='PENDIENTE', max_length=10)),
+                ('candidatos', models.IntegerField(default=0)),
+                ('cuenta', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='movimientos', to='sysapp.cuentabancaria')),
+                ('extracto', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='movimientos', to='sysapp.extractobancario')),
+                ('pago', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='movimientos_bancarios', to='sysapp.pago')),
+                ('usuario_concilia', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Movimiento Bancario',
+                'verbose_name_plural': 'Movimientos Bancarios',
+                'ordering': ['extracto', 'linea'],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='extractobancario',
+            constraint=models.UniqueConstraint(fields=('cuenta', 'huella'), name='extracto_cuenta_huella_uniq'),
+        ),
+        migrations.AddIndex(
+            model_name='movimientobancario',
+            index=models.Index(fields=['extracto', 'estado', 'linea'], name='movimiento_extracto_estado_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='movimientobancario',
+            constraint=models.UniqueConstraint(condition=models.Q(('pago__isnull', False)), fields=('pago',), name='movimiento_pago_uniq'),
+        ),
+    ]
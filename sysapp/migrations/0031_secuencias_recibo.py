@@ -0,0 +1,55 @@
+# Generated by Django 5.2.12 on 2026-10-17 01:09
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('sysapp', '0030_conciliacion_bancaria'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SecuenciaRecibo',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('serie', models.CharField(blank=True, default='', max_length=20, verbose_name='Serie / talonario')),
+                ('prefijo', models.CharField(blank=True, default='', help_text="Se antepone al número, p. ej. 'CEN-'", max_length=20, verbose_name='Prefijo')),
+                ('digitos', models.PositiveSmallIntegerField(default=6, help_text='Ancho mínimo del número, completado con ceros', verbose_name='Dígitos')),
+                ('siguiente', models.PositiveIntegerField(default=1, verbose_name='Siguiente número')),
+                ('activa', models.BooleanField(default=True, verbose_name='Activa')),
+                ('sede', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='secuencias_recibo', to='sysapp.sede', verbose_name='Sede')),
+            ],
+            options={
+                'verbose_name': 'Secuencia de Recibos',
+                'verbose_name_plural': 'Secuencias de Recibos',
+                'ordering': ['sede', 'serie'],
+            },
+        ),
+        migrations.CreateModel(
+            name='ReservaRecibos',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('desde', models.CharField(max_length=50, verbose_name='Desde')),
+                ('hasta', models.CharField(max_length=50, verbose_name='Hasta')),
+                ('cantidad', models.PositiveIntegerField(verbose_name='Cantidad')),
+                ('fecha', models.DateTimeField(auto_now_add=True)),
+                ('observaciones', models.CharField(blank=True, default='', max_length=200)),
+                ('usuario', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='reservas_recibos', to=settings.AUTH_USER_MODEL)),
+                ('secuencia', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='reservas', to='sysapp.secuenciarecibo')),
+            ],
+            options={
+                'verbose_name': 'Reserva de Recibos',
+                'verbose_name_plural': 'Reservas de Recibos',
+                'ordering': ['-fecha'],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='secuenciarecibo',
+            constraint=models.UniqueConstraint(fields=('sede', 'serie'), name='secuencia_sede_serie_uniq'),
+        ),
+    ]
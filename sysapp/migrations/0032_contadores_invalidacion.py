@@ -0,0 +1,27 @@
+# Generated by Django 5.2.12 on 2026-10-17 01:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('sysapp', '0031_secuencias_recibo'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ContadorInvalidacion',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('espacio', models.CharField(max_length=100, unique=True, verbose_name='Espacio')),
+                ('version', models.PositiveBigIntegerField(default=0, verbose_name='Versión')),
+                ('actualizado', models.DateTimeField(auto_now=True, verbose_name='Actualizado')),
+            ],
+            options={
+                'verbose_name': 'Contador de Invalidación',
+                'verbose_name_plural': 'Contadores de Invalidación',
+                'ordering': ['espacio'],
+            },
+        ),
+    ]
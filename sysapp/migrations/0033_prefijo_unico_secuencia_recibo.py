@@ -0,0 +1,40 @@
+# Generated by Django 5.2.12 on 2026-10-17 01:36
+
+from django.db import migrations, models
+
+
+def asignar_prefijos(apps, schema_editor):
+    # Las secuencias sin prefijo, o con uno repetido, generaban los mismos números
+    # en varias sedes: reciben uno propio antes de exigirlo único
+    SecuenciaRecibo = apps.get_model('sysapp', 'SecuenciaRecibo')
+    usados = set()
+    for secuencia in SecuenciaRecibo.objects.order_by('id'):
+        if secuencia.prefijo and secuencia.prefijo not in usados:
+            usados.add(secuencia.prefijo)
+            continue
+        prefijo = f'S{secuencia.pk}-'
+        while prefijo in usados:
+            prefijo = 'S' + prefijo
+        secuencia.prefijo = prefijo
+        secuencia.save(update_fields=['prefijo'])
+        usados.add(prefijo)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('sysapp', '0032_contadores_invalidacion'),
+    ]
+
+    operations = [
+        migrations.RunPython(asignar_prefijos, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='secuenciarecibo',
+            name='prefijo',
+            field=models.CharField(help_text="Se antepone al número y no se repite entre secuencias, p. ej. 'CEN-'", max_length=20, unique=True, verbose_name='Prefijo'),
+        ),
+        migrations.AddConstraint(
+            model_name='secuenciarecibo',
+            constraint=models.CheckConstraint(condition=models.Q(('prefijo', ''), _negated=True), name='secuencia_prefijo_no_vacio'),
+        ),
+    ]
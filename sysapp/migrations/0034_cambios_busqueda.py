@@ -0,0 +1,27 @@
+# Generated by Django 5.2.12 on 2026-10-17 01:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('sysapp', '0033_prefijo_unico_secuencia_recibo'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CambioBusqueda',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('indice', models.CharField(max_length=20, verbose_name='Índice')),
+                ('objeto_id', models.PositiveBigIntegerField(verbose_name='ID del objeto')),
+                ('fecha', models.DateTimeField(auto_now_add=True, verbose_name='Fecha')),
+            ],
+            options={
+                'verbose_name': 'Cambio de Búsqueda',
+                'verbose_name_plural': 'Cambios de Búsqueda',
+                'indexes': [models.Index(fields=['indice', 'fecha'], name='cambio_busqueda_fecha_idx')],
+            },
+        ),
+    ]
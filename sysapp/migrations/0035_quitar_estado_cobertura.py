@@ -0,0 +1,17 @@
+# Generated by Django 5.2.12 on 2026-10-17 01:46
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('sysapp', '0034_cambios_busqueda'),
+    ]
+
+    operations = [
+        migrations.RemoveField(
+            model_name='alumno',
+            name='estado_cobertura',
+        ),
+    ]
@@ -1,12 +1,19 @@
 import os
+import re
+import unicodedata
 import uuid
+from calendar import monthrange
+from datetime import date, timedelta
 from typing import Any
 
 from django.contrib import auth
 from django.contrib.auth.context_processors import auth
 from django.contrib.auth.models import User
+from django.core.exceptions import ValidationError
 from django.core.validators import MinValueValidator
-from django.db import models
+from django.db import models, transaction
+from django.db.models import Case, Count, F, Max, OuterRef, Q, Subquery, Sum, Value, When
+from django.db.models.functions import Coalesce, Length, TruncMonth, Upper
 from django.db.models.signals import post_save
 from django.dispatch import receiver
 from django.utils import timezone
@@ -25,6 +32,36 @@ def path_comprobante_egreso(instance, filename):
     return os.path.join('Comprobantes', 'Egreso', categoria, fecha_str, filename)
 
 
+def normalizar_busqueda(*partes):
+    """Clave de búsqueda: minúsculas, sin tildes y espacios simples. ('José', 'Núñez') → 'jose nunez'."""
+    texto = unicodedata.normalize('NFKD', ' '.join(str(p) for p in partes if p).casefold())
+    return ' '.join(''.join(c for c in texto if not unicodedata.combining(c)).split())
+
+
+def solo_digitos(texto):
+    """'1.234.567' → '1234567'."""
+    return re.sub(r'\D', '', str(texto or ''))
+
+
+def rango_mes(anio, mes):
+    """Primer y último día del mes, para filtrar con fecha__range y aprovechar los índices por fecha."""
+    return date(anio, mes, 1), date(anio, mes, monthrange(anio, mes)[1])
+
+
+def _campos_a_guardar(update_fields, origen, claves):
+    """
+    Las claves de búsqueda se recalculan en save(); si se guarda con
+    update_fields, solo cuando cambian sus campos de origen.
+    Devuelve (recalcular, update_fields ajustado).
+    """
+    if update_fields is None:
+        return True, None
+    update_fields = set(update_fields)
+    if update_fields & set(origen):
+        return True, update_fields | set(claves)
+    return False, update_fields
+
+
 class Sede(models.Model):
     nombre = models.CharField(max_length=200, verbose_name="Nombre")
     direccion = models.TextField(verbose_name="Dirección")
@@ -44,23 +81,13 @@ class Sede(models.Model):
         if fecha is None:
             fecha = timezone.now().date()
 
-        pagos = self.pagos.filter(fecha=fecha)
-        total_ingresos = pagos.aggregate(models.Sum('importe_total'))['importe_total__sum'] or 0
-
-        egresos = self.egresos.filter(fecha=fecha)
-        total_egresos = egresos.aggregate(models.Sum('monto'))['monto__sum'] or 0
-
-        balance = total_ingresos - total_egresos
-
-        return {
-            'total_ingresos': total_ingresos,
-            'total_egresos': total_egresos,
-            'balance': balance,
-            'cantidad_pagos': pagos.count(),
-            'cantidad_egresos': egresos.count(),
-            'pagos': pagos,
-            'egresos': egresos
-        }
+        # Los movimientos del día se leen una sola vez y los totales salen de las mismas filas
+        pagos = list(self.pagos.filter(fecha=fecha).select_related('alumno').order_by('-id'))
+        egresos = list(self.egresos.filter(fecha=fecha).order_by('-id'))
+        rendicion = _totales_movimientos(pagos, egresos)
+        rendicion['pagos'] = pagos
+        rendicion['egresos'] = egresos
+        return rendicion
 
 
 class Carrera(models.Model):
@@ -133,6 +160,9 @@ class Funcionario(models.Model):
     telefono_secundario = models.CharField(max_length=20, blank=True, verbose_name="Teléfono Secundario")
     fecha_ingreso = models.DateField(verbose_name="Fecha de Ingreso")
     activo = models.BooleanField(default=True, verbose_name="Activo")
+    # Claves de búsqueda normalizadas (ver normalizar_busqueda), con índice trigram en PostgreSQL
+    busqueda_nombre = models.CharField(max_length=255, default='', editable=False)
+    cedula_digitos = models.CharField(max_length=20, default='', editable=False)
 
     class Meta:
         verbose_name = "Funcionario"
@@ -142,6 +172,15 @@ class Funcionario(models.Model):
     def __str__(self):
         return f"{self.nombre} {self.apellido} - {self.get_cargo_display()}"
 
+    def save(self, *args, **kwargs):
+        recalcular, kwargs['update_fields'] = _campos_a_guardar(
+            kwargs.get('update_fields'), ('nombre', 'apellido', 'cedula'), ('busqueda_nombre', 'cedula_digitos'),
+        )
+        if recalcular:
+            self.busqueda_nombre = normalizar_busqueda(self.nombre, self.apellido)
+            self.cedula_digitos = solo_digitos(self.cedula)
+        super().save(*args, **kwargs)
+
     @property
     def nombre_completo(self):
         return f"{self.nombre} {self.apellido}"
@@ -151,7 +190,7 @@ class Funcionario(models.Model):
             mes = timezone.now().month
         if anio is None:
             anio = timezone.now().year
-        return self.asistencias.filter(fecha__month=mes, fecha__year=anio)
+        return self.asistencias.filter(fecha__range=rango_mes(anio, mes))
 
     def total_horas_mes(self, mes=None, anio=None):
         """Retorna el total de horas trabajadas en el mes especificado."""
@@ -197,6 +236,86 @@ class AsistenciaFuncionario(models.Model):
         return f"{self.funcionario.nombre_completo} - {self.fecha} - {estado}{horas}"
 
 
+# Días antes del vencimiento en que el alumno pasa a CERCANO_VENCIMIENTO
+DIAS_AVISO_VENCIMIENTO = 10
+
+
+def estado_por_cobertura(cobertura_hasta, hoy=None):
+    """Estado de pagos según la fecha hasta la que el alumno está cubierto."""
+    if cobertura_hasta is None:
+        return 'SIN_PAGOS'
+    if hoy is None:
+        hoy = timezone.now().date()
+    dias = (cobertura_hasta - hoy).days
+    if dias > DIAS_AVISO_VENCIMIENTO:
+        return 'AL_DIA'
+    elif dias >= 0:
+        return 'CERCANO_VENCIMIENTO'
+    else:
+        return 'ATRASADO'
+
+
+class AlumnoQuerySet(models.QuerySet):
+
+    def with_estado_pagos(self, hoy=None):
+        """
+        Anota `vigente_hasta` (último valido_hasta de cuotas) y `estado`
+        (AL_DIA / CERCANO_VENCIMIENTO / ATRASADO / SIN_PAGOS) calculados en SQL,
+        con las mismas reglas que estado_por_cobertura().
+        """
+        if hoy is None:
+            hoy = timezone.now().date()
+        ultima_cobertura = Pago.objects.filter(
+            alumno=OuterRef('pk'),
+            es_matricula=False,
+        ).order_by().values('alumno').annotate(m=Max('valido_hasta')).values('m')
+
+        return self.annotate(
+            vigente_hasta=Subquery(ultima_cobertura, output_field=models.DateField()),
+        ).annotate(
+            estado=Case(
+                When(vigente_hasta__isnull=True, then=Value('SIN_PAGOS')),
+                When(vigente_hasta__gt=hoy + timedelta(days=DIAS_AVISO_VENCIMIENTO), then=Value('AL_DIA')),
+                When(vigente_hasta__gte=hoy, then=Value('CERCANO_VENCIMIENTO')),
+                default=Value('ATRASADO'),
+                output_field=models.CharField(),
+            ),
+        )
+
+    def conteo_por_estado(self):
+        """Cantidad de alumnos por estado en una sola consulta (requiere with_estado_pagos)."""
+        return self.aggregate(
+            total=Count('id'),
+            AL_DIA=Count('id', filter=Q(estado='AL_DIA')),
+            CERCANO_VENCIMIENTO=Count('id', filter=Q(estado='CERCANO_VENCIMIENTO')),
+            ATRASADO=Count('id', filter=Q(estado='ATRASADO')),
+            SIN_PAGOS=Count('id', filter=Q(estado='SIN_PAGOS')),
+        )
+
+    def con_resumen(self):
+        """
+        Anota en la misma consulta del alumno el total pagado y la cobertura
+        vigente (agregados condicionales). El saldo de puntos ya está en saldo_puntos.
+        """
+        cuotas = Q(pagos__es_matricula=False)
+        return self.annotate(
+            resumen_total_pagado=Coalesce(Sum('pagos__importe_total', filter=cuotas), Value(0), output_field=models.DecimalField()),
+            resumen_vigente_hasta=Max('pagos__valido_hasta', filter=cuotas),
+        )
+
+    def buscar(self, texto):
+        """Búsqueda sin distinguir tildes ni mayúsculas sobre las claves normalizadas."""
+        filtro = (
+            Q(busqueda_nombre__contains=normalizar_busqueda(texto)) |
+            Q(carrera__nombre__icontains=texto) |
+            Q(sede__nombre__icontains=texto)
+        )
+        digitos = solo_digitos(texto)
+        if digitos:
+            filtro |= Q(cedula_digitos__contains=digitos)
+        return self.filter(filtro)
+
+
 class Alumno(models.Model):
     uuid = models.UUIDField(default=uuid.uuid4, editable=False, unique=True)
     sede = models.ForeignKey(Sede, on_delete=models.CASCADE, related_name='alumnos')
@@ -213,6 +332,23 @@ class Alumno(models.Model):
     contacto_emergencia_relacion = models.CharField(max_length=50, blank=True, null=True)
     activo = models.BooleanField(default=True)
     fecha_registro = models.DateTimeField(auto_now_add=True, verbose_name="Fecha de Registro")
+    # Snapshot de cobertura, mantenido por las señales de Pago (ver signals.py).
+    # El estado (al día, por vencer, vencido) no se guarda: depende de la fecha
+    # de hoy y se calcula al leer con estado_por_cobertura().
+    cobertura_hasta = models.DateField(null=True, blank=True, editable=False, verbose_name="Cubierto hasta")
+    ultimo_pago = models.ForeignKey(
+        'Pago', on_delete=models.SET_NULL, null=True, blank=True, editable=False,
+        related_name='+', verbose_name="Último pago de cuota",
+    )
+
+    # Saldo de puntos materializado: pagos.puntos - canjes.cantidad (ver recalcular_saldo_puntos)
+    saldo_puntos = models.IntegerField(default=0, editable=False, verbose_name="Saldo de puntos")
+
+    # Claves de búsqueda normalizadas (ver normalizar_busqueda), con índice trigram en PostgreSQL
+    busqueda_nombre = models.CharField(max_length=255, default='', editable=False)
+    cedula_digitos = models.CharField(max_length=20, default='', editable=False)
+
+    objects = AlumnoQuerySet.as_manager()
 
     class Meta:
         verbose_name = "Alumno"
@@ -222,42 +358,29 @@ class Alumno(models.Model):
     def __str__(self):
         return f"{self.nombre} {self.apellido} - {self.carrera.nombre}"
 
+    def save(self, *args, **kwargs):
+        recalcular, kwargs['update_fields'] = _campos_a_guardar(
+            kwargs.get('update_fields'), ('nombre', 'apellido', 'cedula'), ('busqueda_nombre', 'cedula_digitos'),
+        )
+        if recalcular:
+            self.busqueda_nombre = normalizar_busqueda(self.nombre, self.apellido)
+            self.cedula_digitos = solo_digitos(self.cedula)
+        super().save(*args, **kwargs)
+
     @property
     def nombre_completo(self):
         return f"{self.nombre} {self.apellido}"
 
     @property
     def estado_pagos(self):
-        ultimo_pago = self.pagos.filter(
-            es_matricula=False,
-            valido_hasta__isnull=False,
-        ).order_by('-valido_hasta').first()
-
-        if not ultimo_pago:
-            return 'SIN_PAGOS'
-
-        hoy = timezone.now().date()
-        dias = (ultimo_pago.valido_hasta - hoy).days
-
-        if dias > 10:
-            return 'AL_DIA'
-        elif dias >= 0:
-            return 'CERCANO_VENCIMIENTO'
-        else:
-            return 'ATRASADO'
+        return estado_por_cobertura(self.cobertura_hasta)
 
     @property
     def dias_hasta_vencimiento(self):
-        ultimo_pago = self.pagos.filter(
-            es_matricula=False,
-            valido_hasta__isnull=False,
-        ).order_by('-valido_hasta').first()
-
-        if not ultimo_pago:
+        if not self.cobertura_hasta:
             return None
-
         hoy = timezone.now().date()
-        return (ultimo_pago.valido_hasta - hoy).days
+        return (self.cobertura_hasta - hoy).days
 
     @property
     def puede_rendir_examen(self):
@@ -265,9 +388,30 @@ class Alumno(models.Model):
 
     @property
     def total_puntos(self):
-        acumulados = self.pagos.aggregate(models.Sum('puntos'))['puntos__sum'] or 0
-        canjeados = self.canjes.aggregate(models.Sum('cantidad'))['cantidad__sum'] or 0
-        return acumulados - canjeados
+        return self.saldo_puntos
+
+    def recalcular_saldo_puntos(self):
+        """Recalcula el saldo de puntos desde pagos y canjes con la fila del alumno bloqueada."""
+        with transaction.atomic():
+            Alumno.objects.select_for_update().filter(pk=self.pk).values_list('pk').first()
+            acumulados = self.pagos.aggregate(models.Sum('puntos'))['puntos__sum'] or 0
+            canjeados = self.canjes.aggregate(models.Sum('cantidad'))['cantidad__sum'] or 0
+            self.saldo_puntos = acumulados - canjeados
+            Alumno.objects.filter(pk=self.pk).update(saldo_puntos=self.saldo_puntos)
+
+    def actualizar_cobertura(self):
+        """Recalcula el snapshot de cobertura a partir de los pagos y lo guarda."""
+        ultimo = self.pagos.filter(
+            es_matricula=False,
+            valido_hasta__isnull=False,
+        ).order_by('-valido_hasta', '-id').only('id', 'valido_hasta').first()
+
+        self.cobertura_hasta = ultimo.valido_hasta if ultimo else None
+        self.ultimo_pago_id = ultimo.id if ultimo else None
+        Alumno.objects.filter(pk=self.pk).update(
+            cobertura_hasta=self.cobertura_hasta,
+            ultimo_pago_id=self.ultimo_pago_id,
+        )
 
     def obtener_detalle_estado_pagos(self):
         ultimo_pago = self.pagos.order_by('-fecha_vencimiento').first()
@@ -340,11 +484,21 @@ class Pago(models.Model):
     usuario_registro = models.ForeignKey('auth.User', on_delete=models.SET_NULL, null=True, blank=True)
     cuenta_bancaria = models.ForeignKey('CuentaBancaria', on_delete=models.SET_NULL, null=True, blank=True,related_name='pagos', verbose_name="Cuenta bancaria destino")
     tiene_multa   = models.BooleanField(default=False,verbose_name="Tiene multa por pago tardío")
+    # Nombre del alumno y del cliente normalizados (ver normalizar_busqueda), con índice trigram en PostgreSQL
+    busqueda_nombre = models.CharField(max_length=255, default='', editable=False)
 
     class Meta:
         ordering = ['-fecha', '-id']
         verbose_name = "Pago"
         verbose_name_plural = "Pagos"
+        indexes = [
+            # Estado de pagos / cobertura: última cuota (no matrícula) por alumno
+            models.Index(fields=['alumno', 'valido_hasta'], condition=Q(es_matricula=False), name='pago_alumno_cuota_idx'),
+            # Caja, informe y rendición por sede y rango de fechas
+            models.Index(fields=['sede', 'fecha'], name='pago_sede_fecha_idx'),
+            # Listados ordenados por Meta.ordering
+            models.Index(fields=['-fecha', '-id'], name='pago_fecha_id_idx'),
+        ]
 
     def __str__(self):
         numero = self.numero_recibo or "Sin recibo"
@@ -369,7 +523,8 @@ class Pago(models.Model):
         else:
             return 0
 
-    def save(self, *args, **kwargs):
+    def aplicar_puntos_y_multa(self):
+        """Puntos y multa por pago tardío (cuotas de carreras TS), sin consultas si la carrera ya está cargada."""
         if self.es_matricula:
             self.puntos = 0
             self.tiene_multa = False
@@ -384,8 +539,22 @@ class Pago(models.Model):
             else:
                 self.tiene_multa = False
 
+    def save(self, *args, **kwargs):
+        self.aplicar_puntos_y_multa()
+
+        recalcular, kwargs['update_fields'] = _campos_a_guardar(
+            kwargs.get('update_fields'), ('alumno', 'nombre_cliente'), ('busqueda_nombre',),
+        )
+        if recalcular:
+            self.busqueda_nombre = self.clave_busqueda()
+
         super().save(*args, **kwargs)
 
+    def clave_busqueda(self, nombre_alumno=None):
+        if nombre_alumno is None:
+            nombre_alumno = self.alumno.nombre_completo if self.alumno_id else ''
+        return normalizar_busqueda(nombre_alumno, self.nombre_cliente)
+
     @property
     def es_cliente_diferenciado(self):
         return self.nombre_cliente is not None and self.nombre_cliente != ''
@@ -412,6 +581,113 @@ class Pago(models.Model):
         dias = self.dias_para_vencimiento
         return dias is not None and dias < 0
 
+class SecuenciaRecibo(models.Model):
+    """
+    Numeración de recibos de una sede (o de un talonario de la sede). Cada
+    asignación es un UPDATE siguiente = siguiente + n sobre esta fila: no
+    lee pagos ni reintenta ante duplicados, y el bloqueo dura lo que la
+    transacción corta de reservar(). Como en una secuencia de base de datos,
+    un número reservado y no usado queda como hueco.
+
+    numero_recibo es único en todas las sedes: cada secuencia tiene su propio
+    prefijo, que termina en algo que no es un dígito, así dos secuencias nunca
+    generan el mismo número.
+    """
+    sede = models.ForeignKey(Sede, on_delete=models.CASCADE, related_name='secuencias_recibo', verbose_name="Sede")
+    serie = models.CharField(max_length=20, default='', blank=True, verbose_name="Serie / talonario")
+    prefijo = models.CharField(max_length=20, unique=True, verbose_name="Prefijo",
+                               help_text="Se antepone al número y no se repite entre secuencias, p. ej. 'CEN-'")
+    digitos = models.PositiveSmallIntegerField(default=6, verbose_name="Dígitos",
+                                               help_text="Ancho mínimo del número, completado con ceros")
+    siguiente = models.PositiveIntegerField(default=1, verbose_name="Siguiente número")
+    activa = models.BooleanField(default=True, verbose_name="Activa")
+
+    class Meta:
+        verbose_name = "Secuencia de Recibos"
+        verbose_name_plural = "Secuencias de Recibos"
+        ordering = ['sede', 'serie']
+        constraints = [
+            models.UniqueConstraint(fields=['sede', 'serie'], name='secuencia_sede_serie_uniq'),
+            models.CheckConstraint(condition=~Q(prefijo=''), name='secuencia_prefijo_no_vacio'),
+        ]
+
+    def __str__(self):
+        serie = f" ({self.serie})" if self.serie else ""
+        return f"{self.sede}{serie}: {self.formatear(self.siguiente)}"
+
+    def clean(self):
+        if not self.prefijo or self.prefijo[-1].isdigit():
+            raise ValidationError({'prefijo': "El prefijo debe terminar en una letra o un símbolo, p. ej. 'CEN-'."})
+        usado = self.ultimo_usado()
+        if self.siguiente is not None and self.siguiente <= usado:
+            raise ValidationError({
+                'siguiente': f'El recibo {self.formatear(usado)} ya está asignado: el siguiente número debe ser mayor a {usado}.'
+            })
+
+    def ultimo_usado(self):
+        """Mayor número con este prefijo ya entregado por la secuencia o cargado en un pago (0 si no hay)."""
+        ultimo = 0
+        if self.pk:
+            anterior = SecuenciaRecibo.objects.filter(pk=self.pk).values('prefijo', 'siguiente').first()
+            if anterior and anterior['prefijo'] == self.prefijo:
+                ultimo = anterior['siguiente'] - 1
+        # Con ceros a la izquierda, el número más alto es el más largo y, entre iguales, el mayor
+        recibo = Pago.objects.filter(
+            numero_recibo__regex=rf'^{re.escape(self.prefijo)}[0-9]+$',
+        ).annotate(largo=Length('numero_recibo')).order_by('-largo', '-numero_recibo').values_list('numero_recibo', flat=True).first()
+        if recibo:
+            ultimo = max(ultimo, int(recibo[len(self.prefijo):]))
+        return ultimo
+
+    @classmethod
+    def para_sede(cls, sede_id, serie=None):
+        """Secuencia activa de la sede (la de `serie` o, si no se indica, la primera)."""
+        secuencias = cls.objects.filter(sede_id=sede_id, activa=True)
+        if serie is not None:
+            secuencias = secuencias.filter(serie=serie)
+        return secuencias.order_by('id').first()
+
+    def formatear(self, numero):
+        return f"{self.prefijo}{numero:0{self.digitos}d}"
+
+    def reservar(self, cantidad=1):
+        """Asigna `cantidad` números consecutivos y los devuelve formateados."""
+        if cantidad < 1:
+            raise ValueError('La cantidad a reservar debe ser mayor a 0.')
+        with transaction.atomic():
+            SecuenciaRecibo.objects.filter(pk=self.pk).update(siguiente=F('siguiente') + cantidad)
+            self.siguiente = SecuenciaRecibo.objects.filter(pk=self.pk).values_list('siguiente', flat=True).get()
+        desde = self.siguiente - cantidad
+        return [self.formatear(numero) for numero in range(desde, self.siguiente)]
+
+
+class ReservaRecibos(models.Model):
+    """Bloque de números reservado para un talonario en papel (carga posterior o sin conexión)."""
+    secuencia = models.ForeignKey(SecuenciaRecibo, on_delete=models.CASCADE, related_name='reservas')
+    desde = models.CharField(max_length=50, verbose_name="Desde")
+    hasta = models.CharField(max_length=50, verbose_name="Hasta")
+    cantidad = models.PositiveIntegerField(verbose_name="Cantidad")
+    usuario = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, related_name='reservas_recibos')
+    fecha = models.DateTimeField(auto_now_add=True)
+    observaciones = models.CharField(max_length=200, blank=True, default='')
+
+    class Meta:
+        ordering = ['-fecha']
+        verbose_name = "Reserva de Recibos"
+        verbose_name_plural = "Reservas de Recibos"
+
+    def __str__(self):
+        return f"{self.secuencia.sede}: {self.desde} – {self.hasta}"
+
+    @classmethod
+    def reservar(cls, secuencia, cantidad, usuario=None, observaciones=''):
+        numeros = secuencia.reservar(cantidad)
+        return cls.objects.create(
+            secuencia=secuencia, desde=numeros[0], hasta=numeros[-1], cantidad=cantidad,
+            usuario=usuario, observaciones=observaciones,
+        )
+
+
 class CanjeEstrellas(models.Model):
     alumno = models.ForeignKey(Alumno, on_delete=models.CASCADE, related_name='canjes', verbose_name="Alumno")
     cantidad = models.IntegerField(validators=[MinValueValidator(1)], verbose_name="Cantidad de Puntos")
@@ -427,16 +703,33 @@ class CanjeEstrellas(models.Model):
     def __str__(self):
         return f"{self.alumno.nombre_completo} - {self.cantidad} ★ pts - {self.concepto}"
 
+    def clean(self):
+        from django.core.exceptions import ValidationError
+        if not self.pk and self.alumno_id and self.cantidad and self.alumno.saldo_puntos < self.cantidad:
+            raise ValidationError(
+                f"El alumno solo tiene {self.alumno.saldo_puntos} puntos disponibles. "
+                f"No puede canjear {self.cantidad} puntos."
+            )
+
     def save(self, *args, **kwargs):
-        if not self.pk:
-            puntos_disponibles = self.alumno.total_puntos
-            if puntos_disponibles < self.cantidad:
+        if self.pk:
+            super().save(*args, **kwargs)
+            self.alumno.recalcular_saldo_puntos()
+            return
+
+        # Canje nuevo: verificar saldo e insertar con la fila del alumno bloqueada,
+        # para que dos canjes simultáneos no puedan gastar los mismos puntos.
+        with transaction.atomic():
+            alumno = Alumno.objects.select_for_update().only('id', 'saldo_puntos').get(pk=self.alumno_id)
+            if alumno.saldo_puntos < self.cantidad:
                 from django.core.exceptions import ValidationError
                 raise ValidationError(
-                    f"El alumno solo tiene {puntos_disponibles} puntos disponibles. "
+                    f"El alumno solo tiene {alumno.saldo_puntos} puntos disponibles. "
                     f"No puede canjear {self.cantidad} puntos."
                 )
-        super().save(*args, **kwargs)
+            super().save(*args, **kwargs)
+            Alumno.objects.filter(pk=alumno.pk).update(saldo_puntos=F('saldo_puntos') - self.cantidad)
+            self.alumno.saldo_puntos = alumno.saldo_puntos - self.cantidad
 
 
 class Egreso(models.Model):
@@ -470,15 +763,29 @@ class Egreso(models.Model):
         verbose_name="Funcionario",
         help_text="Seleccionar si el egreso corresponde al sueldo de un funcionario",
     )
+    # Concepto normalizado (ver normalizar_busqueda), con índice trigram en PostgreSQL
+    busqueda_concepto = models.TextField(default='', editable=False)
 
     class Meta:
         ordering = ['-fecha', '-id']
         verbose_name = "Egreso"
         verbose_name_plural = "Egresos"
+        indexes = [
+            models.Index(fields=['sede', 'fecha'], name='egreso_sede_fecha_idx'),
+            models.Index(fields=['-fecha', '-id'], name='egreso_fecha_id_idx'),
+        ]
 
     def __str__(self):
         return f"Egreso {self.numero_comprobante} - {self.concepto[:30]} - Gs. {self.monto:,.0f}"
 
+    def save(self, *args, **kwargs):
+        recalcular, kwargs['update_fields'] = _campos_a_guardar(
+            kwargs.get('update_fields'), ('concepto',), ('busqueda_concepto',),
+        )
+        if recalcular:
+            self.busqueda_concepto = normalizar_busqueda(self.concepto)
+        super().save(*args, **kwargs)
+
     def clean(self):
         from django.core.exceptions import ValidationError
         if self.monto and self.monto < 0:
@@ -512,6 +819,10 @@ class SolicitudEliminacion(models.Model):
         ordering = ['-fecha_solicitud']
         verbose_name = "Solicitud de Eliminación"
         verbose_name_plural = "Solicitudes de Eliminación"
+        indexes = [
+            # Bandeja y notificaciones: solo interesan las pendientes
+            models.Index(fields=['-fecha_solicitud'], condition=Q(estado='PENDIENTE'), name='solicitud_pendiente_idx'),
+        ]
 
     def __str__(self):
         return f"Solicitud de {self.usuario_solicita.username} - {self.get_modelo_display()} (ID: {self.objeto_id})"
@@ -540,27 +851,536 @@ class CuentaBancaria(models.Model):
         verbose_name = "Cuenta Bancaria"
         verbose_name_plural = "Cuentas Bancarias"
         ordering = ['-fecha_creacion']
+        indexes = [
+            # get_or_create(entidad__iexact=..., titular__iexact=...) compara UPPER(...) en PostgreSQL
+            models.Index(Upper('entidad'), Upper('titular'), name='cuenta_entidad_titular_ci_idx'),
+        ]
 
     def __str__(self):
         return f"{self.entidad} — {self.titular}"
 
 
+class ExtractoBancario(models.Model):
+    """Extracto CSV importado de una cuenta; sus líneas quedan en MovimientoBancario (ver conciliacion.py)."""
+    cuenta = models.ForeignKey(CuentaBancaria, on_delete=models.CASCADE, related_name='extractos')
+    archivo = models.CharField(max_length=255, verbose_name="Archivo")
+    # SHA-256 del contenido: el mismo extracto no se importa dos veces
+    huella = models.CharField(max_length=64, editable=False)
+    usuario = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, related_name='extractos')
+    fecha_importacion = models.DateTimeField(auto_now_add=True)
+    fecha_desde = models.DateField(null=True, blank=True, verbose_name="Desde")
+    fecha_hasta = models.DateField(null=True, blank=True, verbose_name="Hasta")
+    cantidad_movimientos = models.IntegerField(default=0)
+    cantidad_conciliados = models.IntegerField(default=0)
+
+    class Meta:
+        ordering = ['-fecha_importacion']
+        verbose_name = "Extracto Bancario"
+        verbose_name_plural = "Extractos Bancarios"
+        constraints = [
+            models.UniqueConstraint(fields=['cuenta', 'huella'], name='extracto_cuenta_huella_uniq'),
+        ]
+
+    def __str__(self):
+        return f"{self.cuenta} - {self.archivo}"
+
+    @property
+    def cantidad_pendientes(self):
+        return self.cantidad_movimientos - self.cantidad_conciliados
+
+
+class MovimientoBancario(models.Model):
+    """Crédito de un extracto y su resultado de conciliación contra los pagos por depósito."""
+    ESTADO_CHOICES = [
+        ('CONCILIADO', 'Conciliado'),
+        ('AMBIGUO', 'Varios pagos posibles'),
+        ('PENDIENTE', 'Sin coincidencia'),
+    ]
+
+    extracto = models.ForeignKey(ExtractoBancario, on_delete=models.CASCADE, related_name='movimientos')
+    cuenta = models.ForeignKey(CuentaBancaria, on_delete=models.CASCADE, related_name='movimientos')
+    linea = models.IntegerField(verbose_name="Línea")
+    fecha = models.DateField(verbose_name="Fecha")
+    monto = models.DecimalField(max_digits=15, decimal_places=0, verbose_name="Monto")
+    referencia = models.CharField(max_length=100, blank=True, default='', verbose_name="Referencia")
+    descripcion = models.CharField(max_length=255, blank=True, default='', verbose_name="Descripción")
+    estado = models.CharField(max_length=10, choices=ESTADO_CHOICES, default='PENDIENTE')
+    pago = models.ForeignKey(Pago, on_delete=models.SET_NULL, null=True, blank=True, related_name='movimientos_bancarios')
+    # Pagos del mismo monto dentro de la ventana de fechas al importar
+    candidatos = models.IntegerField(default=0)
+    usuario_concilia = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, related_name='+')
+
+    class Meta:
+        ordering = ['extracto', 'linea']
+        verbose_name = "Movimiento Bancario"
+        verbose_name_plural = "Movimientos Bancarios"
+        indexes = [
+            # Revisión de un extracto por estado
+            models.Index(fields=['extracto', 'estado', 'linea'], name='movimiento_extracto_estado_idx'),
+        ]
+        constraints = [
+            # Un pago se concilia con un solo movimiento
+            models.UniqueConstraint(fields=['pago'], condition=Q(pago__isnull=False), name='movimiento_pago_uniq'),
+        ]
+
+    def __str__(self):
+        return f"{self.fecha} {self.monto} ({self.get_estado_display()})"
+
+
+class CierreCajaQuerySet(models.QuerySet):
+
+    def puntos_de_control(self):
+        """Cierres con rango de fechas (los anteriores a los puntos de control no lo tienen)."""
+        return self.filter(fecha_desde__isnull=False, fecha_hasta__isnull=False)
+
+    def vigentes(self):
+        """
+        Puntos de control en uso: si dos cierres de una sede se superponen
+        (p. ej. la caja del día se cerró dos veces), vale el más reciente.
+        """
+        tomados, vigentes = {}, []
+        for cierre in self.puntos_de_control().order_by('-fecha_cierre', '-id'):
+            tramos = tomados.setdefault(cierre.sede_id, [])
+            if any(cierre.fecha_desde <= hasta and desde <= cierre.fecha_hasta for desde, hasta in tramos):
+                continue
+            tramos.append((cierre.fecha_desde, cierre.fecha_hasta))
+            vigentes.append(cierre)
+        return vigentes
+
+
 class CierreCaja(models.Model):
+    """
+    Punto de control inmutable de la caja de una sede: totales y cantidades
+    de los días fecha_desde..fecha_hasta al momento del cierre. Los totales de
+    un período suman los cierres vigentes y solo leen los días no cerrados
+    (ver totales_periodo). Solo cubren días terminados, y los pagos y egresos
+    de un día cubierto no se pueden agregar, mover ni borrar
+    (verificar_caja_abierta, llamado desde signals.py y los formularios);
+    `manage.py verificar_cierres` detecta cierres cuyos movimientos cambiaron
+    por otras vías.
+    """
     sede = models.ForeignKey('Sede', on_delete=models.CASCADE, related_name='cierres')
     usuario = models.ForeignKey(User, on_delete=models.CASCADE, related_name='cierres')
     fecha_cierre = models.DateTimeField(default=timezone.now)
+    fecha_desde = models.DateField(null=True, blank=True, verbose_name="Desde")
+    fecha_hasta = models.DateField(null=True, blank=True, verbose_name="Hasta")
     total_ingresos = models.DecimalField(max_digits=15, decimal_places=0)
+    total_efectivo = models.DecimalField(max_digits=15, decimal_places=0, default=0)
+    total_deposito = models.DecimalField(max_digits=15, decimal_places=0, default=0)
     total_egresos = models.DecimalField(max_digits=15, decimal_places=0)
+    cantidad_pagos = models.IntegerField(default=0)
+    cantidad_egresos = models.IntegerField(default=0)
     balance = models.DecimalField(max_digits=15, decimal_places=0)
 
+    objects = CierreCajaQuerySet.as_manager()
+
     class Meta:
         verbose_name = "Cierre de Caja"
         verbose_name_plural = "Cierres de Caja"
         ordering = ['-fecha_cierre']
+        indexes = [
+            models.Index(fields=['sede', 'fecha_desde', 'fecha_hasta'], name='cierre_sede_rango_idx'),
+        ]
 
     def __str__(self):
         return f"Cierre {self.sede.nombre} - {self.fecha_cierre.strftime('%d/%m/%Y %H:%M')}"
 
+    def save(self, *args, **kwargs):
+        if not self._state.adding:
+            raise ValueError('Un cierre de caja no se modifica: registrá un nuevo cierre.')
+        super().save(*args, **kwargs)
+
+    @classmethod
+    def cerrar(cls, sede, usuario, desde, hasta):
+        """
+        Registra el cierre de `sede` para desde..hasta con los totales de los
+        movimientos actuales. Si el período incluye hoy (o días futuros) el
+        cierre queda solo como registro, sin rango: el día todavía puede
+        recibir movimientos y no sirve como punto de control.
+        """
+        totales = _con_balance({})
+        for grupo in movimientos_por_dia(filtro_rango(desde, hasta, sede.pk)).values():
+            for campo in CAMPOS_TOTALES:
+                totales[campo] += grupo[campo]
+        totales['balance'] = totales['total_ingresos'] - totales['total_egresos']
+        if hasta >= timezone.localdate():
+            desde = hasta = None
+        return cls.objects.create(sede=sede, usuario=usuario, fecha_desde=desde, fecha_hasta=hasta, **totales)
+
+    @classmethod
+    def cubre(cls, sede_id, fecha):
+        """True si algún punto de control de la sede incluye `fecha`."""
+        return cls.objects.puntos_de_control().filter(
+            sede_id=sede_id, fecha_desde__lte=fecha, fecha_hasta__gte=fecha,
+        ).exists()
+
+    def totales(self):
+        return _con_balance({campo: getattr(self, campo) for campo in CAMPOS_TOTALES})
+
+
+def verificar_caja_abierta(sede_id, fecha):
+    """ValidationError si la caja de la sede está cerrada en `fecha`."""
+    if sede_id and fecha and CierreCaja.cubre(sede_id, fecha):
+        raise ValidationError(
+            f'La caja del {fecha:%d/%m/%Y} ya está cerrada para esta sede: '
+            f'no admite movimientos nuevos, cambios ni eliminaciones.'
+        )
+
+
+CAMPOS_TOTALES = (
+    'total_ingresos', 'total_efectivo', 'total_deposito',
+    'total_egresos', 'cantidad_pagos', 'cantidad_egresos',
+)
+
+
+def _con_balance(totales):
+    totales = {campo: totales.get(campo) or 0 for campo in CAMPOS_TOTALES}
+    totales['balance'] = totales['total_ingresos'] - totales['total_egresos']
+    return totales
+
+
+def filtro_rango(desde=None, hasta=None, sede_id=None):
+    filtro = Q()
+    if desde:
+        filtro &= Q(fecha__gte=desde)
+    if hasta:
+        filtro &= Q(fecha__lte=hasta)
+    if sede_id:
+        filtro &= Q(sede_id=sede_id)
+    return filtro
+
+
+def movimientos_por_dia(filtro):
+    """{(sede_id, fecha): totales} calculados desde Pago y Egreso, con un GROUP BY por tabla."""
+    grupos = {}
+    ingresos = Pago.objects.filter(filtro).order_by().values('sede_id', 'fecha').annotate(
+        total_ingresos=Sum('importe_total'),
+        total_efectivo=Sum('monto_efectivo'),
+        total_deposito=Sum('monto_deposito'),
+        cantidad_pagos=Count('id'),
+    )
+    egresos = Egreso.objects.filter(filtro).order_by().values('sede_id', 'fecha').annotate(
+        total_egresos=Sum('monto'),
+        cantidad_egresos=Count('id'),
+    )
+    for grupo in list(ingresos) + list(egresos):
+        clave = (grupo.pop('sede_id'), grupo.pop('fecha'))
+        grupos.setdefault(clave, {}).update(grupo)
+    return {clave: _con_balance(grupo) for clave, grupo in grupos.items()}
+
+
+def _totales_movimientos(pagos, egresos):
+    """Los mismos totales que ResumenDiario, calculados sobre pagos y egresos ya leídos."""
+    return _con_balance({
+        'total_ingresos': sum(p.importe_total or 0 for p in pagos),
+        'total_efectivo': sum(p.monto_efectivo or 0 for p in pagos),
+        'total_deposito': sum(p.monto_deposito or 0 for p in pagos),
+        'total_egresos': sum(e.monto or 0 for e in egresos),
+        'cantidad_pagos': len(pagos),
+        'cantidad_egresos': len(egresos),
+    })
+
+
+class ResumenDiarioQuerySet(models.QuerySet):
+
+    def totales(self):
+        """Suma de las filas del queryset (un rango de días y/o sedes) en una sola consulta."""
+        t = self.aggregate(
+            total_ingresos=Sum('total_ingresos'),
+            total_efectivo=Sum('total_efectivo'),
+            total_deposito=Sum('total_deposito'),
+            total_egresos=Sum('total_egresos'),
+            cantidad_pagos=Sum('cantidad_pagos'),
+            cantidad_egresos=Sum('cantidad_egresos'),
+        )
+        return _con_balance(t)
+
+    def por_sede(self):
+        """Totales agrupados por sede (GROUP BY sede_id): {sede_id: totales}."""
+        grupos = self.order_by().values('sede_id').annotate(
+            total_ingresos=Sum('total_ingresos'),
+            total_efectivo=Sum('total_efectivo'),
+            total_deposito=Sum('total_deposito'),
+            total_egresos=Sum('total_egresos'),
+            cantidad_pagos=Sum('cantidad_pagos'),
+            cantidad_egresos=Sum('cantidad_egresos'),
+        )
+        return {g.pop('sede_id'): _con_balance(g) for g in grupos}
+
+
+class ResumenDiario(models.Model):
+    """
+    Totales de caja por sede y día, mantenidos en forma incremental por las
+    señales de Pago y Egreso (ver signals.py). Los totales de un rango cuestan
+    una fila por día en lugar de una por movimiento.
+    `manage.py recalcular_resumen_diario` lo reconstruye desde los movimientos.
+    """
+    sede = models.ForeignKey(Sede, on_delete=models.CASCADE, related_name='resumenes_diarios')
+    fecha = models.DateField()
+    total_ingresos = models.DecimalField(max_digits=15, decimal_places=0, default=0)
+    total_efectivo = models.DecimalField(max_digits=15, decimal_places=0, default=0)
+    total_deposito = models.DecimalField(max_digits=15, decimal_places=0, default=0)
+    total_egresos = models.DecimalField(max_digits=15, decimal_places=0, default=0)
+    cantidad_pagos = models.IntegerField(default=0)
+    cantidad_egresos = models.IntegerField(default=0)
+
+    objects = ResumenDiarioQuerySet.as_manager()
+
+    class Meta:
+        verbose_name = "Resumen Diario"
+        verbose_name_plural = "Resúmenes Diarios"
+        ordering = ['-fecha']
+        constraints = [
+            models.UniqueConstraint(fields=['sede', 'fecha'], name='resumen_diario_sede_fecha_uniq'),
+        ]
+
+    def __str__(self):
+        return f"{self.sede} - {self.fecha:%d/%m/%Y}"
+
+    @classmethod
+    def acumular(cls, sede_id, fecha, **variaciones):
+        """
+        Suma `variaciones` (campo → delta) a la fila sede × fecha. Solo se crea
+        la fila si hay algo que sumar: al restar (ediciones, eliminaciones en
+        cascada) nunca se insertan filas nuevas.
+        """
+        variaciones = {campo: delta for campo, delta in variaciones.items() if delta}
+        if not variaciones or sede_id is None or fecha is None:
+            return
+        with transaction.atomic():
+            filas = cls.objects.filter(sede_id=sede_id, fecha=fecha)
+            actualizadas = filas.update(**{campo: F(campo) + delta for campo, delta in variaciones.items()})
+            if not actualizadas and any(delta > 0 for delta in variaciones.values()):
+                cls.objects.get_or_create(sede_id=sede_id, fecha=fecha)
+                filas.update(**{campo: F(campo) + delta for campo, delta in variaciones.items()})
+
+    @classmethod
+    def reconstruir(cls, desde=None, hasta=None, sede_id=None):
+        """Recalcula desde Pago y Egreso las filas del rango dado. Devuelve la cantidad de filas."""
+        filtro = filtro_rango(desde, hasta, sede_id)
+        filas = [
+            cls(sede_id=sede, fecha=fecha, **{campo: grupo[campo] for campo in CAMPOS_TOTALES})
+            for (sede, fecha), grupo in movimientos_por_dia(filtro).items()
+        ]
+
+        with transaction.atomic():
+            cls.objects.filter(filtro).delete()
+            cls.objects.bulk_create(filas, batch_size=1000)
+        return len(filas)
+
+
+def primer_dia_mes(fecha):
+    return fecha.replace(day=1)
+
+
+class CuboMensual(models.Model):
+    """
+    Base de los cubos financieros: una fila por combinación de dimensiones y
+    mes, con las medidas ya sumadas. Se mantienen en forma incremental con
+    las señales de Pago y Egreso (ver signals.py) y se consultan con
+    sysapp.cubo; `manage.py recalcular_cubo` los reconstruye.
+    """
+    DIMENSIONES = ()
+    MEDIDAS = {}
+    ORIGEN = None
+
+    mes = models.DateField(verbose_name="Mes", help_text="Primer día del mes")
+    cantidad = models.IntegerField(default=0)
+
+    class Meta:
+        abstract = True
+        ordering = ['-mes']
+
+    @classmethod
+    def acumular(cls, dimensiones, **variaciones):
+        """Suma `variaciones` a la celda `dimensiones` (incluye 'mes'); como ResumenDiario.acumular."""
+        variaciones = {campo: delta for campo, delta in variaciones.items() if delta}
+        if not variaciones or dimensiones.get('sede_id') is None or dimensiones.get('mes') is None:
+            return
+        with transaction.atomic():
+            filas = cls.objects.filter(**dimensiones)
+            actualizadas = filas.update(**{campo: F(campo) + delta for campo, delta in variaciones.items()})
+            if not actualizadas and any(delta > 0 for delta in variaciones.values()):
+                cls.objects.get_or_create(**dimensiones)
+                filas.update(**{campo: F(campo) + delta for campo, delta in variaciones.items()})
+            elif variaciones.get('cantidad', 0) < 0:
+                # Celdas vacías fuera: el pivote no muestra filas en cero
+                filas.filter(cantidad__lte=0).delete()
+
+    @classmethod
+    def reconstruir(cls, desde=None, hasta=None):
+        """Recalcula los meses completos que tocan desde..hasta. Devuelve la cantidad de celdas."""
+        filtro, filtro_cubo = Q(), Q()
+        if desde:
+            filtro &= Q(fecha__gte=primer_dia_mes(desde))
+            filtro_cubo &= Q(mes__gte=primer_dia_mes(desde))
+        if hasta:
+            ultimo = rango_mes(hasta.year, hasta.month)[1]
+            filtro &= Q(fecha__lte=ultimo)
+            filtro_cubo &= Q(mes__lte=ultimo)
+
+        grupos = cls.ORIGEN.objects.filter(filtro).order_by().values(
+            *cls.DIMENSIONES, mes=TruncMonth('fecha'),
+        ).annotate(cantidad=Count('id'), **{medida: Sum(campo) for medida, campo in cls.MEDIDAS.items()})
+        celdas = [
+            cls(**{campo: (valor or 0) if campo in cls.MEDIDAS else valor for campo, valor in grupo.items()})
+            for grupo in grupos
+        ]
+        with transaction.atomic():
+            cls.objects.filter(filtro_cubo).delete()
+            cls.objects.bulk_create(celdas, batch_size=1000)
+        return len(celdas)
+
+
+class CuboIngresoMensual(CuboMensual):
+    """Ingresos por sede × carrera × método de pago × mes."""
+    DIMENSIONES = ('sede_id', 'carrera_id', 'metodo_pago')
+    MEDIDAS = {'importe_total': 'importe_total', 'monto_efectivo': 'monto_efectivo', 'monto_deposito': 'monto_deposito'}
+    ORIGEN = Pago
+
+    sede = models.ForeignKey(Sede, on_delete=models.CASCADE, related_name='+')
+    carrera = models.ForeignKey(Carrera, on_delete=models.CASCADE, null=True, blank=True, related_name='+')
+    metodo_pago = models.CharField(max_length=20, choices=Pago.METODO_PAGO_CHOICES)
+    importe_total = models.DecimalField(max_digits=15, decimal_places=0, default=0)
+    monto_efectivo = models.DecimalField(max_digits=15, decimal_places=0, default=0)
+    monto_deposito = models.DecimalField(max_digits=15, decimal_places=0, default=0)
+
+    class Meta(CuboMensual.Meta):
+        verbose_name = "Cubo de Ingresos Mensual"
+        verbose_name_plural = "Cubo de Ingresos Mensual"
+        constraints = [
+            models.UniqueConstraint(
+                fields=['sede', 'carrera', 'metodo_pago', 'mes'], name='cubo_ingreso_celda_uniq',
+                condition=Q(carrera__isnull=False),
+            ),
+            models.UniqueConstraint(
+                fields=['sede', 'metodo_pago', 'mes'], name='cubo_ingreso_sin_carrera_uniq',
+                condition=Q(carrera__isnull=True),
+            ),
+        ]
+        indexes = [models.Index(fields=['mes', 'sede'], name='cubo_ingreso_mes_sede_idx')]
+
+
+class CuboEgresoMensual(CuboMensual):
+    """Egresos por sede × categoría × mes."""
+    DIMENSIONES = ('sede_id', 'categoria')
+    MEDIDAS = {'monto': 'monto'}
+    ORIGEN = Egreso
+
+    sede = models.ForeignKey(Sede, on_delete=models.CASCADE, related_name='+')
+    categoria = models.CharField(max_length=20, choices=Egreso.CATEGORIA_CHOICES)
+    monto = models.DecimalField(max_digits=15, decimal_places=0, default=0)
+
+    class Meta(CuboMensual.Meta):
+        verbose_name = "Cubo de Egresos Mensual"
+        verbose_name_plural = "Cubo de Egresos Mensual"
+        constraints = [
+            models.UniqueConstraint(fields=['sede', 'categoria', 'mes'], name='cubo_egreso_celda_uniq'),
+        ]
+        indexes = [models.Index(fields=['mes', 'sede'], name='cubo_egreso_mes_sede_idx')]
+
+
+class ContadorInvalidacion(models.Model):
+    """
+    Versión de un espacio de caché ('referencias:sedes', 'notificaciones',
+    'busqueda:pago', ...). Se incrementa en cada escritura que lo invalida y
+    todos los workers la leen de aquí (ver invalidacion.py).
+    """
+    espacio = models.CharField(max_length=100, unique=True, verbose_name="Espacio")
+    version = models.PositiveBigIntegerField(default=0, verbose_name="Versión")
+    actualizado = models.DateTimeField(auto_now=True, verbose_name="Actualizado")
+
+    class Meta:
+        verbose_name = "Contador de Invalidación"
+        verbose_name_plural = "Contadores de Invalidación"
+        ordering = ['espacio']
+
+    def __str__(self):
+        return f"{self.espacio} v{self.version}"
+
+
+class CambioBusqueda(models.Model):
+    """
+    Fila cuyo texto buscable cambió (o que se eliminó). Los demás workers
+    releen solo estas filas para poner al día su índice en memoria, en lugar
+    de descartarlo entero (ver busqueda.py). Se purgan al pasar la retención.
+    """
+    indice = models.CharField(max_length=20, verbose_name="Índice")
+    objeto_id = models.PositiveBigIntegerField(verbose_name="ID del objeto")
+    fecha = models.DateTimeField(auto_now_add=True, verbose_name="Fecha")
+
+    class Meta:
+        verbose_name = "Cambio de Búsqueda"
+        verbose_name_plural = "Cambios de Búsqueda"
+        indexes = [models.Index(fields=['indice', 'fecha'], name='cambio_busqueda_fecha_idx')]
+
+    def __str__(self):
+        return f"{self.indice} #{self.objeto_id}"
+
+
+def rendicion_sedes(fecha, sedes=None):
+    """
+    Totales y cantidades del día para varias sedes en una sola consulta
+    agrupada por sede. `sedes` acepta un queryset, instancias o ids; por
+    defecto, las sedes activas. Devuelve {sede_id: totales}, con ceros para
+    las sedes sin movimientos.
+    """
+    if sedes is None:
+        sedes = Sede.objects.filter(activa=True)
+    if isinstance(sedes, models.QuerySet):
+        sede_ids = list(sedes.values_list('pk', flat=True))
+    else:
+        sede_ids = [getattr(s, 'pk', s) for s in sedes]
+    por_sede = ResumenDiario.objects.filter(fecha=fecha, sede_id__in=sede_ids).por_sede()
+    return {sede_id: por_sede.get(sede_id) or _con_balance({}) for sede_id in sede_ids}
+
+
+def _tramos_cerrados(cierres):
+    """{sede_id: [(desde, hasta), ...]} uniendo los cierres de días contiguos."""
+    tramos = {}
+    for cierre in sorted(cierres, key=lambda c: (c.sede_id, c.fecha_desde)):
+        lista = tramos.setdefault(cierre.sede_id, [])
+        if lista and cierre.fecha_desde <= lista[-1][1] + timedelta(days=1):
+            lista[-1] = (lista[-1][0], max(lista[-1][1], cierre.fecha_hasta))
+        else:
+            lista.append((cierre.fecha_desde, cierre.fecha_hasta))
+    return tramos
+
+
+def totales_periodo(desde=None, hasta=None, sede_id=None):
+    """
+    Totales de caja de desde..hasta (sin `desde`, desde el inicio): los
+    cierres vigentes contenidos en el período aportan sus totales guardados y
+    solo los días no cerrados se suman del resumen diario.
+    """
+    # La vigencia se decide entre todos los cierres que tocan el período,
+    # y de esos se usan solo los que quedan completos dentro de él
+    cierres = CierreCaja.objects.filter(filtro_rango(sede_id=sede_id))
+    if desde:
+        cierres = cierres.filter(fecha_hasta__gte=desde)
+    if hasta:
+        cierres = cierres.filter(fecha_desde__lte=hasta)
+    vigentes = [
+        c for c in cierres.vigentes()
+        if (not desde or c.fecha_desde >= desde) and (not hasta or c.fecha_hasta <= hasta)
+    ]
+
+    resumen = ResumenDiario.objects.filter(filtro_rango(desde, hasta, sede_id))
+    for sede, tramos in _tramos_cerrados(vigentes).items():
+        for tramo in tramos:
+            resumen = resumen.exclude(sede_id=sede, fecha__range=tramo)
+
+    totales = resumen.totales()
+    for cierre in vigentes:
+        for campo in CAMPOS_TOTALES:
+            totales[campo] += getattr(cierre, campo)
+    return _con_balance(totales)
+
+
+def saldo_acumulado(sede_id, hasta):
+    """Balance de la sede desde su primer movimiento hasta `hasta` inclusive."""
+    return totales_periodo(hasta=hasta, sede_id=sede_id)['balance']
+
 
 class PerfilUsuario(models.Model):
     user = models.OneToOneField(User, on_delete=models.CASCADE, related_name='perfil', verbose_name='Usuario')
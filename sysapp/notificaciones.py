@@ -0,0 +1,110 @@
+"""
+Notificaciones de la barra superior (exámenes próximos y, para staff,
+solicitudes de eliminación pendientes).
+
+El contenido es el mismo para todos los usuarios de un rol, así que se
+guarda en la caché por rol, por día y por versión durante
+NOTIFICACIONES_CACHE_TTL segundos; las señales de Materia y
+SolicitudEliminacion avanzan la versión en todos los workers (ver
+signals.py e invalidacion.py). La campana de base.html las pide por
+JSON (api_notificaciones) y se mantiene al día con un stream SSE
+(stream_notificaciones) que solo reenvía cuando cambia la versión.
+"""
+from datetime import datetime, timedelta
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Q
+from django.urls import reverse
+from django.utils import timezone
+
+from . import invalidacion
+from .models import Materia, SolicitudEliminacion
+
+ESPACIO = 'notificaciones'
+
+
+def _clave(rol, hoy):
+    return f'sysapp:notificaciones:{rol}:{hoy.isoformat()}:{invalidacion.version(ESPACIO)}'
+
+
+def _calcular(es_staff, hoy):
+    en_tres_dias = hoy + timedelta(days=3)
+    materias = Materia.objects.filter(
+        Q(fecha_examen_parcial__range=(hoy, en_tres_dias)) | Q(fecha_examen_final__range=(hoy, en_tres_dias))
+    ).select_related('carrera')
+
+    notificaciones = []
+    for m in materias:
+        if m.fecha_examen_parcial and hoy <= m.fecha_examen_parcial <= en_tres_dias:
+            notificaciones.append({
+                'tipo': 'Examen Parcial', 'materia': m.nombre, 'carrera': m.carrera.nombre,
+                'carrera_id': m.carrera.id, 'fecha': m.fecha_examen_parcial,
+                'url': reverse('detalle_carrera', args=[m.carrera.id]),
+                'icon': 'bi-calendar-event', 'color': 'text-primary',
+            })
+        if m.fecha_examen_final and hoy <= m.fecha_examen_final <= en_tres_dias:
+            notificaciones.append({
+                'tipo': 'Examen Final', 'materia': m.nombre, 'carrera': m.carrera.nombre,
+                'carrera_id': m.carrera.id, 'fecha': m.fecha_examen_final,
+                'url': reverse('detalle_carrera', args=[m.carrera.id]),
+                'icon': 'bi-calendar-check', 'color': 'text-danger',
+            })
+
+    solicitudes_pendientes_count = 0
+    if es_staff:
+        solicitudes = list(SolicitudEliminacion.objects.filter(estado='PENDIENTE').select_related('usuario_solicita'))
+        solicitudes_pendientes_count = len(solicitudes)
+        for s in solicitudes:
+            notificaciones.append({
+                'id': f'solicitud_{s.id}', 'tipo': 'Solicitud de Eliminación',
+                'materia': f'Solicitado por {s.usuario_solicita.username}',
+                'carrera': s.get_modelo_display(), 'objeto_id': s.objeto_id,
+                'motivo': s.motivo, 'datos_objeto': s.datos_objeto,
+                'url_procesar': reverse('procesar_solicitud_eliminacion', args=[s.id]),
+                'fecha': s.fecha_solicitud, 'icon': 'bi-trash', 'color': 'text-warning',
+                'es_solicitud': True, 'solicitud_id': s.id,
+            })
+
+    notificaciones.sort(key=lambda x: x['fecha'].date() if isinstance(x['fecha'], datetime) else x['fecha'])
+    return {
+        'examenes_proximos':            notificaciones,
+        'total_notificaciones':         len(notificaciones),
+        'solicitudes_pendientes_count': solicitudes_pendientes_count,
+    }
+
+
+def notificaciones(usuario):
+    """Notificaciones del rol de `usuario`, desde la caché si están vigentes."""
+    if not usuario.is_authenticated:
+        return {'examenes_proximos': [], 'total_notificaciones': 0, 'solicitudes_pendientes_count': 0}
+    hoy = timezone.localdate()
+    rol = 'staff' if usuario.is_staff else 'usuario'
+    return cache.get_or_set(
+        _clave(rol, hoy),
+        lambda: _calcular(usuario.is_staff, hoy),
+        getattr(settings, 'NOTIFICACIONES_CACHE_TTL', 60),
+    )
+
+
+def para_json(usuario):
+    """Notificaciones de `usuario` con las fechas como texto (d/m/Y), para la campana."""
+    datos = notificaciones(usuario)
+    return {
+        'notificaciones': [
+            {**n, 'fecha': n['fecha'].strftime('%d/%m/%Y')} for n in datos['examenes_proximos']
+        ],
+        'total': datos['total_notificaciones'],
+        'solicitudes_pendientes': datos['solicitudes_pendientes_count'],
+    }
+
+
+async def aversion():
+    """Cambia cada vez que se invalidan las notificaciones (y al cambiar el día)."""
+    await sync_to_async(invalidacion.sincronizar)()
+    return f"{timezone.localdate().isoformat()}:{invalidacion.version(ESPACIO)}"
+
+
+def invalidar_notificaciones():
+    invalidacion.avanzar(ESPACIO)
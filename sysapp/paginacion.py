@@ -0,0 +1,94 @@
+"""
+Paginación por keyset (seek) para listados grandes.
+
+En lugar de OFFSET, cada página se pide a partir de la última fila mostrada:
+WHERE (apellido, nombre, id) > (:apellido, :nombre, :id). El costo de pedir la
+página N es el mismo que el de la primera, y las filas insertadas mientras el
+usuario navega no desplazan ni duplican resultados.
+"""
+from django.core import signing
+from django.db.models import Q
+
+SALT_CURSOR = 'sysapp.paginacion.cursor'
+
+
+def codificar_cursor(valores):
+    """Cursor opaco (firmado) a partir de los valores de orden de una fila."""
+    return signing.dumps([str(v) if v is not None else None for v in valores], salt=SALT_CURSOR, compress=True)
+
+
+def decodificar_cursor(cursor, cantidad):
+    """Devuelve la lista de valores del cursor o None si es inválido o no coincide con el orden."""
+    if not cursor:
+        return None
+    try:
+        valores = signing.loads(cursor, salt=SALT_CURSOR)
+    except signing.BadSignature:
+        return None
+    if not isinstance(valores, list) or len(valores) != cantidad:
+        return None
+    return valores
+
+
+def _filtro_posterior(orden, valores):
+    """
+    Q equivalente a "fila > cursor" respetando la dirección de cada campo.
+    Para orden ('apellido', 'nombre', 'id'):
+        apellido > a  OR (apellido = a AND nombre > n) OR (apellido = a AND nombre = n AND id > i)
+    """
+    condicion = Q()
+    iguales = {}
+    for campo, valor in zip(orden, valores):
+        nombre = campo.lstrip('-')
+        operador = 'lt' if campo.startswith('-') else 'gt'
+        condicion |= Q(**iguales, **{f'{nombre}__{operador}': valor})
+        iguales[nombre] = valor
+    return condicion
+
+
+def _invertir(orden):
+    return [campo[1:] if campo.startswith('-') else f'-{campo}' for campo in orden]
+
+
+def _valores_fila(fila, orden):
+    valores = []
+    for campo in orden:
+        nombre = campo.lstrip('-')
+        valores.append(fila[nombre] if isinstance(fila, dict) else getattr(fila, nombre))
+    return valores
+
+
+def paginar_keyset(queryset, orden, despues=None, antes=None, por_pagina=50):
+    """
+    Devuelve un dict con la página pedida y los cursores de navegación:
+        filas, cursor_siguiente, cursor_anterior, hay_siguiente, hay_anterior
+
+    `orden` debe terminar en una columna única (normalmente 'id' o '-id') para
+    que el orden sea total. `despues` avanza; `antes` retrocede una página.
+    """
+    orden = list(orden)
+    valores_antes = decodificar_cursor(antes, len(orden))
+    valores_despues = decodificar_cursor(despues, len(orden))
+
+    if valores_antes is not None:
+        qs = queryset.filter(_filtro_posterior(_invertir(orden), valores_antes)).order_by(*_invertir(orden))
+        filas = list(qs[:por_pagina + 1])
+        hay_anterior = len(filas) > por_pagina
+        filas = filas[:por_pagina][::-1]
+        hay_siguiente = True
+    else:
+        qs = queryset
+        if valores_despues is not None:
+            qs = qs.filter(_filtro_posterior(orden, valores_despues))
+        filas = list(qs.order_by(*orden)[:por_pagina + 1])
+        hay_siguiente = len(filas) > por_pagina
+        filas = filas[:por_pagina]
+        hay_anterior = valores_despues is not None
+
+    return {
+        'filas':            filas,
+        'hay_siguiente':    hay_siguiente and bool(filas),
+        'hay_anterior':     hay_anterior and bool(filas),
+        'cursor_siguiente': codificar_cursor(_valores_fila(filas[-1], orden)) if filas else None,
+        'cursor_anterior':  codificar_cursor(_valores_fila(filas[0], orden)) if filas else None,
+    }
@@ -0,0 +1,90 @@
+"""
+Datos de referencia (sedes, carreras, cuentas bancarias activas y docentes)
+que se usan en casi todas las pantallas pero cambian pocas veces al mes.
+
+Cada grupo se guarda en la caché bajo una clave que incluye su versión en
+invalidacion.py; las señales post_save/post_delete de cada modelo (ver
+signals.py) llaman a invalidar(), que la avanza para todos los workers: las
+entradas viejas ya no se leen y vencen solas a las REFERENCIAS_CACHE_TTL.
+Los .update() masivos no envían señales; si se agrega alguno sobre estos
+modelos, llamar a invalidar().
+
+El formulario de pagos carga carreras y cuentas desde script_pago(): un JS
+cuyo nombre lleva el hash del contenido, así el navegador lo guarda sin
+volver a pedirlo hasta que algo cambie.
+"""
+import hashlib
+import json
+
+from django.conf import settings
+from django.core.cache import cache
+
+from . import invalidacion
+from .models import Carrera, CuentaBancaria, Funcionario, Sede
+
+GRUPOS = {
+    'sedes':    lambda: list(Sede.objects.order_by('nombre')),
+    'carreras': lambda: list(Carrera.objects.order_by('nombre')),
+    'cuentas':  lambda: list(CuentaBancaria.objects.filter(activa=True).order_by('entidad', 'titular')),
+    'docentes': lambda: list(Funcionario.objects.filter(cargo='DOCENCIA', activo=True)),
+}
+GRUPO_MODELO = {Sede: 'sedes', Carrera: 'carreras', CuentaBancaria: 'cuentas', Funcionario: 'docentes'}
+
+
+def versiones(*grupos):
+    return {g: invalidacion.version(f'referencias:{g}') for g in grupos}
+
+
+def _grupo(grupo):
+    version = versiones(grupo)[grupo]
+    return cache.get_or_set(
+        f'sysapp:referencias:{grupo}:{version}', GRUPOS[grupo],
+        getattr(settings, 'REFERENCIAS_CACHE_TTL', 86400),
+    )
+
+
+def invalidar(grupo):
+    invalidacion.avanzar(f'referencias:{grupo}')
+
+
+def sedes(activas=False):
+    return [s for s in _grupo('sedes') if s.activa or not activas]
+
+
+def carreras(activas=False):
+    return [c for c in _grupo('carreras') if c.activa or not activas]
+
+
+def cuentas():
+    return _grupo('cuentas')
+
+
+def docentes():
+    return _grupo('docentes')
+
+
+def opciones(campo, objetos):
+    """Carga las opciones de un ModelChoiceField desde `objetos` sin consultar; la validación sigue usando su queryset."""
+    vacia = [('', campo.empty_label)] if campo.empty_label is not None else []
+    campo.choices = vacia + [(obj.pk, campo.label_from_instance(obj)) for obj in objetos]
+
+
+def _generar_script_pago():
+    datos = {
+        'PF_CARRERAS': [
+            {'id': c.id, 'monto_mensualidad': c.monto_mensualidad, 'monto_matricula': c.monto_matricula}
+            for c in carreras()
+        ],
+        'PF_CUENTAS': [{'id': c.id, 'entidad': c.entidad, 'titular': c.titular} for c in cuentas()],
+    }
+    contenido = ''.join(f'window.{nombre} = {json.dumps(valor, default=str)};\n' for nombre, valor in datos.items())
+    return {'contenido': contenido, 'huella': hashlib.sha256(contenido.encode()).hexdigest()[:16]}
+
+
+def script_pago():
+    """JS con window.PF_CARRERAS y window.PF_CUENTAS para formPagos.js, y su huella."""
+    v = versiones('carreras', 'cuentas')
+    return cache.get_or_set(
+        f'sysapp:referencias:script_pago:{v["carreras"]}:{v["cuentas"]}', _generar_script_pago,
+        getattr(settings, 'REFERENCIAS_CACHE_TTL', 86400),
+    )
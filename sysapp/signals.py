@@ -1,10 +1,425 @@
-from django.db.models.signals import pre_save
+from datetime import datetime
+
+from django.db.models import F, Max, Min
+from django.db.models.signals import pre_delete, pre_save, post_save, post_delete
 from django.dispatch import receiver
-from .models import Pago
+from django.utils import timezone
+from .busqueda import INDICES, afecta_indice, quitar_del_indice, reindexar
+from .models import (
+    Alumno, CanjeEstrellas, Carrera, CuboEgresoMensual, CuboIngresoMensual, CuentaBancaria, Egreso, Funcionario,
+    Materia, Pago, ResumenDiario, Sede, SolicitudEliminacion, primer_dia_mes, verificar_caja_abierta,
+)
+from .notificaciones import invalidar_notificaciones
+from .referencias import GRUPO_MODELO, invalidar as invalidar_referencias
 
 
 @receiver(pre_save, sender=Pago)
 def calcular_estrellas_pago(sender, instance, **kwargs):
     if not instance.pk:  # Solo para nuevos pagos
         # Cambiado de calcular_estrellas() a calcular_puntos()
-        instance.puntos = instance.calcular_puntos()
\ No newline at end of file
+        instance.puntos = instance.calcular_puntos()
+
+
+#  SNAPSHOT DE COBERTURA DEL ALUMNO
+
+CAMPOS_COBERTURA = {'alumno', 'es_matricula', 'valido_hasta'}
+CAMPOS_PUNTOS = {'alumno', 'es_matricula', 'puntos'}
+
+
+def _refrescar_cobertura(alumno_id):
+    alumno = Alumno.objects.filter(pk=alumno_id).only('id').first()
+    if alumno:
+        alumno.actualizar_cobertura()
+
+
+CAMPOS_RESUMEN_PAGO = {'sede', 'fecha', 'importe_total', 'monto_efectivo', 'monto_deposito'}
+CAMPOS_CUBO_PAGO = CAMPOS_RESUMEN_PAGO | {'carrera', 'metodo_pago'}
+
+
+@receiver(pre_save, sender=Pago)
+def recordar_pago_anterior(sender, instance, update_fields=None, **kwargs):
+    # Valores previos del pago: si cambia de alumno, el alumno anterior también
+    # debe recalcularse; si cambia de sede, fecha o importes, hay que descontarlo
+    # del resumen diario y de la celda del cubo anteriores.
+    instance._alumno_id_anterior = None
+    instance._resumen_anterior = None
+    instance._cubo_anterior = None
+    if not instance.pk:
+        return
+    if update_fields is not None and not ({'alumno'} | CAMPOS_CUBO_PAGO).intersection(update_fields):
+        return
+    anterior = Pago.objects.filter(pk=instance.pk).values(
+        'alumno_id', 'sede_id', 'carrera_id', 'metodo_pago', 'fecha',
+        'importe_total', 'monto_efectivo', 'monto_deposito',
+    ).first()
+    if anterior:
+        instance._alumno_id_anterior = anterior['alumno_id']
+        instance._resumen_anterior = _aporte_pago(anterior)
+        instance._cubo_anterior = _aporte_cubo_pago(anterior)
+
+
+@receiver(post_save, sender=Pago)
+def actualizar_cobertura_pago_guardado(sender, instance, update_fields=None, **kwargs):
+    if update_fields is not None and not CAMPOS_COBERTURA.intersection(update_fields):
+        return
+    alumnos = {instance.alumno_id, getattr(instance, '_alumno_id_anterior', None)}
+    for alumno_id in alumnos - {None}:
+        _refrescar_cobertura(alumno_id)
+
+
+@receiver(post_delete, sender=Pago)
+def actualizar_cobertura_pago_eliminado(sender, instance, **kwargs):
+    if instance.alumno_id:
+        _refrescar_cobertura(instance.alumno_id)
+
+
+#  SALDO DE PUNTOS DEL ALUMNO
+
+def _refrescar_saldo_puntos(alumno_id):
+    alumno = Alumno.objects.filter(pk=alumno_id).only('id').first()
+    if alumno:
+        alumno.recalcular_saldo_puntos()
+
+
+@receiver(post_save, sender=Pago)
+def actualizar_puntos_pago_guardado(sender, instance, update_fields=None, **kwargs):
+    if update_fields is not None and not CAMPOS_PUNTOS.intersection(update_fields):
+        return
+    alumnos = {instance.alumno_id, getattr(instance, '_alumno_id_anterior', None)}
+    for alumno_id in alumnos - {None}:
+        _refrescar_saldo_puntos(alumno_id)
+
+
+@receiver(post_delete, sender=Pago)
+def actualizar_puntos_pago_eliminado(sender, instance, **kwargs):
+    if instance.alumno_id:
+        _refrescar_saldo_puntos(instance.alumno_id)
+
+
+@receiver(post_delete, sender=CanjeEstrellas)
+def actualizar_puntos_canje_eliminado(sender, instance, **kwargs):
+    _refrescar_saldo_puntos(instance.alumno_id)
+
+
+#  CLAVE DE BÚSQUEDA DE PAGOS
+
+@receiver(post_save, sender=Alumno)
+def actualizar_busqueda_pagos(sender, instance, created=False, update_fields=None, **kwargs):
+    # Pago.busqueda_nombre incluye el nombre del alumno: si cambia, se recalcula en sus pagos
+    if created or (update_fields is not None and not {'nombre', 'apellido'}.intersection(update_fields)):
+        return
+    nombre = instance.nombre_completo
+    pagos = list(Pago.objects.filter(alumno_id=instance.pk).only('id', 'nombre_cliente', 'busqueda_nombre'))
+    cambiados = []
+    for pago in pagos:
+        clave = pago.clave_busqueda(nombre)
+        if pago.busqueda_nombre != clave:
+            pago.busqueda_nombre = clave
+            cambiados.append(pago)
+    if cambiados:
+        Pago.objects.bulk_update(cambiados, ['busqueda_nombre'])
+
+
+#  ÍNDICE DE BÚSQUEDA EN MEMORIA
+
+MODELOS_INDEXADOS = {Alumno: 'alumno', Pago: 'pago', Carrera: 'carrera', Funcionario: 'funcionario'}
+
+
+@receiver(pre_save, sender=Alumno)
+@receiver(pre_save, sender=Pago)
+@receiver(pre_save, sender=Carrera)
+@receiver(pre_save, sender=Funcionario)
+def recordar_texto_indexado(sender, instance, update_fields=None, **kwargs):
+    # Texto buscable antes de guardar: solo se avisa a los otros workers si cambia
+    nombre = MODELOS_INDEXADOS[sender]
+    if not afecta_indice(nombre, update_fields):
+        return
+    instance._texto_indexado = INDICES[nombre].textos([instance.pk]) if instance.pk else {}
+
+
+@receiver(post_save, sender=Alumno)
+@receiver(post_save, sender=Pago)
+@receiver(post_save, sender=Carrera)
+@receiver(post_save, sender=Funcionario)
+def reindexar_guardado(sender, instance, update_fields=None, **kwargs):
+    nombre = MODELOS_INDEXADOS[sender]
+    if not afecta_indice(nombre, update_fields):
+        return
+    cambiados = reindexar(nombre, sender.objects.filter(pk=instance.pk), getattr(instance, '_texto_indexado', None))
+    if sender is Alumno and cambiados:
+        # Los pagos se buscan también por el nombre del alumno
+        reindexar('pago', Pago.objects.filter(alumno_id=instance.pk))
+
+
+@receiver(post_delete, sender=Alumno)
+@receiver(post_delete, sender=Pago)
+@receiver(post_delete, sender=Carrera)
+@receiver(post_delete, sender=Funcionario)
+def quitar_eliminado(sender, instance, **kwargs):
+    quitar_del_indice(MODELOS_INDEXADOS[sender], instance.pk)
+
+
+#  NOTIFICACIONES EN CACHÉ (exámenes próximos y solicitudes pendientes)
+
+@receiver(post_save, sender=Materia)
+@receiver(post_delete, sender=Materia)
+@receiver(post_save, sender=SolicitudEliminacion)
+@receiver(post_delete, sender=SolicitudEliminacion)
+def invalidar_notificaciones_guardado(sender, **kwargs):
+    invalidar_notificaciones()
+
+
+#  DATOS DE REFERENCIA EN CACHÉ (ver referencias.py)
+
+@receiver(post_save, sender=Sede)
+@receiver(post_delete, sender=Sede)
+@receiver(post_save, sender=Carrera)
+@receiver(post_delete, sender=Carrera)
+@receiver(post_save, sender=CuentaBancaria)
+@receiver(post_delete, sender=CuentaBancaria)
+@receiver(post_save, sender=Funcionario)
+@receiver(post_delete, sender=Funcionario)
+def invalidar_referencias_guardado(sender, **kwargs):
+    invalidar_referencias(GRUPO_MODELO[sender])
+
+
+#  RESUMEN DIARIO DE CAJA (sede × fecha)
+
+def _fecha(valor):
+    # Pago.fecha / Egreso.fecha tienen default=timezone.now (datetime aware en UTC);
+    # el DateField guarda la fecha local (TIME_ZONE), así que se convierte igual
+    if isinstance(valor, datetime):
+        return timezone.localdate(valor) if timezone.is_aware(valor) else valor.date()
+    return valor
+
+
+def _valor(registro):
+    return registro.get if isinstance(registro, dict) else (lambda campo: getattr(registro, campo))
+
+
+def _aporte_pago(pago):
+    """(sede_id, fecha, variaciones) con que un pago contribuye al resumen. Acepta instancia o dict."""
+    valor = _valor(pago)
+    return valor('sede_id'), _fecha(valor('fecha')), {
+        'total_ingresos': valor('importe_total') or 0,
+        'total_efectivo': valor('monto_efectivo') or 0,
+        'total_deposito': valor('monto_deposito') or 0,
+        'cantidad_pagos': 1,
+    }
+
+
+def _aporte_egreso(egreso):
+    valor = _valor(egreso)
+    return valor('sede_id'), _fecha(valor('fecha')), {
+        'total_egresos': valor('monto') or 0,
+        'cantidad_egresos': 1,
+    }
+
+
+def _mover_resumen(anterior, actual):
+    """Descuenta el aporte anterior y suma el actual, con una sola actualización por fila."""
+    _acumular_resumen(((anterior, -1), (actual, 1)))
+
+
+def _acumular_resumen(aportes):
+    """Suma (aporte, signo) por fila (sede, fecha) del resumen."""
+    movimientos = {}
+    for aporte, signo in aportes:
+        if aporte is None:
+            continue
+        sede_id, fecha, variaciones = aporte
+        fila = movimientos.setdefault((sede_id, fecha), {})
+        for campo, delta in variaciones.items():
+            fila[campo] = fila.get(campo, 0) + signo * delta
+    for (sede_id, fecha), variaciones in movimientos.items():
+        ResumenDiario.acumular(sede_id, fecha, **variaciones)
+
+
+@receiver(post_save, sender=Pago)
+def actualizar_resumen_pago_guardado(sender, instance, update_fields=None, **kwargs):
+    if update_fields is not None and not CAMPOS_RESUMEN_PAGO.intersection(update_fields):
+        return
+    _mover_resumen(getattr(instance, '_resumen_anterior', None), _aporte_pago(instance))
+
+
+@receiver(post_delete, sender=Pago)
+def actualizar_resumen_pago_eliminado(sender, instance, **kwargs):
+    _mover_resumen(_aporte_pago(instance), None)
+
+
+CAMPOS_RESUMEN_EGRESO = {'sede', 'fecha', 'monto'}
+CAMPOS_CUBO_EGRESO = CAMPOS_RESUMEN_EGRESO | {'categoria'}
+
+
+@receiver(pre_save, sender=Egreso)
+def recordar_egreso_anterior(sender, instance, update_fields=None, **kwargs):
+    instance._resumen_anterior = None
+    instance._cubo_anterior = None
+    if not instance.pk:
+        return
+    if update_fields is not None and not CAMPOS_CUBO_EGRESO.intersection(update_fields):
+        return
+    anterior = Egreso.objects.filter(pk=instance.pk).values('sede_id', 'categoria', 'fecha', 'monto').first()
+    if anterior:
+        instance._resumen_anterior = _aporte_egreso(anterior)
+        instance._cubo_anterior = _aporte_cubo_egreso(anterior)
+
+
+@receiver(post_save, sender=Egreso)
+def actualizar_resumen_egreso_guardado(sender, instance, update_fields=None, **kwargs):
+    if update_fields is not None and not CAMPOS_RESUMEN_EGRESO.intersection(update_fields):
+        return
+    _mover_resumen(getattr(instance, '_resumen_anterior', None), _aporte_egreso(instance))
+
+
+@receiver(post_delete, sender=Egreso)
+def actualizar_resumen_egreso_eliminado(sender, instance, **kwargs):
+    _mover_resumen(_aporte_egreso(instance), None)
+
+
+#  CAJA CERRADA: los días cubiertos por un cierre no cambian
+
+def _verificar_cajas(anterior, actual):
+    """Un movimiento no puede entrar, salir ni cambiar de importe en un día con la caja cerrada."""
+    if anterior == actual:
+        return
+    for aporte in (anterior, actual):
+        if aporte is not None:
+            verificar_caja_abierta(aporte[0], aporte[1])
+
+
+@receiver(pre_save, sender=Pago)
+def bloquear_pago_caja_cerrada(sender, instance, update_fields=None, **kwargs):
+    if update_fields is not None and not CAMPOS_RESUMEN_PAGO.intersection(update_fields):
+        return
+    _verificar_cajas(getattr(instance, '_resumen_anterior', None), _aporte_pago(instance))
+
+
+@receiver(pre_save, sender=Egreso)
+def bloquear_egreso_caja_cerrada(sender, instance, update_fields=None, **kwargs):
+    if update_fields is not None and not CAMPOS_RESUMEN_EGRESO.intersection(update_fields):
+        return
+    _verificar_cajas(getattr(instance, '_resumen_anterior', None), _aporte_egreso(instance))
+
+
+@receiver(pre_delete, sender=Pago)
+@receiver(pre_delete, sender=Egreso)
+def bloquear_eliminacion_caja_cerrada(sender, instance, **kwargs):
+    verificar_caja_abierta(instance.sede_id, _fecha(instance.fecha))
+
+
+#  CUBO FINANCIERO MENSUAL
+
+def _aporte_cubo_pago(pago):
+    """(cubo, celda, variaciones) con que un pago contribuye al cubo de ingresos. Acepta instancia o dict."""
+    valor = _valor(pago)
+    fecha = _fecha(valor('fecha'))
+    return CuboIngresoMensual, {
+        'sede_id': valor('sede_id'),
+        'carrera_id': valor('carrera_id'),
+        'metodo_pago': valor('metodo_pago'),
+        'mes': primer_dia_mes(fecha) if fecha else None,
+    }, {
+        'importe_total': valor('importe_total') or 0,
+        'monto_efectivo': valor('monto_efectivo') or 0,
+        'monto_deposito': valor('monto_deposito') or 0,
+        'cantidad': 1,
+    }
+
+
+def _aporte_cubo_egreso(egreso):
+    valor = _valor(egreso)
+    fecha = _fecha(valor('fecha'))
+    return CuboEgresoMensual, {
+        'sede_id': valor('sede_id'),
+        'categoria': valor('categoria'),
+        'mes': primer_dia_mes(fecha) if fecha else None,
+    }, {
+        'monto': valor('monto') or 0,
+        'cantidad': 1,
+    }
+
+
+def _mover_cubo(anterior, actual):
+    """Como _mover_resumen, por celda del cubo."""
+    _acumular_cubo(((anterior, -1), (actual, 1)))
+
+
+def _acumular_cubo(aportes):
+    movimientos = {}
+    for aporte, signo in aportes:
+        if aporte is None:
+            continue
+        cubo, celda, variaciones = aporte
+        fila = movimientos.setdefault((cubo, tuple(sorted(celda.items()))), {})
+        for campo, delta in variaciones.items():
+            fila[campo] = fila.get(campo, 0) + signo * delta
+    for (cubo, celda), variaciones in movimientos.items():
+        cubo.acumular(dict(celda), **variaciones)
+
+
+@receiver(post_save, sender=Pago)
+def actualizar_cubo_pago_guardado(sender, instance, update_fields=None, **kwargs):
+    if update_fields is not None and not CAMPOS_CUBO_PAGO.intersection(update_fields):
+        return
+    _mover_cubo(getattr(instance, '_cubo_anterior', None), _aporte_cubo_pago(instance))
+
+
+@receiver(post_delete, sender=Pago)
+def actualizar_cubo_pago_eliminado(sender, instance, **kwargs):
+    _mover_cubo(_aporte_cubo_pago(instance), None)
+
+
+@receiver(post_save, sender=Egreso)
+def actualizar_cubo_egreso_guardado(sender, instance, update_fields=None, **kwargs):
+    if update_fields is not None and not CAMPOS_CUBO_EGRESO.intersection(update_fields):
+        return
+    _mover_cubo(getattr(instance, '_cubo_anterior', None), _aporte_cubo_egreso(instance))
+
+
+@receiver(post_delete, sender=Egreso)
+def actualizar_cubo_egreso_eliminado(sender, instance, **kwargs):
+    _mover_cubo(_aporte_cubo_egreso(instance), None)
+
+
+@receiver(pre_delete, sender=Carrera)
+def recordar_meses_cubo_carrera(sender, instance, **kwargs):
+    # Al borrar una carrera, Pago.carrera pasa a NULL con un UPDATE sin señales
+    # y los pagos de sus alumnos se borran en cascada: los meses afectados se
+    # recalculan al final (post_delete), cuando todo eso ya ocurrió.
+    instance._meses_cubo = CuboIngresoMensual.objects.filter(carrera_id=instance.pk).aggregate(
+        desde=Min('mes'), hasta=Max('mes'),
+    )
+
+
+@receiver(post_delete, sender=Carrera)
+def recalcular_cubo_carrera_eliminada(sender, instance, **kwargs):
+    meses = getattr(instance, '_meses_cubo', None)
+    if meses and meses['desde']:
+        CuboIngresoMensual.reconstruir(desde=meses['desde'], hasta=meses['hasta'])
+
+
+#  PAGOS CREADOS EN LOTE (bulk_create no envía señales)
+
+def pagos_creados_en_lote(pagos):
+    """
+    Lo que harían las señales post_save para `pagos` recién insertados con
+    bulk_create, agrupado: una actualización por fila de resumen, por celda
+    del cubo y por alumno, y una reindexación de búsqueda para todo el lote.
+    """
+    if not pagos:
+        return
+    _acumular_resumen((_aporte_pago(p), 1) for p in pagos)
+    _acumular_cubo((_aporte_cubo_pago(p), 1) for p in pagos)
+
+    puntos = {}
+    for pago in pagos:
+        if pago.alumno_id and pago.puntos:
+            puntos[pago.alumno_id] = puntos.get(pago.alumno_id, 0) + pago.puntos
+    for alumno_id, cantidad in puntos.items():
+        Alumno.objects.filter(pk=alumno_id).update(saldo_puntos=F('saldo_puntos') + cantidad)
+
+    for alumno_id in {p.alumno_id for p in pagos if p.alumno_id and p.valido_hasta and not p.es_matricula}:
+        _refrescar_cobertura(alumno_id)
+
+    reindexar('pago', Pago.objects.filter(pk__in=[p.pk for p in pagos]))
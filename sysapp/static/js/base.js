@@ -405,9 +405,8 @@ class NotificationManager {
         this.btnHistorial   = document.getElementById('btnHistorialNotif');
         this.btnClearHistorial = document.getElementById('btnClearHistorial');
 
-        // Filtrar notificaciones ya leídas
-        this.checkPersistedNotifications();
-        this.renderNotifications();
+        // Las notificaciones llegan por JSON / stream SSE
+        this.cargar();
 
         // Eventos
         this.toggleButton.addEventListener('click', (e) => {
@@ -440,6 +439,81 @@ class NotificationManager {
         document.addEventListener('keydown', (e) => { if (e.key === 'Escape') this.close(); });
     }
 
+    cargar() {
+        const url    = this.list.dataset.url;
+        const stream = this.list.dataset.stream;
+        const pedir  = () => {
+            if (!url) return;
+            fetch(url, { headers: { 'Accept': 'application/json' } })
+                .then(r => r.ok ? r.json() : null)
+                .then(datos => { if (datos) this.pintar(datos); })
+                .catch(() => {});
+        };
+
+        if (!stream || !window.EventSource) { pedir(); return; }
+
+        // El stream envía el estado al conectar y cada vez que cambia.
+        // Si falla antes del primer mensaje (servidor WSGI, 204) se usa el JSON.
+        let recibido = false;
+        const fuente = new EventSource(stream);
+        fuente.addEventListener('notificaciones', (e) => {
+            recibido = true;
+            try { this.pintar(JSON.parse(e.data)); } catch (err) {}
+        });
+        fuente.onerror = () => {
+            if (!recibido) { fuente.close(); pedir(); }
+        };
+    }
+
+    pintar(datos) {
+        const esc = (v) => String(v ?? '').replace(/[&<>"']/g, c => ({
+            '&': '&amp;', '<': '&lt;', '>': '&gt;', '"': '&quot;', "'": '&#39;'
+        }[c]));
+
+        this.list.innerHTML = (datos.notificaciones || []).map(n => `
+            <div class="notification-item unread"
+                 data-id="${esc(n.id)}"
+                 data-type="${esc(n.tipo)}"
+                 data-materia="${esc(n.materia)}"
+                 data-carrera="${esc(n.carrera)}"
+                 data-fecha="${esc(n.fecha)}"
+                 data-icon="${esc(n.icon)}"
+                 data-color="${esc(n.color)}"
+                 data-url="${esc(n.url)}"
+                 ${n.es_solicitud ? `data-es-solicitud="true"
+                 data-solicitud-id="${esc(n.solicitud_id)}"
+                 data-motivo="${esc(n.motivo)}"
+                 data-url-procesar="${esc(n.url_procesar)}"` : ''}
+                 onclick="if(window.notificationManager) window.notificationManager.handleClick(this);">
+                <div class="notification-item-icon ${esc(n.color)}">
+                    <i class="bi ${esc(n.icon)}"></i>
+                </div>
+                <div class="notification-item-content">
+                    <div class="notification-item-title d-flex justify-content-between">
+                        <span>${esc(n.tipo)}</span>
+                        <span class="badge bg-light text-dark border-0 small" style="font-size: 0.65rem;">Ver detalle</span>
+                    </div>
+                    <div class="notification-item-text">${esc(n.materia)} - ${esc(n.carrera)}</div>
+                    <div class="notification-item-time">
+                        <i class="bi bi-calendar"></i> ${esc(n.fecha)}
+                    </div>
+                </div>
+            </div>`).join('');
+
+        // Los datos del objeto de cada solicitud van en un <script> JSON (ver showDetail)
+        (datos.notificaciones || []).forEach((n, i) => {
+            if (!n.es_solicitud) return;
+            const script = document.createElement('script');
+            script.type = 'application/json';
+            script.id = 'temp';
+            script.textContent = JSON.stringify(n.datos_objeto || {});
+            this.list.children[i]?.appendChild(script);
+        });
+
+        this.checkPersistedNotifications();
+        this.renderNotifications();
+    }
+
     handleClick(element) {
         const isSolicitud = element.getAttribute('data-es-solicitud') === 'true';
         if (isSolicitud) {
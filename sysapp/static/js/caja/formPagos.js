@@ -294,7 +294,7 @@
     function setAlumno(id, label, data) {
         const inp = $('id_alumno'), trig = $('alumnoTrigger'), txt = $('alumnoTriggerText');
         if (id) {
-            inp.value = id;
+            elegirOpcion(inp, id, label);
             txt.textContent = label;
             trig.classList.add('has-value');
             if (data) {
@@ -310,6 +310,17 @@
         closeAlumnoDropdown();
     }
 
+    /* El <select> de alumno solo trae la opción elegida (SelectAjax): se agrega al vuelo */
+    function elegirOpcion(select, id, label) {
+        let opt = [...select.options].find(o => o.value === String(id));
+        if (!opt) { opt = new Option(label, id); select.add(opt); }
+        select.value = String(id);
+    }
+
+    function urlAlumnos() {
+        return $('id_alumno')?.dataset.url || '/buscar-alumno/';
+    }
+
     function openAlumnoDropdown() {
         alumnoDropdownOpen = true;
         positionAlumnoDropdown();
@@ -333,7 +344,7 @@
         const list = $('alumnoList');
         list.innerHTML = '<div class="pf-alumno-loading"><i class="bi bi-hourglass-split"></i> Cargando…</div>';
         try {
-            const res  = await fetch('/buscar-alumno/?q=&recientes=1');
+            const res  = await fetch(`${urlAlumnos()}?q=&recientes=1`);
             const data = (await res.json()).resultados || [];
             alumnoRecents = data;
             renderAlumnoOptions(data, true);
@@ -383,7 +394,7 @@
         if (!q || q.length < 1) { renderAlumnoOptions(alumnoRecents, true); return; }
         list.innerHTML = '<div class="pf-alumno-loading"><i class="bi bi-hourglass-split"></i> Buscando…</div>';
         try {
-            const res  = await fetch(`/buscar-alumno/?q=${encodeURIComponent(q)}`);
+            const res  = await fetch(`${urlAlumnos()}?q=${encodeURIComponent(q)}`);
             const data = (await res.json()).resultados || [];
             renderAlumnoOptions(data, false);
         } catch {
@@ -479,10 +490,12 @@
 
         /* URL params */
         const p = new URLSearchParams(location.search);
-        if (p.get('alumno') && $('id_alumno')) $('id_alumno').value = p.get('alumno');
-        if (p.get('nombre')) {
+        if (p.get('alumno') && $('id_alumno')) elegirOpcion($('id_alumno'), p.get('alumno'), decodeURIComponent(p.get('nombre') || p.get('alumno')));
+        const elegido = $('id_alumno')?.selectedOptions[0];
+        const nombre  = p.get('nombre') ? decodeURIComponent(p.get('nombre')) : (elegido?.value ? elegido.text : '');
+        if (nombre) {
             const trig = $('alumnoTrigger'), txt = $('alumnoTriggerText');
-            if (trig && txt) { txt.textContent = decodeURIComponent(p.get('nombre')); trig.classList.add('has-value'); }
+            if (trig && txt) { txt.textContent = nombre; trig.classList.add('has-value'); }
         }
         if (p.get('sede')    && $('id_sede'))    $('id_sede').value = p.get('sede');
         if (p.get('carrera') && $('id_carrera')) { $('id_carrera').value = p.get('carrera'); applyCarrera(p.get('carrera')); syncCarrera(); }
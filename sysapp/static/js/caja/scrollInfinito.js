@@ -0,0 +1,45 @@
+// ─── Scroll infinito para tablas paginadas por cursor ──────
+// <tbody data-url="/pagos/api/?filtros" data-siguiente="cursor" data-contador="#id">
+// Al llegar al final de la tabla se pide la página siguiente con ?html=1
+// y se agregan las filas ya renderizadas por el servidor.
+function iniciarScrollInfinito(tbody) {
+    let siguiente = tbody.dataset.siguiente;
+    let cargando = false;
+    const contador = tbody.dataset.contador ? document.querySelector(tbody.dataset.contador) : null;
+
+    const centinela = document.createElement('div');
+    centinela.className = 'scroll-centinela text-center text-muted small py-3';
+    tbody.closest('table').after(centinela);
+
+    const observador = new IntersectionObserver(async (entradas) => {
+        if (!entradas[0].isIntersecting || cargando || !siguiente) return;
+        cargando = true;
+        centinela.textContent = 'Cargando…';
+
+        const url = new URL(tbody.dataset.url, window.location.origin);
+        url.searchParams.set('despues', siguiente);
+        url.searchParams.set('html', '1');
+        url.searchParams.set('campos', 'uuid');
+        try {
+            const respuesta = await fetch(url, { headers: { 'X-Requested-With': 'XMLHttpRequest' } });
+            if (!respuesta.ok) throw new Error(respuesta.status);
+            const datos = await respuesta.json();
+            tbody.insertAdjacentHTML('beforeend', datos.html);
+            siguiente = datos.siguiente;
+            if (contador) contador.textContent = tbody.rows.length;
+            centinela.textContent = '';
+        } catch (error) {
+            centinela.textContent = 'No se pudieron cargar más registros.';
+            siguiente = null;
+        } finally {
+            cargando = false;
+        }
+        if (!siguiente) observador.disconnect();
+    }, { rootMargin: '300px' });
+
+    observador.observe(centinela);
+}
+
+document.addEventListener('DOMContentLoaded', () => {
+    document.querySelectorAll('tbody[data-siguiente]').forEach(iniciarScrollInfinito);
+});
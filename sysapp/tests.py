@@ -1,3 +1,912 @@
-from django.test import TestCase
+import io
+from datetime import date, datetime, timedelta, timezone as dt_timezone
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.auth.models import User
+from django.contrib.messages import get_messages
+from django.core.exceptions import ValidationError
+from django.db import IntegrityError, transaction
+from django.db.models import F
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from . import invalidacion
+from .busqueda import INDICES, IndiceBusqueda
+from .models import (
+    Alumno, CambioBusqueda, Carrera, CierreCaja, ContadorInvalidacion, CuboEgresoMensual, CuboIngresoMensual,
+    CuentaBancaria, Egreso, ExtractoBancario, Materia, MovimientoBancario, Pago, ResumenDiario, SecuenciaRecibo, Sede,
+    SolicitudEliminacion, totales_periodo,
+)
+
+
+class DatosBase(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.hoy = timezone.localdate()
+        cls.ayer = cls.hoy - timedelta(days=1)
+        cls.sede = Sede.objects.create(nombre='Central', direccion='x', telefono='1')
+        cls.sede2 = Sede.objects.create(nombre='Norte', direccion='x', telefono='2')
+        cls.carrera = Carrera.objects.create(
+            nombre='Enfermería', naturalidad='TS', duracion_meses=24,
+            monto_mensualidad=100000, monto_matricula=50000,
+        )
+        cls.usuario = User.objects.create_user('cajero', password='x')
+        cls.admin = User.objects.create_user('admin', password='x', is_staff=True, is_superuser=True)
+
+    def pago(self, importe, fecha=None, sede=None, **extra):
+        datos = {
+            'fecha': fecha or self.hoy, 'sede': sede or self.sede, 'nombre_cliente': 'Cliente',
+            'concepto': 'Pago', 'importe_total': importe, 'monto_efectivo': importe, 'monto_deposito': 0,
+        }
+        datos.update(extra)
+        return Pago.objects.create(**datos)
+
+    def egreso(self, monto, fecha=None, sede=None):
+        return Egreso.objects.create(
+            fecha=fecha or self.hoy, sede=sede or self.sede, numero_comprobante=f'E{monto}',
+            categoria='SERVICIOS', concepto='Gasto', monto=monto,
+        )
+
+
+class CierreCajaTests(DatosBase):
+
+    def test_cierre_de_hoy_no_congela_los_totales(self):
+        self.pago(1000)
+        cierre = CierreCaja.cerrar(self.sede, self.usuario, self.hoy, self.hoy)
+        self.pago(5000)
+
+        self.assertIsNone(cierre.fecha_desde)
+        self.assertEqual(cierre.total_ingresos, 1000)
+        totales = totales_periodo(self.hoy, self.hoy, self.sede.id)
+        self.assertEqual(totales['total_ingresos'], 6000)
+        self.assertEqual(totales['cantidad_pagos'], 2)
+
+    def test_dia_cerrado_rechaza_escrituras(self):
+        pago = self.pago(1000, fecha=self.ayer)
+        egreso = self.egreso(300, fecha=self.ayer)
+        CierreCaja.cerrar(self.sede, self.usuario, self.ayer, self.ayer)
+
+        with self.assertRaises(ValidationError):
+            self.pago(5000, fecha=self.ayer)
+        with self.assertRaises(ValidationError):
+            self.egreso(700, fecha=self.ayer)
+        pago.importe_total = pago.monto_efectivo = 9000
+        with self.assertRaises(ValidationError):
+            pago.save()
+        with self.assertRaises(ValidationError), transaction.atomic():
+            egreso.delete()
+        movido = self.pago(2000)
+        movido.fecha = self.ayer
+        with self.assertRaises(ValidationError):
+            movido.save()
+
+        # Otra sede y otros días siguen abiertos; lo que no toca importes se puede guardar
+        self.pago(4000, fecha=self.ayer, sede=self.sede2)
+        Pago.objects.get(pk=pago.pk).save(update_fields=['observaciones'])
+
+        totales = totales_periodo(self.ayer, self.ayer, self.sede.id)
+        self.assertEqual(totales['total_ingresos'], 1000)
+        self.assertEqual(totales['total_egresos'], 300)
+        self.assertEqual(
+            totales['total_ingresos'],
+            ResumenDiario.objects.filter(sede=self.sede, fecha=self.ayer).totales()['total_ingresos'],
+        )
+
+    def test_formulario_informa_caja_cerrada(self):
+        from .forms import PagoForm
+        self.pago(1000, fecha=self.ayer)
+        CierreCaja.cerrar(self.sede, self.usuario, self.ayer, self.ayer)
+        form = PagoForm(data={
+            'fecha': self.ayer, 'sede': self.sede.pk, 'es_cliente_diferenciado': 'on',
+            'nombre_cliente': 'Cliente', 'concepto': 'Pago', 'importe_total': '1000', 'metodo_pago': 'EFECTIVO',
+        })
+        self.assertFalse(form.is_valid())
+        self.assertIn('cerrada', str(form.non_field_errors()))
+
+
+class FechaLocalTests(DatosBase):
+    """Un movimiento cargado de noche (ya otro día en UTC) suma al día y mes locales."""
+
+    def test_resumen_y_cubo_usan_la_fecha_local(self):
+        # Como lo devuelve timezone.now(): aware en UTC, ya 1 de octubre
+        noche = timezone.make_aware(datetime(2026, 9, 30, 22, 30)).astimezone(dt_timezone.utc)
+        self.assertEqual(noche.date(), date(2026, 10, 1))
+
+        egreso = Egreso.objects.create(
+            fecha=noche, sede=self.sede, numero_comprobante='N1',
+            categoria='SERVICIOS', concepto='Luz', monto=300,
+        )
+        pago = self.pago(1000, fecha=noche)
+
+        self.assertEqual(Egreso.objects.get(pk=egreso.pk).fecha, date(2026, 9, 30))
+        self.assertEqual(Pago.objects.get(pk=pago.pk).fecha, date(2026, 9, 30))
+        resumen = ResumenDiario.objects.get(sede=self.sede)
+        self.assertEqual(resumen.fecha, date(2026, 9, 30))
+        self.assertEqual((resumen.total_ingresos, resumen.total_egresos), (1000, 300))
+        self.assertEqual(CuboEgresoMensual.objects.get().mes, date(2026, 9, 1))
+        self.assertEqual(CuboIngresoMensual.objects.get().mes, date(2026, 9, 1))
+
+
+class LotePagosTests(DatosBase):
+    """La carga en lote deja resumen, cubo y puntos igual que guardar los pagos de a uno."""
+
+    def setUp(self):
+        self.client.force_login(self.admin)
+        self.alumno = Alumno.objects.create(sede=self.sede, carrera=self.carrera, nombre='José', apellido='Núñez', cedula='1234567')
+        self.alumno2 = Alumno.objects.create(sede=self.sede2, carrera=self.carrera, nombre='Ana', apellido='Benítez', cedula='7654321')
+
+    def filas(self, *filas, **datos):
+        datos.update({'form-TOTAL_FORMS': len(filas), 'form-INITIAL_FORMS': 0})
+        for i, fila in enumerate(filas):
+            datos.update({f'form-{i}-{campo}': valor for campo, valor in fila.items()})
+        return datos
+
+    def test_lote_equivale_a_guardar_de_a_uno(self):
+        vence = self.hoy + timedelta(days=40)
+        filas = [
+            {'numero_recibo': 'L1', 'cedula': '1.234.567', 'importe_total': '100000', 'metodo_pago': 'EFECTIVO',
+             'fecha_vencimiento': vence.isoformat(), 'numero_cuota': '1'},
+            {'numero_recibo': 'L2', 'cedula': '1234567', 'importe_total': '50000', 'metodo_pago': 'MIXTO',
+             'monto_efectivo': '10000', 'monto_deposito': '40000', 'es_matricula': 'on'},
+            {'numero_recibo': 'L3', 'nombre_cliente': 'Empresa SA', 'importe_total': '30000', 'metodo_pago': 'EFECTIVO',
+             'concepto': 'Curso'},
+        ]
+        r = self.client.post(reverse('registrar_pagos_lote'), self.filas(*filas, sede=self.sede.pk, fecha=self.hoy.isoformat()), secure=True)
+        self.assertEqual(r.status_code, 302)
+
+        # Los mismos pagos, guardados de a uno en la otra sede
+        comunes = {'fecha': self.hoy, 'sede': self.sede2, 'carrera': self.carrera}
+        Pago.objects.create(**comunes, alumno=self.alumno2, numero_recibo='U1', concepto='Cuota', importe_total=100000,
+                            monto_efectivo=100000, monto_deposito=0, fecha_vencimiento=vence, numero_cuota='1')
+        Pago.objects.create(**comunes, alumno=self.alumno2, numero_recibo='U2', concepto='Matrícula', es_matricula=True,
+                            metodo_pago='MIXTO', importe_total=50000, monto_efectivo=10000, monto_deposito=40000)
+        Pago.objects.create(fecha=self.hoy, sede=self.sede2, nombre_cliente='Empresa SA', numero_recibo='U3', concepto='Curso',
+                            importe_total=30000, monto_efectivo=30000, monto_deposito=0)
+
+        def resumen(sede):
+            fila = ResumenDiario.objects.get(sede=sede, fecha=self.hoy)
+            return fila.total_ingresos, fila.total_efectivo, fila.total_deposito, fila.cantidad_pagos
+
+        def cubo(sede):
+            return sorted(CuboIngresoMensual.objects.filter(sede=sede).values_list(
+                'carrera_id', 'metodo_pago', 'mes', 'cantidad', 'importe_total', 'monto_efectivo', 'monto_deposito'), key=str)
+
+        self.assertEqual(resumen(self.sede), resumen(self.sede2))
+        self.assertEqual(cubo(self.sede), cubo(self.sede2))
+        self.alumno.refresh_from_db()
+        self.alumno2.refresh_from_db()
+        self.assertEqual(self.alumno.saldo_puntos, self.alumno2.saldo_puntos)
+        self.assertEqual(self.alumno.saldo_puntos, 3)
+        for lote, uno in (('L1', 'U1'), ('L2', 'U2'), ('L3', 'U3')):
+            a, b = Pago.objects.get(numero_recibo=lote), Pago.objects.get(numero_recibo=uno)
+            self.assertEqual((a.puntos, a.tiene_multa), (b.puntos, b.tiene_multa))
+            self.assertEqual(a.busqueda_nombre, a.clave_busqueda())
+
+    def test_lote_sin_sede_informa_el_error(self):
+        # Con dos alumnos de igual cédula, el desempate por sede no puede correr sin sede
+        Alumno.objects.create(sede=self.sede2, carrera=self.carrera, nombre='Otro', apellido='Núñez', cedula='1234567')
+        datos = self.filas({'cedula': '1234567', 'importe_total': '1000', 'metodo_pago': 'EFECTIVO'}, fecha=self.hoy.isoformat())
+        r = self.client.post(reverse('registrar_pagos_lote'), datos, secure=True)
+        self.assertEqual(r.status_code, 200)
+        self.assertIn('Seleccione la sede', str(r.context['formset'].non_form_errors()))
+        self.assertFalse(Pago.objects.exists())
+
+
+class SecuenciaReciboTests(DatosBase):
+
+    def test_sedes_no_comparten_numeros(self):
+        central = SecuenciaRecibo.objects.create(sede=self.sede, prefijo='CEN-')
+        norte = SecuenciaRecibo.objects.create(sede=self.sede2, prefijo='NOR-')
+        self.assertEqual(central.reservar(2), ['CEN-000001', 'CEN-000002'])
+        self.assertEqual(norte.reservar(), ['NOR-000001'])
+
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            SecuenciaRecibo.objects.create(sede=self.sede2, serie='B', prefijo='CEN-')
+        with self.assertRaises(ValidationError):
+            SecuenciaRecibo(sede=self.sede2, serie='B', prefijo='N1').full_clean()
+
+    def test_siguiente_no_retrocede_sobre_numeros_usados(self):
+        secuencia = SecuenciaRecibo.objects.create(sede=self.sede, prefijo='CEN-')
+        secuencia.reservar(5)
+        self.pago(1000, numero_recibo='CEN-000040')
+
+        secuencia.siguiente = 3
+        with self.assertRaises(ValidationError):
+            secuencia.full_clean()
+        secuencia.siguiente = 40
+        with self.assertRaises(ValidationError):
+            secuencia.full_clean()
+        secuencia.siguiente = 41
+        secuencia.full_clean()
+
+    def test_recibo_ocupado_es_error_de_formulario(self):
+        SecuenciaRecibo.objects.create(sede=self.sede, prefijo='CEN-')
+        self.pago(1000, numero_recibo='CEN-000001')
+        self.client.force_login(self.admin)
+        r = self.client.post(reverse('registrar_pago'), {
+            'fecha': self.hoy, 'sede': self.sede.pk, 'es_cliente_diferenciado': 'on', 'nombre_cliente': 'Cliente',
+            'concepto': 'Pago', 'importe_total': '1000', 'metodo_pago': 'EFECTIVO',
+        }, secure=True)
+        self.assertEqual(r.status_code, 200)
+        self.assertIn('CEN-000001', str(r.context['form'].errors))
+        self.assertEqual(Pago.objects.count(), 1)
+
+
+class IndiceBusquedaTests(DatosBase):
+    """Solo los cambios del texto buscable se avisan, y los otros workers releen solo esas filas."""
+
+    def setUp(self):
+        for indice in INDICES.values():
+            indice.vencer()
+        self.addCleanup(lambda: [indice.vencer() for indice in INDICES.values()])
+        # Sin hilos en los tests: cada uno carga el índice con reconstruir()
+        segundo_plano = mock.patch.object(IndiceBusqueda, 'reconstruir_en_segundo_plano')
+        self.segundo_plano = segundo_plano.start()
+        self.addCleanup(segundo_plano.stop)
+
+    def version(self):
+        return ContadorInvalidacion.objects.filter(espacio='busqueda:pago').values_list('version', flat=True).first() or 0
+
+    def test_solo_avisa_si_cambia_el_texto(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            pago = self.pago(1000, numero_recibo='R1')
+        version = self.version()
+        self.assertEqual(list(CambioBusqueda.objects.values_list('objeto_id', flat=True)), [pago.pk])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            pago.concepto = 'Otro concepto'
+            pago.save()
+            pago.save(update_fields=['observaciones'])
+        self.assertEqual(self.version(), version)
+        self.assertEqual(CambioBusqueda.objects.count(), 1)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            pago.nombre_cliente = 'Comercial Zapata'
+            pago.save()
+        self.assertEqual(self.version(), version + 1)
+        self.assertEqual(CambioBusqueda.objects.count(), 2)
+
+    def test_otro_worker_relee_solo_las_filas_cambiadas(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            pago = self.pago(1000, numero_recibo='R1', nombre_cliente='Comercial Acosta')
+            otro = self.pago(2000, numero_recibo='R2', nombre_cliente='Ferretería Benítez')
+        indice = INDICES['pago']
+        indice.reconstruir()
+        self.assertEqual(indice.buscar('acosta'), [pago.pk])
+        invalidacion.sincronizar(forzar=True)
+
+        # Lo que haría otro worker: cambiar la fila, anotarla y avanzar el contador
+        Pago.objects.filter(pk=pago.pk).update(nombre_cliente='Comercial Zapata')
+        CambioBusqueda.objects.create(indice='pago', objeto_id=pago.pk)
+        ContadorInvalidacion.objects.filter(espacio='busqueda:pago').update(version=F('version') + 1)
+
+        with mock.patch.object(indice, 'reconstruir', side_effect=AssertionError('no debe releer la tabla')):
+            invalidacion.sincronizar(forzar=True)
+            self.assertEqual(indice.buscar('zapata'), [pago.pk])
+            self.assertEqual(indice.buscar('acosta'), [])
+            self.assertEqual(indice.buscar('benitez'), [otro.pk])
+
+    def test_vencido_responde_con_el_indice_anterior(self):
+        pago = self.pago(1000, numero_recibo='R1', nombre_cliente='Comercial Acosta')
+        indice = INDICES['pago']
+        indice.reconstruir()
+        indice._cargado_en -= 10 ** 6
+
+        with mock.patch.object(indice, 'reconstruir_en_segundo_plano') as reconstruir, self.assertNumQueries(0):
+            self.assertEqual(indice.buscar('acosta'), [pago.pk])
+        reconstruir.assert_called_once_with()
+
+    @override_settings(BUSQUEDA_INDICE_MAX_FILAS=2)
+    def test_filas_viejas_fuera_del_indice_se_buscan_en_la_base(self):
+        pagos = [self.pago(1000, numero_recibo=f'R{i}', nombre_cliente=f'Comercial Acosta {i}') for i in range(4)]
+        indice = INDICES['pago']
+        ids = [p.pk for p in reversed(pagos)]
+        indice.reconstruir()
+
+        self.assertEqual(indice.buscar('acosta', 10), ids)
+        self.assertEqual(len(indice._textos), 2)
+        self.assertEqual(indice.buscar('acosta', 2), ids[:2])
+        with self.assertNumQueries(1):
+            self.assertEqual(indice.buscar('acosta 0'), [pagos[0].pk])
+
+    def test_primera_busqueda_va_a_la_base_mientras_se_carga(self):
+        pago = self.pago(1000, numero_recibo='R1', nombre_cliente='Comercial Acosta')
+        indice = INDICES['pago']
+        with self.assertNumQueries(1):
+            self.assertEqual(indice.buscar('acosta'), [pago.pk])
+        self.segundo_plano.assert_called_once_with()
+        self.assertFalse(indice.cargado)
+
+    def test_guardar_otros_modelos_no_pasa_por_el_indice(self):
+        with mock.patch('sysapp.signals.afecta_indice') as afecta:
+            self.egreso(300)
+            Sede.objects.create(nombre='Sur', direccion='x', telefono='3')
+        afecta.assert_not_called()
+
+
+class ParametrosGetTests(DatosBase):
+    """Filtros GET inválidos se ignoran en lugar de llegar a la consulta."""
+
+    def setUp(self):
+        self.client.force_login(self.admin)
+        Alumno.objects.create(sede=self.sede, carrera=self.carrera, nombre='José', apellido='Núñez', cedula='1234567')
+
+    def test_lista_alumnos(self):
+        for sede in ('abc', '99999999999999999999', '²', '-1'):
+            r = self.client.get(reverse('lista_alumnos'), {'sede': sede, 'carrera': sede}, secure=True)
+            self.assertEqual(r.status_code, 200)
+            self.assertEqual(len(r.context['alumnos']), 1)
+
+    def test_cubo_caja(self):
+        r = self.client.get(reverse('cubo_caja'), {'anio_desde': '0', 'anio_hasta': '123456', 'sede': 'x'}, secure=True)
+        self.assertEqual(r.status_code, 200)
+        self.assertEqual((r.context['anio_desde'], r.context['anio_hasta']), (self.hoy.year - 2, 9999))
+
+    def test_fichas_lote(self):
+        r = self.client.get(reverse('fichas_lote'), {'sede': 'abc'}, secure=True)
+        self.assertRedirects(r, reverse('lista_alumnos'), fetch_redirect_response=False)
+        r = self.client.get(reverse('fichas_lote'), {'sede': self.sede.pk, 'carrera': '1x', 'curso': '²'}, secure=True)
+        self.assertEqual(r.status_code, 200)
+        self.assertIn('Núñez', b''.join(r.streaming_content).decode())
+
+
+class ConciliacionManualTests(DatosBase):
+
+    def test_rechaza_montos_distintos(self):
+        from .conciliacion import conciliar_manual
+        cuenta = CuentaBancaria.objects.create(entidad='Itaú', titular='CEP')
+        extracto = ExtractoBancario.objects.create(cuenta=cuenta, archivo='x.csv', huella='h', cantidad_movimientos=1)
+        movimiento = MovimientoBancario.objects.create(
+            extracto=extracto, cuenta=cuenta, linea=2, fecha=self.hoy, monto=150000,
+        )
+        pago = self.pago(
+            200000, numero_recibo='R1', metodo_pago='MIXTO', monto_efectivo=50000, monto_deposito=150000, cuenta_bancaria=cuenta,
+        )
+        otro = self.pago(100000, numero_recibo='R2', metodo_pago='DEPOSITO', monto_efectivo=0, monto_deposito=100000, cuenta_bancaria=cuenta)
+
+        with self.assertRaisesMessage(ValueError, 'no coincide'):
+            conciliar_manual(movimiento, otro)
+        conciliar_manual(movimiento, pago)
+        movimiento.refresh_from_db()
+        self.assertEqual((movimiento.estado, movimiento.pago_id), ('CONCILIADO', pago.pk))
+
+    def test_pago_tomado_por_otro_movimiento_no_da_error_500(self):
+        cuenta = CuentaBancaria.objects.create(entidad='Itaú', titular='CEP')
+        extracto = ExtractoBancario.objects.create(cuenta=cuenta, archivo='x.csv', huella='h', cantidad_movimientos=2)
+        primero, segundo = (
+            MovimientoBancario.objects.create(extracto=extracto, cuenta=cuenta, linea=n, fecha=self.hoy, monto=100000)
+            for n in (2, 3)
+        )
+        pago = self.pago(100000, numero_recibo='R1', metodo_pago='DEPOSITO', monto_efectivo=0, monto_deposito=100000, cuenta_bancaria=cuenta)
+        MovimientoBancario.objects.filter(pk=primero.pk).update(estado='CONCILIADO', pago=pago)
+
+        self.client.force_login(self.admin)
+        url = reverse('detalle_extracto', args=[extracto.pk])
+        r = self.client.post(url, {'movimiento': segundo.pk, 'numero_recibo': 'R1', 'estado': 'x&y=1'}, secure=True)
+        self.assertRedirects(r, url, fetch_redirect_response=False)
+        r = self.client.post(url, {'movimiento': segundo.pk, 'numero_recibo': 'R1', 'estado': 'PENDIENTE'}, secure=True)
+        self.assertRedirects(r, f'{url}?estado=PENDIENTE', fetch_redirect_response=False)
+        segundo.refresh_from_db()
+        self.assertEqual(segundo.estado, 'PENDIENTE')
+
+        # Aunque la verificación previa no lo vea, la restricción única se traduce en ValueError
+        from .conciliacion import conciliar_manual
+        with mock.patch('sysapp.conciliacion.MovimientoBancario.objects.filter') as filtro:
+            filtro.return_value.exists.return_value = False
+            with self.assertRaisesMessage(ValueError, 'ya está conciliado'):
+                conciliar_manual(segundo, pago)
+
+
+class ImportarExtractoTests(DatosBase):
+
+    def setUp(self):
+        self.cuenta = CuentaBancaria.objects.create(entidad='Itaú', titular='CEP')
+
+    def archivo(self, filas):
+        lineas = ['Fecha;Credito;Referencia'] + [f'{f:%d/%m/%Y};{m};{r}' for f, m, r in filas]
+        return io.BytesIO('\n'.join(lineas).encode() + b'\n')
+
+    @mock.patch('sysapp.conciliacion.FILAS_POR_LOTE', 2)
+    def test_concilia_por_lotes_sin_repetir_pagos(self):
+        from .conciliacion import importar_extracto
+        hace_diez = self.hoy - timedelta(days=10)
+        datos = {'metodo_pago': 'DEPOSITO', 'monto_efectivo': 0, 'cuenta_bancaria': self.cuenta}
+        viejo = self.pago(70000, fecha=hace_diez, numero_recibo='R1', monto_deposito=70000, **datos)
+        nuevo = self.pago(70000, numero_recibo='R2', monto_deposito=70000, **datos)
+
+        # Un pago conciliado en el primer lote no vuelve a ofrecerse en los siguientes
+        filas = [(hace_diez, 70000, 'a'), (hace_diez, 1000, 'b'), (hace_diez, 70000, 'c'), (self.hoy, 70000, 'd'), (self.hoy, 5, 'e')]
+        extracto = importar_extracto(self.cuenta, self.archivo(filas), nombre='ext.csv')
+        movimientos = list(extracto.movimientos.order_by('linea').values_list('referencia', 'estado', 'pago'))
+        self.assertEqual(movimientos, [
+            ('a', 'CONCILIADO', viejo.pk), ('b', 'PENDIENTE', None), ('c', 'PENDIENTE', None),
+            ('d', 'CONCILIADO', nuevo.pk), ('e', 'PENDIENTE', None),
+        ])
+        self.assertEqual(
+            (extracto.fecha_desde, extracto.fecha_hasta, extracto.cantidad_movimientos, extracto.cantidad_conciliados),
+            (hace_diez, self.hoy, 5, 2),
+        )
+        self.assertEqual(len(extracto.huella), 64)
+
+        with self.assertRaisesMessage(ValueError, 'ya fue importado'):
+            importar_extracto(self.cuenta, self.archivo(filas))
+        self.assertEqual(ExtractoBancario.objects.count(), 1)
+
+
+class ListadosCajaTests(DatosBase):
+    """Filas y total de los listados de pagos y egresos salen de la misma sede y período."""
+
+    def setUp(self):
+        self.pago(1000)
+        self.pago(5000, sede=self.sede2)
+        self.egreso(300)
+        self.egreso(700, sede=self.sede2)
+
+    def test_usuario_sin_sede_no_ve_totales(self):
+        self.client.force_login(self.usuario)
+        r = self.client.get(reverse('lista_pagos'), secure=True)
+        self.assertEqual((len(r.context['pagos']), r.context['total_pagos']), (0, 0))
+        r = self.client.get(reverse('lista_egresos'), {'sede': self.sede2.pk}, secure=True)
+        self.assertEqual((len(r.context['egresos']), r.context['total_egresos']), (0, 0))
+
+    def test_usuario_ve_solo_su_sede(self):
+        self.usuario.perfil.sede = self.sede
+        self.usuario.perfil.save()
+        self.client.force_login(self.usuario)
+        r = self.client.get(reverse('lista_egresos'), {'sede': self.sede2.pk}, secure=True)
+        self.assertEqual((len(r.context['egresos']), r.context['total_egresos']), (1, 300))
+        r = self.client.get(reverse('lista_pagos'), {'sede': self.sede2.pk}, secure=True)
+        self.assertEqual((len(r.context['pagos']), r.context['total_pagos']), (1, 1000))
+
+    def test_sede_y_fechas_invalidas_se_ignoran(self):
+        self.client.force_login(self.admin)
+        filtros = {'sede': 'abc', 'fecha_desde': '2026-02-30', 'fecha_hasta': 'x'}
+        r = self.client.get(reverse('lista_pagos'), filtros, secure=True)
+        self.assertEqual((len(r.context['pagos']), r.context['total_pagos']), (2, 6000))
+        r = self.client.get(reverse('lista_egresos'), filtros, secure=True)
+        self.assertEqual((len(r.context['egresos']), r.context['total_egresos']), (2, 1000))
+        r = self.client.get(reverse('lista_pagos'), {'sede': self.sede2.pk, 'fecha_desde': self.hoy.isoformat()}, secure=True)
+        self.assertEqual((len(r.context['pagos']), r.context['total_pagos']), (1, 5000))
+
+
+class InvalidacionTests(TestCase):
+
+    def test_cambio_de_otro_worker_llega_aunque_este_tambien_avance(self):
+        avisos = []
+        invalidacion.al_cambiar('prueba:', avisos.append)
+        self.addCleanup(invalidacion._suscriptores.pop)
+        invalidacion.sincronizar(forzar=True)
+
+        # Otro worker avanza el espacio y después este también, antes de sincronizar
+        ContadorInvalidacion.objects.create(espacio='prueba:x', version=1)
+        invalidacion._incrementar('prueba:x')
+        invalidacion.sincronizar(forzar=True)
+        self.assertEqual(avisos, ['prueba:x'])
+
+        # Un cambio solo propio no se avisa a sí mismo
+        invalidacion._incrementar('prueba:x')
+        invalidacion.sincronizar(forzar=True)
+        self.assertEqual(avisos, ['prueba:x'])
+        self.assertEqual(invalidacion.version('prueba:x'), 3)
+
+
+class PaginacionKeysetTests(DatosBase):
+    """Cada página sigue a la última fila mostrada, sin OFFSET."""
+
+    def setUp(self):
+        for apellido, nombre in [('Acosta', 'Ana'), ('Acosta', 'Beto'), ('Benítez', 'Ana'), ('Cano', 'Eva'), ('Duarte', 'Luz')]:
+            Alumno.objects.create(sede=self.sede, carrera=self.carrera, nombre=nombre, apellido=apellido)
+        self.orden = ('apellido', 'nombre', 'id')
+
+    def nombres(self, pagina):
+        return [f'{a.apellido} {a.nombre}' for a in pagina['filas']]
+
+    def test_avanza_y_retrocede_sin_repetir_filas(self):
+        from .paginacion import paginar_keyset
+        alumnos = Alumno.objects.all()
+        primera = paginar_keyset(alumnos, self.orden, por_pagina=2)
+        self.assertEqual(self.nombres(primera), ['Acosta Ana', 'Acosta Beto'])
+        self.assertEqual((primera['hay_anterior'], primera['hay_siguiente']), (False, True))
+
+        # Una fila nueva antes del cursor no desplaza la página siguiente
+        Alumno.objects.create(sede=self.sede, carrera=self.carrera, nombre='Abel', apellido='Acosta')
+        segunda = paginar_keyset(alumnos, self.orden, despues=primera['cursor_siguiente'], por_pagina=2)
+        self.assertEqual(self.nombres(segunda), ['Benítez Ana', 'Cano Eva'])
+        tercera = paginar_keyset(alumnos, self.orden, despues=segunda['cursor_siguiente'], por_pagina=2)
+        self.assertEqual(self.nombres(tercera), ['Duarte Luz'])
+        self.assertEqual((tercera['hay_anterior'], tercera['hay_siguiente']), (True, False))
+
+        atras = paginar_keyset(alumnos, self.orden, antes=segunda['cursor_anterior'], por_pagina=2)
+        self.assertEqual(self.nombres(atras), ['Acosta Ana', 'Acosta Beto'])
+        self.assertTrue(atras['hay_anterior'])
+
+    def test_cursor_invalido_vuelve_a_la_primera_pagina(self):
+        from .paginacion import codificar_cursor, paginar_keyset
+        alumnos = Alumno.objects.all()
+        for cursor in ('basura', codificar_cursor(['Cano'])):
+            pagina = paginar_keyset(alumnos, self.orden, despues=cursor, por_pagina=2)
+            self.assertEqual(self.nombres(pagina), ['Acosta Ana', 'Acosta Beto'])
+
+    @mock.patch('sysapp.views.ALUMNOS_POR_PAGINA', 3)
+    def test_lista_alumnos_pagina_con_cursor(self):
+        self.client.force_login(self.admin)
+        r = self.client.get(reverse('lista_alumnos'), secure=True)
+        self.assertEqual(len(r.context['alumnos']), 3)
+        self.assertEqual(r.context['total_alumnos'], 5)
+        r = self.client.get(reverse('lista_alumnos'), {'despues': r.context['pagina']['cursor_siguiente']}, secure=True)
+        self.assertEqual([a.apellido for a in r.context['alumnos']], ['Cano', 'Duarte'])
+
+
+class DetalleAlumnoTests(DatosBase):
+    """Totales y cobertura del alumno salen de la misma consulta que la fila."""
+
+    def setUp(self):
+        self.alumno = Alumno.objects.create(sede=self.sede, carrera=self.carrera, nombre='José', apellido='Núñez')
+        self.client.force_login(self.admin)
+
+    def cuota(self, importe, valido_hasta, **extra):
+        return self.pago(importe, alumno=self.alumno, valido_hasta=valido_hasta, **extra)
+
+    def test_resumen_excluye_matriculas(self):
+        self.cuota(100000, self.hoy + timedelta(days=20))
+        self.cuota(100000, self.hoy + timedelta(days=50))
+        self.cuota(50000, self.hoy + timedelta(days=400), es_matricula=True)
+        alumno = Alumno.objects.con_resumen().get(pk=self.alumno.pk)
+        self.assertEqual(alumno.resumen_total_pagado, 200000)
+        self.assertEqual(alumno.resumen_vigente_hasta, self.hoy + timedelta(days=50))
+
+        r = self.client.get(reverse('detalle_alumno', args=[self.alumno.uuid]), secure=True)
+        self.assertEqual((r.context['total_pagado'], r.context['estado_cobertura']), (200000, 'AL_DIA'))
+
+    def test_consultas_no_crecen_con_el_historial(self):
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+        url = reverse('detalle_alumno', args=[self.alumno.uuid])
+
+        def consultas():
+            with CaptureQueriesContext(connection) as capturadas:
+                self.client.get(url, secure=True)
+            return len(capturadas)
+
+        self.cuota(100000, self.hoy - timedelta(days=5))
+        consultas()  # la primera también relee los contadores de invalidación
+        antes = consultas()
+        for i in range(5):
+            self.cuota(100000, self.hoy + timedelta(days=30 * i))
+        self.assertEqual(consultas(), antes)
+
+
+class SaldoPuntosTests(DatosBase):
+    """El saldo de puntos se mantiene en la fila del alumno y un canje no puede pasarse de él."""
+
+    def setUp(self):
+        self.alumno = Alumno.objects.create(sede=self.sede, carrera=self.carrera, nombre='José', apellido='Núñez')
+
+    def cuota(self):
+        # Pagada con más de 30 días de anticipación: 3 puntos
+        return self.pago(100000, alumno=self.alumno, fecha_vencimiento=self.hoy + timedelta(days=40))
+
+    def saldo(self):
+        return Alumno.objects.values_list('saldo_puntos', flat=True).get(pk=self.alumno.pk)
+
+    def test_pagos_y_canjes_actualizan_el_saldo(self):
+        from .models import CanjeEstrellas
+        pago = self.cuota()
+        self.cuota()
+        self.assertEqual(self.saldo(), 6)
+
+        CanjeEstrellas.objects.create(alumno=self.alumno, cantidad=4, concepto='Remera')
+        self.assertEqual(self.saldo(), 2)
+        with self.assertRaises(ValidationError):
+            CanjeEstrellas.objects.create(alumno=self.alumno, cantidad=3, concepto='Taza')
+        self.assertEqual(CanjeEstrellas.objects.count(), 1)
+
+        pago.delete()
+        self.assertEqual(self.saldo(), -1)
+
+    def test_canje_sin_saldo_informa_el_error(self):
+        self.cuota()
+        self.client.force_login(self.usuario)
+        r = self.client.post(
+            reverse('canjear_estrellas', args=[self.alumno.uuid]), {'cantidad': 5, 'concepto': 'Remera'}, secure=True,
+        )
+        self.assertIn('no tiene suficientes puntos', ' '.join(str(m) for m in get_messages(r.wsgi_request)))
+        self.assertEqual(self.saldo(), 3)
+
+    def test_recalcular_puntos_corrige_diferencias(self):
+        from io import StringIO
+        from django.core.management import call_command
+        self.cuota()
+        Alumno.objects.filter(pk=self.alumno.pk).update(saldo_puntos=50)
+
+        call_command('recalcular_puntos', '--dry-run', stdout=StringIO())
+        self.assertEqual(self.saldo(), 50)
+        salida = StringIO()
+        call_command('recalcular_puntos', stdout=salida)
+        self.assertIn('1 diferencias corregidas', salida.getvalue())
+        self.assertEqual(self.saldo(), 3)
+
+
+class ClavesBusquedaTests(DatosBase):
+    """Las claves normalizadas permiten buscar sin distinguir tildes, mayúsculas ni puntos de la cédula."""
+
+    def setUp(self):
+        self.alumno = Alumno.objects.create(
+            sede=self.sede, carrera=self.carrera, nombre='José', apellido='Núñez', cedula='1.234.567',
+        )
+
+    def test_claves_se_calculan_al_guardar(self):
+        self.assertEqual((self.alumno.busqueda_nombre, self.alumno.cedula_digitos), ('jose nunez', '1234567'))
+        pago = self.pago(1000, alumno=self.alumno, nombre_cliente='Ñandutí SRL')
+        self.assertEqual(pago.busqueda_nombre, 'jose nunez nanduti srl')
+        self.assertEqual(self.egreso(300).busqueda_concepto, 'gasto')
+
+        # Renombrar al alumno actualiza la clave de sus pagos
+        self.alumno.apellido = 'Ibáñez'
+        self.alumno.save(update_fields=['apellido'])
+        self.assertEqual(Pago.objects.get(pk=pago.pk).busqueda_nombre, 'jose ibanez nanduti srl')
+        self.assertEqual(Alumno.objects.get(pk=self.alumno.pk).busqueda_nombre, 'jose ibanez')
+
+    def test_busquedas_sin_tildes_ni_puntos(self):
+        for texto in ('NUNEZ', 'núñez', '1234567', '234.5'):
+            self.assertEqual(list(Alumno.objects.buscar(texto)), [self.alumno], texto)
+
+        pago = self.pago(1000, alumno=self.alumno)
+        self.pago(2000, nombre_cliente='Otro')
+        self.client.force_login(self.admin)
+        r = self.client.get(reverse('lista_pagos'), {'q': 'Jose NUNEZ'}, secure=True)
+        self.assertEqual([p.pk for p in r.context['pagos']], [pago.pk])
+
+
+class InformeCajaTests(DatosBase):
+
+    def test_egresos_por_categoria(self):
+        self.egreso(300)
+        self.egreso(200)
+        Egreso.objects.create(
+            fecha=self.hoy, sede=self.sede, numero_comprobante='M1', categoria='MATERIALES', concepto='Tiza', monto=50,
+        )
+        self.egreso(999, sede=self.sede2)
+        self.client.force_login(self.admin)
+        r = self.client.get(reverse('informe_caja'), {
+            'sede': self.sede.pk, 'fecha_desde': self.hoy.isoformat(), 'fecha_hasta': self.hoy.isoformat(),
+        }, secure=True)
+        self.assertEqual(r.context['egresos_por_categoria'], {
+            'Servicios (Luz, Agua, Internet)': 500, 'Materiales y Suministros': 50,
+        })
+        self.assertEqual(r.context['total_egresos'], 550)
+
+
+class ExportacionCsvTests(DatosBase):
+    """Los CSV salen en streaming, con los mismos filtros que los listados."""
+
+    def setUp(self):
+        self.client.force_login(self.admin)
+
+    def csv(self, nombre, datos):
+        r = self.client.get(reverse(nombre), datos, secure=True)
+        self.assertTrue(r.streaming)
+        self.assertIn('attachment', r['Content-Disposition'])
+        texto = b''.join(r.streaming_content).decode()
+        self.assertTrue(texto.startswith('\ufeff'))
+        return [linea.split(';') for linea in texto.lstrip('\ufeff').splitlines()]
+
+    def test_pagos_y_egresos(self):
+        self.pago(1500, numero_recibo='R1', nombre_cliente='Núñez SA')
+        self.pago(9000, numero_recibo='R2', sede=self.sede2)
+        self.egreso(300)
+        filtro = {'sede': self.sede.pk, 'fecha_desde': self.hoy.isoformat()}
+
+        filas = self.csv('exportar_pagos', filtro)
+        self.assertEqual(filas[0][:2], ['Fecha', 'Nº Recibo'])
+        self.assertEqual([(f[1], f[3], f[-1]) for f in filas[1:]], [('R1', 'Núñez SA', '1500')])
+        filas = self.csv('exportar_egresos', filtro)
+        self.assertEqual([(f[1], f[-1]) for f in filas[1:]], [('E300', '300')])
+
+    @mock.patch('sysapp.exportacion.LINEAS_POR_ENVIO', 2)
+    def test_informe_de_caja_se_envia_por_partes(self):
+        for i in range(3):
+            self.pago(1000 + i, numero_recibo=f'R{i}')
+        self.egreso(300)
+        hoy = self.hoy.isoformat()
+        r = self.client.get(reverse('exportar_informe_caja'), {'sede': self.sede.pk, 'fecha_desde': hoy, 'fecha_hasta': hoy}, secure=True)
+        partes = list(r.streaming_content)
+        # Encabezado, luego de a dos líneas
+        self.assertEqual(len(partes), 3)
+        lineas = b''.join(partes).decode().splitlines()[1:]
+        self.assertEqual([l.split(';')[0] for l in lineas], ['Ingreso', 'Ingreso', 'Ingreso', 'Egreso'])
+
+
+class RendicionSedesTests(DatosBase):
+
+    def test_una_consulta_para_todas_las_sedes(self):
+        from .models import rendicion_sedes
+        self.pago(1000)
+        self.pago(500, metodo_pago='DEPOSITO', monto_efectivo=0, monto_deposito=500)
+        self.egreso(300)
+        self.pago(7000, sede=self.sede2)
+        self.pago(9999, fecha=self.ayer)
+        vacia = Sede.objects.create(nombre='Sur', direccion='x', telefono='3')
+
+        with self.assertNumQueries(1):
+            rendiciones = rendicion_sedes(self.hoy, [self.sede, self.sede2, vacia])
+        central = rendiciones[self.sede.pk]
+        self.assertEqual(
+            (central['total_ingresos'], central['total_efectivo'], central['total_deposito'], central['total_egresos']),
+            (1500, 1000, 500, 300),
+        )
+        self.assertEqual((central['cantidad_pagos'], central['balance']), (2, 1200))
+        self.assertEqual(rendiciones[self.sede2.pk]['total_ingresos'], 7000)
+        self.assertEqual((rendiciones[vacia.pk]['total_ingresos'], rendiciones[vacia.pk]['cantidad_pagos']), (0, 0))
+
+    def test_rendicion_dia_usa_las_mismas_filas(self):
+        self.pago(1000)
+        self.egreso(300)
+        with self.assertNumQueries(2):
+            rendicion = self.sede.rendicion_dia(self.hoy)
+            self.assertEqual([p.alumno for p in rendicion['pagos']], [None])
+        self.assertEqual((rendicion['total_ingresos'], rendicion['total_egresos'], rendicion['balance']), (1000, 300, 700))
+
+
+class NotificacionesTests(DatosBase):
+    """Las notificaciones se calculan una vez por rol y día, hasta que cambia una materia o solicitud."""
+
+    def setUp(self):
+        from django.core.cache import cache
+        cache.clear()
+        invalidacion.sincronizar(forzar=True)
+        self.materia = Materia.objects.create(carrera=self.carrera, nombre='Anatomía', fecha_examen_parcial=self.hoy)
+
+    def test_cache_por_rol_hasta_que_cambia_una_materia(self):
+        from .notificaciones import notificaciones
+        self.assertEqual(notificaciones(self.usuario)['total_notificaciones'], 1)
+        with self.assertNumQueries(0):
+            notificaciones(self.usuario)
+        SolicitudEliminacion.objects.create(usuario_solicita=self.usuario, modelo='PAGO', objeto_id=1, motivo='x')
+        invalidacion.sincronizar(forzar=True)
+        # El admin además ve las solicitudes pendientes
+        datos = notificaciones(self.admin)
+        self.assertEqual((datos['total_notificaciones'], datos['solicitudes_pendientes_count']), (2, 1))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.materia.fecha_examen_final = self.hoy + timedelta(days=2)
+            self.materia.save()
+        self.assertEqual(notificaciones(self.usuario)['total_notificaciones'], 2)
+
+
+class CampanaNotificacionesTests(DatosBase):
+    """La campana pide las notificaciones por JSON y, bajo ASGI, las recibe por SSE."""
+
+    def setUp(self):
+        from django.core.cache import cache
+        cache.clear()
+        Materia.objects.create(carrera=self.carrera, nombre='Anatomía', fecha_examen_final=self.hoy)
+
+    def test_json(self):
+        self.client.force_login(self.usuario)
+        datos = self.client.get(reverse('api_notificaciones'), secure=True).json()
+        self.assertEqual((datos['total'], datos['solicitudes_pendientes']), (1, 0))
+        notificacion = datos['notificaciones'][0]
+        self.assertEqual(notificacion['fecha'], self.hoy.strftime('%d/%m/%Y'))
+        self.assertEqual(notificacion['url'], reverse('detalle_carrera', args=[self.carrera.pk]))
+
+    def test_stream_bajo_wsgi_deriva_al_json(self):
+        url = reverse('stream_notificaciones')
+        self.assertEqual(self.client.get(url, secure=True).status_code, 401)
+        self.client.force_login(self.usuario)
+        self.assertEqual(self.client.get(url, secure=True).status_code, 204)
+
+    @mock.patch('sysapp.views.SSE_INTERVALO', 0)
+    @mock.patch('sysapp.views.SSE_DURACION', 0.2)
+    async def test_stream_envia_solo_cuando_cambia_la_version(self):
+        await self.async_client.aforce_login(self.usuario)
+        r = await self.async_client.get(reverse('stream_notificaciones'), secure=True)
+        self.assertEqual(r['Content-Type'], 'text/event-stream')
+        eventos = ''.join([parte.decode() async for parte in r.streaming_content])
+        self.assertTrue(eventos.startswith('retry: 0\n\n'))
+        self.assertEqual(eventos.count('event: notificaciones'), 1)
+        self.assertIn('"total": 1', eventos)
+
+
+class SelectorAlumnoTests(DatosBase):
+    """El <select> de alumno del PagoForm solo trae la opción elegida."""
+
+    def setUp(self):
+        self.alumno = Alumno.objects.create(sede=self.sede, carrera=self.carrera, nombre='José', apellido='Núñez', cedula='123')
+        Alumno.objects.create(sede=self.sede, carrera=self.carrera, nombre='Ana', apellido='Benítez')
+
+    def opciones(self, form):
+        import re
+        return re.findall(r'<option value="([^"]*)"[^>]*>([^<]*)</option>', str(form['alumno']))
+
+    def test_solo_la_opcion_elegida(self):
+        from .forms import PagoForm
+        vacio, elegido = PagoForm(), PagoForm(initial={'alumno': self.alumno.pk})
+        with self.assertNumQueries(0):
+            self.assertEqual(self.opciones(vacio), [('', '---------')])
+        with self.assertNumQueries(1):
+            opciones = self.opciones(elegido)
+        self.assertEqual(opciones, [('', '---------'), (str(self.alumno.pk), 'José Núñez (123)')])
+        self.assertIn(reverse('buscar_alumno'), str(PagoForm()['alumno']))
+
+        # Un valor enviado que no es un id se muestra sin opción, sin error
+        self.assertEqual(self.opciones(PagoForm(data={'alumno': 'abc'})), [('', '---------')])
+
+
+class ReferenciasTests(DatosBase):
+    """Los datos de referencia se leen de la caché bajo una clave versionada que avanza al guardar."""
+
+    def setUp(self):
+        from django.core.cache import cache
+        cache.clear()
+        invalidacion.sincronizar(forzar=True)
+
+    def test_guardar_avanza_la_version(self):
+        from . import referencias
+        self.assertEqual([c.nombre for c in referencias.carreras()], ['Enfermería'])
+        with self.assertNumQueries(0):
+            referencias.carreras()
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Carrera.objects.create(
+                nombre='Radiología', naturalidad='TS', duracion_meses=24, monto_mensualidad=1, monto_matricula=1, activa=False,
+            )
+        self.assertEqual([c.nombre for c in referencias.carreras()], ['Enfermería', 'Radiología'])
+        self.assertEqual([c.nombre for c in referencias.carreras(activas=True)], ['Enfermería'])
+        # Los demás grupos conservan su versión
+        self.assertEqual(referencias.versiones('sedes'), {'sedes': 0})
+
+    def test_script_pago_con_huella_del_contenido(self):
+        from . import referencias
+        self.client.force_login(self.usuario)
+        huella = referencias.script_pago()['huella']
+        r = self.client.get(reverse('referencias_pago_js', args=[huella]), secure=True)
+        self.assertIn('immutable', r['Cache-Control'])
+        self.assertIn('"monto_mensualidad": "100000"', r.content.decode())
+
+        with self.captureOnCommitCallbacks(execute=True):
+            CuentaBancaria.objects.create(entidad='Itaú', titular='CEP')
+        nueva = referencias.script_pago()['huella']
+        self.assertNotEqual(nueva, huella)
+        r = self.client.get(reverse('referencias_pago_js', args=[huella]), secure=True)
+        self.assertRedirects(r, reverse('referencias_pago_js', args=[nueva]), fetch_redirect_response=False)
+
+
+class EliminacionCajaCerradaTests(DatosBase):
+    """Eliminar algo que arrastra un movimiento de un día cerrado se informa, sin error 500."""
+
+    def setUp(self):
+        self.alumno = Alumno.objects.create(sede=self.sede, carrera=self.carrera, nombre='José', apellido='Núñez')
+        self.cerrado = self.pago(1000, fecha=self.ayer, alumno=self.alumno)
+        CierreCaja.cerrar(self.sede, self.usuario, self.ayer, self.ayer)
+        self.client.force_login(self.admin)
+
+    def test_aprobar_solicitud_en_cascada(self):
+        solicitud = SolicitudEliminacion.objects.create(
+            usuario_solicita=self.usuario, modelo='ALUMNO', objeto_id=self.alumno.pk, motivo='Duplicado',
+        )
+        r = self.client.post(
+            reverse('procesar_solicitud_eliminacion', args=[solicitud.pk]), {'accion': 'APROBAR'}, secure=True,
+        )
+        self.assertRedirects(r, reverse('lista_solicitudes_eliminacion'), fetch_redirect_response=False)
+        self.assertIn('ya está cerrada', ' '.join(str(m) for m in get_messages(r.wsgi_request)))
+        solicitud.refresh_from_db()
+        self.assertEqual(solicitud.estado, 'PENDIENTE')
+        self.assertTrue(Pago.objects.filter(pk=self.cerrado.pk).exists())
+
+    def test_admin_eliminar_sede_y_seleccionados(self):
+        url = reverse('admin:sysapp_sede_delete', args=[self.sede.pk])
+        r = self.client.post(url, {'post': 'yes'}, secure=True)
+        self.assertRedirects(r, url, fetch_redirect_response=False)
+        self.assertTrue(Sede.objects.filter(pk=self.sede.pk).exists())
+
+        abierto = self.pago(500)
+        url = reverse('admin:sysapp_pago_changelist')
+        r = self.client.post(url, {
+            'action': 'delete_selected', 'post': 'yes', '_selected_action': [self.cerrado.pk, abierto.pk],
+        }, secure=True)
+        self.assertRedirects(r, url, fetch_redirect_response=False)
+        self.assertIn('ya está cerrada', ' '.join(str(m) for m in get_messages(r.wsgi_request)))
+        self.assertEqual(Pago.objects.filter(pk__in=[self.cerrado.pk, abierto.pk]).count(), 2)
@@ -21,13 +21,20 @@ urlpatterns = [
     path('buscar-alumno/', views.buscar_alumno, name='buscar_alumno'),
     path('alumno/<uuid:alumno_uuid>/ficha/', views.ficha_alumno, name='ficha_alumno'),
     path('alumno/<uuid:alumno_uuid>/ficha/editar/', views.editar_datos_ficha, name='editar_datos_ficha'),
+    path('alumnos/fichas/', views.fichas_lote, name='fichas_lote'),
 
     # Caja (Ingresos y Egresos)
     path('caja/', views.lista_caja, name='lista_caja'),
     path('caja/informe/', views.informe_caja, name='informe_caja'),
+    path('caja/informe/exportar/', views.exportar_informe_caja, name='exportar_informe_caja'),
+    path('caja/cubo/', views.cubo_caja, name='cubo_caja'),
+    path('caja/conciliacion/', views.conciliacion_bancaria, name='conciliacion_bancaria'),
+    path('caja/conciliacion/<int:pk>/', views.detalle_extracto, name='detalle_extracto'),
 
     # Egresos
     path('egresos/', views.lista_egresos, name='lista_egresos'),
+    path('egresos/exportar/', views.exportar_egresos, name='exportar_egresos'),
+    path('egresos/api/', views.api_egresos, name='api_egresos'),
     path('egresos/registrar/', views.registrar_egreso, name='registrar_egreso'),
     path('egresos/<uuid:egreso_uuid>/', views.detalle_egreso, name='detalle_egreso'),
     path('egresos/<uuid:egreso_uuid>/editar/', views.editar_egreso, name='editar_egreso'),
@@ -35,7 +42,13 @@ urlpatterns = [
 
     # Pagos
     path('pagos/', views.lista_pagos, name='lista_pagos'),
+    path('pagos/api/', views.api_pagos, name='api_pagos'),
+    path('pagos/exportar/', views.exportar_pagos, name='exportar_pagos'),
     path('pagos/registrar/', views.registrar_pago, name='registrar_pago'),
+    path('pagos/registrar/lote/', views.registrar_pagos_lote, name='registrar_pagos_lote'),
+    path('pagos/recibos/siguiente/', views.siguiente_recibo, name='siguiente_recibo'),
+    path('pagos/recibos/reservar/', views.reservar_recibos, name='reservar_recibos'),
+    path('pagos/referencias.<slug:huella>.js', views.referencias_pago_js, name='referencias_pago_js'),
     path('pagos/<uuid:pago_uuid>/', views.detalle_pago, name='detalle_pago'),
     path('pagos/<uuid:pago_uuid>/editar/', views.editar_pago, name='editar_pago'),
     path('pagos/<uuid:pago_uuid>/eliminar/', views.eliminar_pago, name='eliminar_pago'),
@@ -69,6 +82,10 @@ urlpatterns = [
     path('usuarios/', views.lista_usuarios, name='lista_usuarios'),
     path('usuarios/solicitudes-eliminacion/', views.lista_solicitudes_eliminacion, name='lista_solicitudes_eliminacion'),
     path('usuarios/solicitudes-eliminacion/<int:solicitud_id>/procesar/', views.procesar_solicitud_eliminacion, name='procesar_solicitud_eliminacion'),
+
+    # Notificaciones (campana): JSON y stream SSE
+    path('notificaciones/', views.api_notificaciones, name='api_notificaciones'),
+    path('notificaciones/stream/', views.stream_notificaciones, name='stream_notificaciones'),
     path('usuarios/crear/', views.crear_usuario, name='crear_usuario'),
     path('usuarios/perfil/', views.mi_perfil, name='mi_perfil'),
     path('usuarios/configuracion/', views.configuracion, name='configuracion'),
@@ -1,17 +1,26 @@
 from django.contrib.auth.models import User, Group, Permission
-from django.db import models
+from django.db import IntegrityError, models, transaction
 from django.shortcuts import render, get_object_or_404, redirect
 from django.contrib.auth.decorators import login_required
 from django.contrib.auth import authenticate, login, logout, update_session_auth_hash
 from django.contrib.auth.forms import AuthenticationForm, PasswordChangeForm
+from django.core.exceptions import ValidationError
 from django.db.models import Sum, Count, Q
 from django.template import context
 from django.utils import timezone
+from django.utils.dateparse import parse_date
 from django.contrib import messages
-from django.http import JsonResponse
+from django.core.handlers.asgi import ASGIRequest
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import HttpResponse, JsonResponse, StreamingHttpResponse
 from django.views.decorators.http import require_http_methods
-from datetime import timedelta, datetime, date
+from datetime import MAXYEAR, timedelta, datetime, date
+import asyncio
 import json
+import time
+from urllib.parse import urlencode
+
+from asgiref.sync import sync_to_async
 from django.db.models import Max
 from dateutil.relativedelta import relativedelta
 
@@ -19,13 +28,36 @@ from .models import (
     Sede, Alumno, Funcionario, Pago, Carrera,
     AsistenciaFuncionario, Materia, Egreso,
     CanjeEstrellas, SolicitudEliminacion, CuentaBancaria,
-    CierreCaja,
+    CierreCaja, ResumenDiario, ExtractoBancario, MovimientoBancario, ReservaRecibos, SecuenciaRecibo,
+    estado_por_cobertura, normalizar_busqueda, rango_mes,
+    filtro_rango, rendicion_sedes, saldo_acumulado, totales_periodo,
 )
 from .forms import (
     PagoForm, AlumnoForm, FuncionarioForm, AsistenciaForm,
-    SedeForm, CarreraForm, UsuarioForm, MateriaForm, EgresoForm, PerfilForm, RoleForm,
+    SedeForm, CarreraForm, UsuarioForm, MateriaForm, EgresoForm, PerfilForm, RoleForm, PagoLoteFormSet,
 )
 from .decorators import admin_required
+from .paginacion import paginar_keyset
+from .conciliacion import conciliar_manual, importar_extracto
+from .listados import CAMPOS_EGRESO, CAMPOS_PAGO, POR_PAGINA, respuesta_pagina
+from .busqueda import buscar_ids, filas_por_ids
+from .cubo import CUBOS, NOMBRES_DIMENSION, pivotar
+from .exportacion import (
+    ENCABEZADOS_CAJA, ENCABEZADOS_EGRESOS, ENCABEZADOS_PAGOS,
+    filas_caja, filas_egresos, filas_pagos, respuesta_csv,
+)
+from .signals import pagos_creados_en_lote
+from .notificaciones import aversion, para_json
+from . import referencias
+from .fichas import alumnos_lote, contexto_ficha, documento_lote, pagos_ficha
+
+
+def _entero_get(request, nombre):
+    """Entero positivo del parámetro GET `nombre` (un id, un año), o None si falta o no es válido."""
+    valor = request.GET.get(nombre, '').strip()
+    if valor.isascii() and valor.isdigit() and 0 < int(valor) < 2 ** 63:
+        return int(valor)
+    return None
 
 
 #  AUTENTICACIÓN
@@ -75,10 +107,10 @@ def register(request):
 def dashboard(request):
     hoy = timezone.now().date()
 
-    alumnos_activos    = Alumno.objects.filter(activo=True)
-    alumnos_al_dia     = sum(1 for a in alumnos_activos if a.estado_pagos == 'AL_DIA')
-    alumnos_por_vencer = sum(1 for a in alumnos_activos if a.estado_pagos == 'CERCANO_VENCIMIENTO')
-    alumnos_atrasados  = sum(1 for a in alumnos_activos if a.estado_pagos == 'ATRASADO')
+    conteo             = Alumno.objects.filter(activo=True).with_estado_pagos(hoy).conteo_por_estado()
+    alumnos_al_dia     = conteo['AL_DIA']
+    alumnos_por_vencer = conteo['CERCANO_VENCIMIENTO']
+    alumnos_atrasados  = conteo['ATRASADO']
     pagos_recientes    = Pago.objects.select_related('alumno', 'sede').order_by('-fecha_creacion')[:10]
 
     es_director = request.user.groups.filter(name='Director').exists() or request.user.is_staff
@@ -94,15 +126,14 @@ def dashboard(request):
     if es_director:
         ingresos_qs = Pago.objects.filter(fecha=hoy).select_related('alumno', 'sede')
         egresos_qs  = Egreso.objects.filter(fecha=hoy).select_related('sede')
-        total_ing   = ingresos_qs.aggregate(Sum('importe_total'))['importe_total__sum'] or 0
-        total_egr   = egresos_qs.aggregate(Sum('monto'))['monto__sum'] or 0
+        resumen_hoy = ResumenDiario.objects.filter(fecha=hoy).totales()
         context.update({
-            'total_ingresos_hoy':  total_ing,
-            'total_egresos_hoy':   total_egr,
-            'balance_hoy':         total_ing - total_egr,
-            'total_deposito_hoy':  ingresos_qs.aggregate(t=Sum('monto_deposito'))['t'] or 0,
-            'cantidad_ingresos':   ingresos_qs.count(),
-            'cantidad_egresos':    egresos_qs.count(),
+            'total_ingresos_hoy':  resumen_hoy['total_ingresos'],
+            'total_egresos_hoy':   resumen_hoy['total_egresos'],
+            'balance_hoy':         resumen_hoy['balance'],
+            'total_deposito_hoy':  resumen_hoy['total_deposito'],
+            'cantidad_ingresos':   resumen_hoy['cantidad_pagos'],
+            'cantidad_egresos':    resumen_hoy['cantidad_egresos'],
             'ultimas_transacciones': list(
                 [{'tipo': 'ing', 'desc': f"{p.alumno.nombre_completo if p.alumno else p.nombre_cliente}", 'monto': p.importe_total, 'sede': p.sede.nombre} for p in ingresos_qs.order_by('-id')[:5]]
                 + [{'tipo': 'eg', 'desc': p.concepto, 'monto': p.monto, 'sede': p.sede.nombre} for p in egresos_qs.order_by('-id')[:5]]
@@ -114,6 +145,10 @@ def dashboard(request):
 
 #  ALUMNOS
 
+ORDEN_LISTA_ALUMNOS = ('apellido', 'nombre', 'id')
+ALUMNOS_POR_PAGINA = 50
+
+
 @login_required
 def lista_alumnos(request):
     # Obtener la sede del perfil del usuario si no es admin
@@ -130,7 +165,7 @@ def lista_alumnos(request):
                     'total_atrasados': 0,
                     'total_alumnos': 0,
                     'sedes': Sede.objects.none(),
-                    'carreras': Carrera.objects.filter(activa=True),
+                    'carreras': referencias.carreras(activas=True),
                     'filtros': {},
                     'user_sede': None,
                     'is_staff': False,
@@ -145,20 +180,24 @@ def lista_alumnos(request):
                 'total_atrasados': 0,
                 'total_alumnos': 0,
                 'sedes': Sede.objects.none(),
-                'carreras': Carrera.objects.filter(activa=True),
+                'carreras': referencias.carreras(activas=True),
                 'filtros': {},
                 'user_sede': None,
                 'is_staff': False,
             })
 
-    # Obtener parámetros de filtro
-    sede_id = request.GET.get('sede')
-    carrera_id = request.GET.get('carrera')
+    # Obtener parámetros de filtro (ids no numéricos se ignoran)
+    sede_id = _entero_get(request, 'sede')
+    carrera_id = _entero_get(request, 'carrera')
     estado = request.GET.get('estado')
     busqueda = request.GET.get('busqueda')
 
     # Base queryset - filtrar por sede del usuario si no es admin
-    alumnos_qs = Alumno.objects.filter(activo=True).select_related('carrera', 'sede')
+    alumnos_qs = (
+        Alumno.objects.filter(activo=True)
+        .select_related('carrera', 'sede')
+        .with_estado_pagos(timezone.now().date())
+    )
 
     # APLICAR FILTRO DE SEDE SEGÚN PERFIL
     if not request.user.is_staff and user_sede:
@@ -168,49 +207,53 @@ def lista_alumnos(request):
         # Si es admin y seleccionó una sede específica
         alumnos_qs = alumnos_qs.filter(sede_id=sede_id)
 
-    # Convertir a lista para filtrar por estado_pagos (que es property)
-    todos_activos = list(alumnos_qs)
-
-    # Calcular totales por estado (para las cards)
-    total_al_dia = sum(1 for a in todos_activos if a.estado_pagos == 'AL_DIA')
-    total_por_vencer = sum(1 for a in todos_activos if a.estado_pagos == 'CERCANO_VENCIMIENTO')
-    total_atrasados = sum(1 for a in todos_activos if a.estado_pagos == 'ATRASADO')
-    total_alumnos = len(todos_activos)
-
-    # Aplicar filtros adicionales (en Python porque estado_pagos es property)
-    alumnos = todos_activos
+    # Totales por estado (para las cards) en una sola consulta agregada
+    conteo = alumnos_qs.conteo_por_estado()
+    total_al_dia = conteo['AL_DIA']
+    total_por_vencer = conteo['CERCANO_VENCIMIENTO']
+    total_atrasados = conteo['ATRASADO']
+    total_alumnos = conteo['total']
 
+    # Filtros adicionales, resueltos en la base de datos
+    alumnos = alumnos_qs
     if carrera_id:
-        alumnos = [a for a in alumnos if str(a.carrera_id) == carrera_id]
+        alumnos = alumnos.filter(carrera_id=carrera_id)
     if busqueda:
-        b = busqueda.lower()
-        alumnos = [
-            a for a in alumnos
-            if b in a.nombre.lower()
-               or b in a.apellido.lower()
-               or b in (a.cedula or '').lower()
-               or (a.carrera and b in a.carrera.nombre.lower())
-               or (a.sede and b in a.sede.nombre.lower())
-        ]
+        alumnos = alumnos.buscar(busqueda)
     if estado:
-        alumnos = [a for a in alumnos if a.estado_pagos == estado]
+        alumnos = alumnos.filter(estado=estado)
+
+    # Paginación por keyset sobre (apellido, nombre, id): solo se trae la página visible
+    pagina = paginar_keyset(
+        alumnos, ORDEN_LISTA_ALUMNOS,
+        despues=request.GET.get('despues'),
+        antes=request.GET.get('antes'),
+        por_pagina=ALUMNOS_POR_PAGINA,
+    )
+
+    # Query string de los filtros activos, para conservarlos al navegar entre páginas
+    filtros_qs = request.GET.copy()
+    filtros_qs.pop('despues', None)
+    filtros_qs.pop('antes', None)
 
     # Determinar qué sedes mostrar en los filtros
     if request.user.is_staff:
         # Admin ve todas las sedes
-        sedes = Sede.objects.filter(activa=True)
+        sedes = referencias.sedes(activas=True)
     else:
         # Usuario normal ve SOLO su sede
-        sedes = Sede.objects.filter(id=user_sede.id) if user_sede else Sede.objects.none()
+        sedes = [user_sede] if user_sede else []
 
     return render(request, 'alumnos/listaAlumnos.html', {
-        'alumnos': alumnos,
+        'alumnos': pagina['filas'],
+        'pagina': pagina,
+        'filtros_qs': filtros_qs.urlencode(),
         'total_al_dia': total_al_dia,
         'total_por_vencer': total_por_vencer,
         'total_atrasados': total_atrasados,
         'total_alumnos': total_alumnos,
         'sedes': sedes,
-        'carreras': Carrera.objects.filter(activa=True),
+        'carreras': referencias.carreras(activas=True),
         'filtros': {
             'sede': sede_id,
             'carrera': carrera_id,
@@ -223,50 +266,28 @@ def lista_alumnos(request):
 
 @login_required
 def detalle_alumno(request, alumno_uuid):
-    alumno = get_object_or_404(Alumno, uuid=alumno_uuid)
+    # Alumno + totales + cobertura (+ saldo de puntos) en una sola consulta; luego pagos y canjes
+    alumno = get_object_or_404(
+        Alumno.objects.select_related('sede', 'carrera').con_resumen(),
+        uuid=alumno_uuid,
+    )
     hoy = date.today()
 
-    # ── Pagos del alumno (excluir matrículas, ordenar del más reciente) ──────
-    pagos = alumno.pagos.all().order_by('-fecha')
+    # ── Pagos del alumno (ordenar del más reciente) ───────────────────────────
+    pagos = list(alumno.pagos.order_by('-fecha', '-id'))
 
     # ── Canjes ────────────────────────────────────────────────────────────────
-    canjes = alumno.canjes.all().order_by('-fecha')
-
-    # ── Total pagado ──────────────────────────────────────────────────────────
-    total_pagado = alumno.pagos.filter(
-        es_matricula=False
-    ).aggregate(total=Sum('importe_total'))['total'] or 0
+    canjes = list(alumno.canjes.select_related('usuario_registro').order_by('-fecha'))
 
-    # ── Total de estrellas (puntos) actuales ──────────────────────────────────
-    puntos_ganados = alumno.pagos.filter(
-        es_matricula=False
-    ).aggregate(total=Sum('puntos'))['total'] or 0
+    total_pagado    = alumno.resumen_total_pagado
+    total_estrellas = max(0, alumno.saldo_puntos)
+    valido_hasta    = alumno.resumen_vigente_hasta
 
-    puntos_canjeados = alumno.canjes.aggregate(
-        total=Sum('cantidad')
-    )['total'] or 0
-
-    total_estrellas = max(0, puntos_ganados - puntos_canjeados)
-
-    ultimo_pago_con_vigencia = alumno.pagos.filter(
-        es_matricula=False,
-        valido_hasta__isnull=False,
-    ).order_by('-valido_hasta').first()
-
-    valido_hasta = None
-    estado_cobertura = 'SIN_PAGOS'
-
-    if ultimo_pago_con_vigencia:
-        valido_hasta = ultimo_pago_con_vigencia.valido_hasta
-
-        dias_restantes = (valido_hasta - hoy).days
-
-        if dias_restantes < 0:
-            estado_cobertura = 'VENCIDO'
-        elif dias_restantes <= 10:
-            estado_cobertura = 'POR_VENCER'
-        else:
-            estado_cobertura = 'AL_DIA'
+    estado_cobertura = {
+        'AL_DIA':              'AL_DIA',
+        'CERCANO_VENCIMIENTO': 'POR_VENCER',
+        'ATRASADO':            'VENCIDO',
+    }.get(estado_por_cobertura(valido_hasta, hoy), 'SIN_PAGOS')
 
     return render(request, 'alumnos/detalleAlumnos.html', {
         'alumno':           alumno,
@@ -288,18 +309,21 @@ def canjear_estrellas(request, alumno_uuid):
 
         if cantidad <= 0:
             messages.error(request, 'La cantidad de puntos debe ser mayor a cero.')
-        elif cantidad > alumno.total_puntos:   # ← renombrado
-            messages.error(request, 'El alumno no tiene suficientes puntos para este canje.')
         elif not concepto:
             messages.error(request, 'Debe especificar el concepto del canje.')
         else:
-            CanjeEstrellas.objects.create(
-                alumno=alumno,
-                cantidad=cantidad,
-                concepto=concepto,
-                usuario_registro=request.user,
-            )
-            messages.success(request, f'Se han canjeado {cantidad} puntos exitosamente.')
+            # El saldo se verifica dentro de save(), con la fila del alumno bloqueada
+            try:
+                CanjeEstrellas.objects.create(
+                    alumno=alumno,
+                    cantidad=cantidad,
+                    concepto=concepto,
+                    usuario_registro=request.user,
+                )
+            except ValidationError:
+                messages.error(request, 'El alumno no tiene suficientes puntos para este canje.')
+            else:
+                messages.success(request, f'Se han canjeado {cantidad} puntos exitosamente.')
     return redirect('detalle_alumno', alumno_uuid=alumno_uuid)
 
 
@@ -356,11 +380,9 @@ def buscar_alumno(request):
     """Autocompletado AJAX — incluye monto_matricula para el formulario."""
     query = request.GET.get('q', '').strip()
     if len(query) >= 2:
-        alumnos = Alumno.objects.select_related('sede', 'carrera').filter(
-            Q(nombre__icontains=query) |
-            Q(apellido__icontains=query) |
-            Q(cedula__icontains=query)
-        )[:10]
+        alumnos = filas_por_ids(
+            Alumno.objects.select_related('sede', 'carrera'), buscar_ids('alumno', query, 10),
+        )
 
         resultados = [{
             'id':               alumno.id,
@@ -387,8 +409,8 @@ def cuentas_bancarias(request):
     POST → crea o recupera una cuenta bancaria y la devuelve.
     """
     if request.method == "GET":
-        cuentas = CuentaBancaria.objects.filter(activa=True).values('id', 'entidad', 'titular')
-        return JsonResponse({'cuentas': list(cuentas)})
+        cuentas = [{'id': c.id, 'entidad': c.entidad, 'titular': c.titular} for c in referencias.cuentas()]
+        return JsonResponse({'cuentas': cuentas})
 
     # POST
     try:
@@ -413,22 +435,58 @@ def cuentas_bancarias(request):
     except Exception as e:
         return JsonResponse({'error': str(e)}, status=400)
 
-#  PAGOS
+#  NUMERACIÓN DE RECIBOS
 
-def _carreras_data_json():
-    """JSON con id, monto_mensualidad y monto_matricula para el template."""
-    return json.dumps(
-        list(Carrera.objects.values('id', 'monto_mensualidad', 'monto_matricula')),
-        default=str,
-    )
+RESERVA_RECIBOS_MAXIMA = 1000
 
 
-def _cuentas_data_json():
-    """JSON con las cuentas bancarias activas."""
-    return json.dumps(
-        list(CuentaBancaria.objects.filter(activa=True).values('id', 'entidad', 'titular')),
-        default=str,
+@login_required
+@require_http_methods(["GET"])
+def siguiente_recibo(request):
+    """Próximo número de la secuencia de la sede (solo lectura, no lo asigna)."""
+    secuencia = SecuenciaRecibo.para_sede(request.GET.get('sede'), request.GET.get('serie'))
+    if secuencia is None:
+        return JsonResponse({'siguiente': None})
+    return JsonResponse({'siguiente': secuencia.formatear(secuencia.siguiente), 'serie': secuencia.serie})
+
+
+@login_required
+@admin_required
+@require_http_methods(["POST"])
+def reservar_recibos(request):
+    """Reserva un bloque de números para un talonario en papel; devuelve el rango asignado."""
+    try:
+        cantidad = int(request.POST.get('cantidad', ''))
+    except ValueError:
+        cantidad = 0
+    if not 1 <= cantidad <= RESERVA_RECIBOS_MAXIMA:
+        return JsonResponse({'error': f'La cantidad debe estar entre 1 y {RESERVA_RECIBOS_MAXIMA}.'}, status=400)
+    secuencia = SecuenciaRecibo.para_sede(request.POST.get('sede'), request.POST.get('serie'))
+    if secuencia is None:
+        return JsonResponse({'error': 'La sede no tiene una secuencia de recibos activa.'}, status=400)
+
+    reserva = ReservaRecibos.reservar(
+        secuencia, cantidad, usuario=request.user, observaciones=request.POST.get('observaciones', '')[:200],
     )
+    return JsonResponse({'desde': reserva.desde, 'hasta': reserva.hasta, 'cantidad': reserva.cantidad})
+
+
+#  PAGOS
+
+@login_required
+@require_http_methods(["GET"])
+def referencias_pago_js(request, huella):
+    """
+    Carreras y cuentas para formPagos.js. La URL lleva el hash del contenido
+    (referencias.script_pago), así que se puede guardar sin vencimiento; si
+    la huella ya no es la vigente se redirige a la actual.
+    """
+    script = referencias.script_pago()
+    if huella != script['huella']:
+        return redirect('referencias_pago_js', huella=script['huella'])
+    respuesta = HttpResponse(script['contenido'], content_type='text/javascript; charset=utf-8')
+    respuesta['Cache-Control'] = 'private, max-age=31536000, immutable'
+    return respuesta
 
 
 def _guardar_cuenta_bancaria_si_nueva(request, pago):
@@ -462,68 +520,127 @@ def _guardar_cuenta_bancaria_si_nueva(request, pago):
     else:
         pago.cuenta_bancaria = None
 
-@login_required
-def lista_pagos(request):
-    # Base de la consulta
-    pagos = Pago.objects.all().select_related('alumno', 'sede', 'carrera')
+
+# Listados de pagos y egresos: keyset sobre (fecha, id)
+ORDEN_LISTADO = ('-fecha', '-id')
+ORDEN_LISTADO_ASC = ('fecha', 'id')
+
+
+def _pagos_filtrados(request):
+    """Pagos según los filtros de lista_pagos (también los usa la exportación)."""
+    pagos = Pago.objects.all()
 
     # 1. Filtros de Búsqueda de Texto (Buscador Global)
     q = request.GET.get('q')
     if q:
         pagos = pagos.filter(
-            Q(alumno__nombre__icontains=q) |
-            Q(alumno__apellido__icontains=q) |
+            Q(busqueda_nombre__contains=normalizar_busqueda(q)) |
             Q(numero_recibo__icontains=q) |
-            Q(nombre_cliente__icontains=q) |
             Q(concepto__icontains=q)
         )
 
-    # 2. Filtros de Sede (Seguridad y Selección)
-    if not request.user.is_staff:
-        # Si no es admin, forzar su sede (ajusta 'perfil.sede' según tu modelo de User)
-        pagos = pagos.filter(sede=request.user.perfil.sede)
-    else:
-        sede_id = request.GET.get('sede')
-        if sede_id:
-            pagos = pagos.filter(sede_id=sede_id)
-
-    # 3. Filtros de Fecha
-    fecha_desde = request.GET.get('fecha_desde')
-    fecha_hasta = request.GET.get('fecha_hasta')
-
-    if fecha_desde:
-        pagos = pagos.filter(fecha__gte=fecha_desde)
-    if fecha_hasta:
-        pagos = pagos.filter(fecha__lte=fecha_hasta)
+    # 2 y 3. Sede (forzada si no es admin) y fechas, los mismos valores que usa el total
+    sede_id, desde, hasta, sin_sede = _alcance_listado(request)
+    if sin_sede:
+        return pagos.none()
+    pagos = pagos.filter(filtro_rango(desde, hasta, sede_id))
 
     # 4. Lógica de Ordenamiento (Mejora de UX)
     order_by = request.GET.get('order')
     if order_by == 'recibo':
         pagos = pagos.order_by('numero_recibo', '-fecha')
-    elif order_by == 'fecha':
-        pagos = pagos.order_by('fecha', 'id') # Orden ascendente
     else:
-        # Orden por defecto (lo más reciente arriba)
-        pagos = pagos.order_by('-fecha', '-id')
+        pagos = pagos.order_by(*_orden_listado(request))
+    return pagos
+
+
+def _orden_listado(request):
+    """Orden por keyset de los listados de pagos y egresos: (fecha, id), por defecto lo más reciente arriba."""
+    return ORDEN_LISTADO_ASC if request.GET.get('order') == 'fecha' else ORDEN_LISTADO
+
+
+def _filtros_sin_cursor(request):
+    filtros_qs = request.GET.copy()
+    filtros_qs.pop('despues', None)
+    filtros_qs.pop('antes', None)
+    return filtros_qs.urlencode()
+
+
+def _periodo_listado(request):
+    """(desde, hasta) de los filtros fecha_desde / fecha_hasta, o None si faltan o son inválidos."""
+    fechas = []
+    for clave in ('fecha_desde', 'fecha_hasta'):
+        try:
+            fechas.append(parse_date(request.GET.get(clave) or ''))
+        except ValueError:
+            fechas.append(None)
+    return fechas
+
+
+def _alcance_listado(request):
+    """
+    (sede_id, desde, hasta, sin_sede) validados para los listados de pagos y
+    egresos: con ellos se filtran las filas y se calcula el total. Quien no es
+    admin ve solo la sede de su perfil; `sin_sede` indica que no tiene una.
+    """
+    desde, hasta = _periodo_listado(request)
+    if request.user.is_staff:
+        return _entero_get(request, 'sede'), desde, hasta, False
+    sede_id = getattr(getattr(request.user, 'perfil', None), 'sede_id', None)
+    return sede_id, desde, hasta, sede_id is None
+
 
-    # 5. Cálculos (Sobre el queryset filtrado pero antes del slice)
-    total_pagos = pagos.aggregate(total=Sum('importe_total'))['total'] or 0
+def _primera_pagina(queryset, request):
+    """Primera página del listado por keyset y cursor de la siguiente (None si no hay más)."""
+    pagina = paginar_keyset(queryset, _orden_listado(request), despues=request.GET.get('despues'), por_pagina=POR_PAGINA)
+    return pagina['filas'], pagina['cursor_siguiente'] if pagina['hay_siguiente'] else None
 
-    # 6. Limitar registros (Importante: después de calcular el total)
-    pagos = pagos[:100]
 
-    # Datos adicionales para el contexto
-    sedes = Sede.objects.all().order_by('nombre')
+@login_required
+def lista_pagos(request):
+    pagos = _pagos_filtrados(request).select_related('alumno', 'sede', 'carrera')
+
+    # Total del listado: sin búsqueda de texto sale de los cierres y del resumen diario
+    sede_id, desde, hasta, sin_sede = _alcance_listado(request)
+    if sin_sede:
+        total_pagos = 0
+    elif request.GET.get('q'):
+        total_pagos = pagos.aggregate(total=Sum('importe_total'))['total'] or 0
+    else:
+        total_pagos = totales_periodo(desde, hasta, sede_id)['total_ingresos']
+
+    # Solo la primera página; el resto llega de api_pagos con scroll infinito.
+    # El orden por recibo no admite keyset (recibo nulo): se muestran los primeros 100.
+    if request.GET.get('order') == 'recibo':
+        pagos, cursor_siguiente = list(pagos[:100]), None
+    else:
+        pagos, cursor_siguiente = _primera_pagina(pagos, request)
 
     context = {
         'pagos': pagos,
-        'sedes': sedes,
+        'cursor_siguiente': cursor_siguiente,
+        'filtros_qs': _filtros_sin_cursor(request),
+        'sedes': referencias.sedes(),
         'total_pagos': total_pagos,
         'es_admin': request.user.is_staff,
     }
 
     return render(request, 'pagos/listaPagos.html', context)
 
+
+@login_required
+def api_pagos(request):
+    """Pagos en JSON con los filtros de lista_pagos, por páginas de cursor sobre (fecha, id)."""
+    pagos = _pagos_filtrados(request).select_related('alumno', 'sede', 'carrera')
+    return respuesta_pagina(request, pagos, _orden_listado(request), CAMPOS_PAGO, 'pagos/filaPago.html', 'pago')
+
+
+@login_required
+def exportar_pagos(request):
+    """CSV con todos los pagos que cumplen los filtros de lista_pagos, sin límite de filas."""
+    nombre = f"pagos_{timezone.now():%Y%m%d_%H%M}.csv"
+    return respuesta_csv(nombre, ENCABEZADOS_PAGOS, filas_pagos(_pagos_filtrados(request)))
+
 @login_required
 def detalle_pago(request, pago_uuid):
     pago = get_object_or_404(
@@ -547,6 +664,11 @@ def registrar_pago(request):
             pago.es_matricula     = form.cleaned_data.get('es_matricula', False)
             pago.metodo_pago      = form.cleaned_data.get('metodo_pago', 'EFECTIVO')
             pago.numero_recibo    = pago.numero_recibo or None
+            if not pago.numero_recibo:
+                # Sin número a mano: el siguiente de la secuencia de la sede, si tiene
+                secuencia = SecuenciaRecibo.para_sede(pago.sede_id)
+                if secuencia:
+                    pago.numero_recibo = secuencia.reservar()[0]
             pago.nombre_cliente   = form.cleaned_data.get('nombre_cliente') if es_cliente_diferenciado else None
             pago.alumno           = None if es_cliente_diferenciado else form.cleaned_data.get('alumno')
             pago.carrera          = form.cleaned_data.get('carrera') or (pago.alumno.carrera if pago.alumno else None)
@@ -574,17 +696,22 @@ def registrar_pago(request):
             pago.monto_efectivo = form.cleaned_data.get('monto_efectivo')
             pago.monto_deposito = form.cleaned_data.get('monto_deposito')
 
-            pago.save()
-
-            # Asociar cuenta bancaria DESPUÉS del save (necesita pk)
-            _guardar_cuenta_bancaria_si_nueva(request, pago)
-            pago.save(update_fields=['cuenta_bancaria'])
-
-            if pago.numero_recibo:
-                messages.success(request, f'Pago registrado exitosamente. Recibo No. {pago.numero_recibo}')
+            try:
+                with transaction.atomic():
+                    pago.save()
+            except IntegrityError:
+                # El número se registró en otro pago entre la validación y el guardado
+                form.add_error('numero_recibo', f'El recibo {pago.numero_recibo} ya está registrado; indique otro número o vuelva a enviar.')
             else:
-                messages.success(request, 'Pago registrado exitosamente.')
-            return redirect('detalle_pago', pago_uuid=pago.uuid)
+                # Asociar cuenta bancaria DESPUÉS del save (necesita pk)
+                _guardar_cuenta_bancaria_si_nueva(request, pago)
+                pago.save(update_fields=['cuenta_bancaria'])
+
+                if pago.numero_recibo:
+                    messages.success(request, f'Pago registrado exitosamente. Recibo No. {pago.numero_recibo}')
+                else:
+                    messages.success(request, 'Pago registrado exitosamente.')
+                return redirect('detalle_pago', pago_uuid=pago.uuid)
     else:
         form = PagoForm()
 
@@ -592,8 +719,58 @@ def registrar_pago(request):
         'form':              form,
         'titulo':            'Registrar Pago',
         'boton':             'Registrar',
-        'carreras_data':     _carreras_data_json(),
-        'cuentas_bancarias': _cuentas_data_json(),
+        'referencias_huella': referencias.script_pago()['huella'],
+    })
+
+
+@login_required
+def registrar_pagos_lote(request):
+    """
+    Carga de muchos recibos en un solo envío (inicio de mes). Las filas se
+    validan juntas (ver PagoLoteFormSet) y se insertan con bulk_create en una
+    transacción; resumen diario, cubo, puntos y búsqueda se actualizan por lote.
+    """
+    hoy = timezone.now().date()
+    if request.user.is_staff:
+        sede = Sede.objects.filter(pk=request.POST.get('sede') or request.GET.get('sede')).first()
+    else:
+        sede = getattr(getattr(request.user, 'perfil', None), 'sede', None)
+    fecha = parse_date(request.POST.get('fecha') or '') or hoy
+
+    if request.method == 'POST':
+        formset = PagoLoteFormSet(request.POST, sede=sede, fecha=fecha, usuario=request.user)
+        if formset.is_valid():
+            # Las filas sin número toman un bloque de la secuencia de la sede (una sola asignación)
+            sin_numero = [p for p in formset.pagos if not p.numero_recibo]
+            secuencia = SecuenciaRecibo.para_sede(sede.pk) if sin_numero else None
+            if secuencia:
+                for pago, numero in zip(sin_numero, secuencia.reservar(len(sin_numero))):
+                    pago.numero_recibo = numero
+            try:
+                with transaction.atomic():
+                    Pago.objects.bulk_create(formset.pagos, batch_size=500)
+                    pagos_creados_en_lote(formset.pagos)
+            except IntegrityError:
+                # Otro usuario registró uno de los recibos entre la validación y el guardado
+                for pago in sin_numero:
+                    pago.numero_recibo = None
+                formset.non_form_errors().append(
+                    'Uno de los números de recibo se registró mientras se cargaba el lote. Revise los números y vuelva a enviar.'
+                )
+            else:
+                messages.success(request, f'{len(formset.pagos)} pagos registrados.')
+                return redirect('lista_pagos')
+    else:
+        formset = PagoLoteFormSet(sede=sede, fecha=fecha)
+
+    return render(request, 'pagos/lotePagos.html', {
+        'formset':  formset,
+        'sede':     sede,
+        'fecha':    fecha.strftime('%Y-%m-%d'),
+        'sedes':    referencias.sedes(activas=True) if request.user.is_staff else [],
+        'carreras': referencias.carreras(activas=True),
+        'cuentas':  referencias.cuentas(),
+        'metodos':  Pago.METODO_PAGO_CHOICES,
     })
 
 
@@ -649,8 +826,7 @@ def editar_pago(request, pago_uuid):
         'pago':                   pago,
         'titulo':                 'Editar Pago',
         'boton':                  'Actualizar',
-        'carreras_data':          _carreras_data_json(),
-        'cuentas_bancarias':      _cuentas_data_json(),
+        'referencias_huella':     referencias.script_pago()['huella'],
         'cuenta_bancaria_actual': pago.cuenta_bancaria_id,
     })
 
@@ -663,7 +839,11 @@ def eliminar_pago(request, pago_uuid):
     if request.method == 'POST':
         if request.user.is_staff:
             numero_recibo = pago.numero_recibo
-            pago.delete()
+            try:
+                pago.delete()
+            except ValidationError as e:
+                messages.error(request, e.messages[0])
+                return redirect('detalle_pago', pago_uuid=pago.uuid)
             if numero_recibo:
                 messages.success(request, f'Pago con recibo No. {numero_recibo} eliminado exitosamente.')
             else:
@@ -710,7 +890,7 @@ def lista_funcionarios(request):
     context = {
         'funcionarios':        funcionarios,
         'total_funcionarios':  funcionarios.count(),
-        'sedes':               Sede.objects.all(),
+        'sedes':               referencias.sedes(),
         'cargos':              Funcionario.CARGO_CHOICES,
 
         'total_docencia':      todos.filter(cargo='DOCENCIA').count(),
@@ -772,7 +952,7 @@ def detalle_funcionario(request, funcionario_id):
     mes   = int(request.GET.get('mes',  hoy.month))
 
     asistencias_mes = funcionario.asistencias.filter(
-        fecha__year=anio, fecha__month=mes
+        fecha__range=rango_mes(anio, mes)
     ).order_by('-fecha')
 
     # ── Totales del mes seleccionado ──────────────────────────────────
@@ -833,8 +1013,12 @@ def editar_funcionario(request, funcionario_id):
 @admin_required
 def lista_sedes(request):
     hoy   = timezone.now().date()
-    sedes = Sede.objects.filter(activa=True)
-    sedes_data = [{'sede': s, 'ingresos_hoy': s.rendicion_dia(hoy)['total_ingresos']} for s in sedes]
+    sedes = list(Sede.objects.filter(activa=True))
+    rendiciones = rendicion_sedes(hoy, sedes)
+    sedes_data = [
+        {'sede': s, 'rendicion': rendiciones[s.id], 'ingresos_hoy': rendiciones[s.id]['total_ingresos']}
+        for s in sedes
+    ]
     return render(request, 'sedes/listaSedes.html', {'sedes_data': sedes_data, 'fecha': hoy})
 
 @login_required
@@ -846,7 +1030,7 @@ def rendicion_sede(request, sede_id):
     rendicion = sede.rendicion_dia(fecha)
     return render(request, 'sedes/rendicionSedes.html', {
         'sede': sede, 'fecha': fecha, 'rendicion': rendicion,
-        'pagos': rendicion['pagos'].select_related('alumno'),
+        'pagos': rendicion['pagos'],
     })
 
 
@@ -865,57 +1049,51 @@ def crear_sede(request):
         'form': form, 'titulo': 'Crear Nueva Sede', 'boton': 'Crear Sede',
     })
 
-#  CONTEXT PROCESSOR — notificaciones
+#  NOTIFICACIONES (campana de base.html)
 
-def notifications_processor(request):
-    if not request.user.is_authenticated:
-        return {'examenes_proximos': [], 'total_notificaciones': 0, 'solicitudes_pendientes_count': 0}
+SSE_INTERVALO = 3          # segundos entre consultas de la versión en caché
+SSE_LATIDO = 20            # comentario keep-alive para proxies
+SSE_DURACION = 300         # el navegador reconecta solo (EventSource) al cerrarse
 
-    hoy          = timezone.now().date()
-    en_tres_dias = hoy + timedelta(days=3)
 
-    parciales = Materia.objects.filter(
-        fecha_examen_parcial__gte=hoy, fecha_examen_parcial__lte=en_tres_dias
-    ).select_related('carrera')
-    finales = Materia.objects.filter(
-        fecha_examen_final__gte=hoy, fecha_examen_final__lte=en_tres_dias
-    ).select_related('carrera')
+@login_required
+@require_http_methods(["GET"])
+def api_notificaciones(request):
+    return JsonResponse(para_json(request.user), encoder=DjangoJSONEncoder)
 
-    notificaciones = []
-    for m in parciales:
-        notificaciones.append({
-            'tipo': 'Examen Parcial', 'materia': m.nombre, 'carrera': m.carrera.nombre,
-            'carrera_id': m.carrera.id, 'fecha': m.fecha_examen_parcial,
-            'icon': 'bi-calendar-event', 'color': 'text-primary',
-        })
-    for m in finales:
-        notificaciones.append({
-            'tipo': 'Examen Final', 'materia': m.nombre, 'carrera': m.carrera.nombre,
-            'carrera_id': m.carrera.id, 'fecha': m.fecha_examen_final,
-            'icon': 'bi-calendar-check', 'color': 'text-danger',
-        })
 
-    solicitudes_pendientes_count = 0
-    if request.user.is_staff:
-        solicitudes_objs = SolicitudEliminacion.objects.filter(estado='PENDIENTE').select_related('usuario_solicita')
-        solicitudes_pendientes_count = solicitudes_objs.count()
-        for s in solicitudes_objs:
-            notificaciones.append({
-                'id': f'solicitud_{s.id}', 'tipo': 'Solicitud de Eliminación',
-                'materia': f'Solicitado por {s.usuario_solicita.username}',
-                'carrera': s.get_modelo_display(), 'objeto_id': s.objeto_id,
-                'motivo': s.motivo, 'datos_objeto': s.datos_objeto,
-                'url_procesar': f'/procesar-solicitud-eliminacion/{s.id}/',
-                'fecha': s.fecha_solicitud, 'icon': 'bi-trash', 'color': 'text-warning',
-                'es_solicitud': True, 'solicitud_id': s.id,
-            })
+async def stream_notificaciones(request):
+    """
+    Stream Server-Sent Events: envía las notificaciones al conectar y cada
+    vez que cambian (nueva solicitud de eliminación, examen modificado).
+    Necesita servirse por ASGI (syscep/asgi.py); bajo WSGI responde 204 y el
+    navegador usa api_notificaciones.
+    """
+    usuario = await request.auser()
+    if not usuario.is_authenticated:
+        return HttpResponse(status=401)
+    if not isinstance(request, ASGIRequest):
+        return HttpResponse(status=204)
+
+    async def eventos():
+        yield f'retry: {SSE_INTERVALO * 1000}\n\n'
+        enviada, inicio, ultimo = None, time.monotonic(), time.monotonic()
+        while time.monotonic() - inicio < SSE_DURACION:
+            version = await aversion()
+            if version != enviada:
+                datos = await sync_to_async(para_json)(usuario)
+                yield f'event: notificaciones\ndata: {json.dumps(datos, cls=DjangoJSONEncoder)}\n\n'
+                enviada, ultimo = version, time.monotonic()
+            elif time.monotonic() - ultimo >= SSE_LATIDO:
+                yield ': ping\n\n'
+                ultimo = time.monotonic()
+            await asyncio.sleep(SSE_INTERVALO)
+
+    respuesta = StreamingHttpResponse(eventos(), content_type='text/event-stream')
+    respuesta['Cache-Control'] = 'no-cache'
+    respuesta['X-Accel-Buffering'] = 'no'
+    return respuesta
 
-    notificaciones.sort(key=lambda x: x['fecha'].date() if isinstance(x['fecha'], datetime) else x['fecha'])
-    return {
-        'examenes_proximos':            notificaciones,
-        'total_notificaciones':         len(notificaciones),
-        'solicitudes_pendientes_count': solicitudes_pendientes_count,
-    }
 
 #  CARRERAS
 
@@ -923,7 +1101,7 @@ def notifications_processor(request):
 def lista_carreras(request):
     carreras      = Carrera.objects.filter(activa=True).prefetch_related('materias', 'alumnos')
     total_materias= sum(c.materias.count() for c in carreras)
-    total_docentes= Funcionario.objects.filter(cargo='DOCENCIA', activo=True).count()
+    total_docentes= len(referencias.docentes())
     return render(request, 'carreras/listaCarreras.html', {
         'carreras': carreras, 'total_materias': total_materias, 'total_docentes': total_docentes,
     })
@@ -935,7 +1113,7 @@ def detalle_carrera(request, carrera_id):
     return render(request, 'carreras/detalleCarrera.html', {
         'carrera':  carrera,
         'materias': carrera.materias.all().select_related('docente'),
-        'docentes': Funcionario.objects.filter(cargo='DOCENCIA', activo=True),
+        'docentes': referencias.docentes(),
     })
 
 
@@ -1007,7 +1185,7 @@ def asignar_docente(request, materia_id):
         return redirect('detalle_carrera', carrera_id=materia.carrera.id)
     return render(request, 'carreras/asignarDocente.html', {
         'materia': materia,
-        'docentes': Funcionario.objects.filter(cargo='DOCENCIA', activo=True),
+        'docentes': referencias.docentes(),
         'carrera': materia.carrera,
     })
 
@@ -1203,113 +1381,82 @@ def configuracion(request):
 def lista_caja(request):
     hoy = timezone.now().date()
 
-    # Filtros
-    sede_id = request.GET.get('sede')
-    fecha_desde = request.GET.get('fecha_desde')
-    fecha_hasta = request.GET.get('fecha_hasta')
-    recibo = request.GET.get('recibo')
-    cliente = request.GET.get('cliente')
-
-    # Base querysets
-    ingresos = Pago.objects.all().select_related('alumno', 'sede', 'carrera').order_by('-fecha', '-id')
-    egresos = Egreso.objects.all().select_related('sede').order_by('-fecha', '-id')
-
-    # Calcular totales del DÍA DE HOY
-    ingresos_hoy = ingresos.filter(fecha=hoy)
-    egresos_hoy = egresos.filter(fecha=hoy)
-
-    total_ingresos_hoy = ingresos_hoy.aggregate(Sum('importe_total'))['importe_total__sum'] or 0
-    total_egresos_hoy = egresos_hoy.aggregate(Sum('monto'))['monto__sum'] or 0
-    balance_hoy = total_ingresos_hoy - total_egresos_hoy
-
-    # Aplicar filtros (para las tablas)
-    if sede_id:
-        ingresos = ingresos.filter(sede_id=sede_id)
-        egresos = egresos.filter(sede_id=sede_id)
-
-    if fecha_desde:
-        ingresos = ingresos.filter(fecha__gte=fecha_desde)
-        egresos = egresos.filter(fecha__gte=fecha_desde)
-
-    if fecha_hasta:
-        ingresos = ingresos.filter(fecha__lte=fecha_hasta)
-        egresos = egresos.filter(fecha__lte=fecha_hasta)
-
-    if recibo:
-        ingresos = ingresos.filter(numero_recibo__icontains=recibo)
-        egresos = egresos.filter(numero_comprobante__icontains=recibo)
-
-    if cliente:
-        ingresos = ingresos.filter(
-            Q(alumno__nombre__icontains=cliente) |
-            Q(alumno__apellido__icontains=cliente) |
-            Q(nombre_cliente__icontains=cliente)
-        )
-        egresos = egresos.filter(concepto__icontains=cliente)
-
-    # Calcular totales generales (con filtros aplicados)
-    total_ingresos = ingresos.aggregate(Sum('importe_total'))['importe_total__sum'] or 0
-    total_egresos = egresos.aggregate(Sum('monto'))['monto__sum'] or 0
-    balance = total_ingresos - total_egresos
-
-    # Limitar resultados
-    ingresos = ingresos[:50]
-    egresos = egresos[:50]
+    # La caja muestra los movimientos del día; los listados completos con
+    # filtros son lista_pagos y lista_egresos (con scroll infinito)
+    ingresos_hoy = Pago.objects.filter(fecha=hoy).select_related('alumno', 'sede', 'carrera').order_by('-fecha', '-id')
+    egresos_hoy = Egreso.objects.filter(fecha=hoy).select_related('sede').order_by('-fecha', '-id')
 
-    sedes = Sede.objects.all().order_by('nombre')
-
-    # Formatear fecha para mostrar
-    fecha_hoy_formateada = hoy.strftime("%d/%m/%Y")
-    fecha_hoy_param = hoy.strftime("%Y-%m-%d")
+    resumen_hoy = ResumenDiario.objects.filter(fecha=hoy).totales()
 
     context = {
-        'ingresos': ingresos,
-        'egresos': egresos,
         'ingresos_hoy': ingresos_hoy,
         'egresos_hoy': egresos_hoy,
-        'total_ingresos': total_ingresos,
-        'total_egresos': total_egresos,
-        'balance': balance,
-        'total_ingresos_hoy': total_ingresos_hoy,
-        'total_egresos_hoy': total_egresos_hoy,
-        'balance_hoy': balance_hoy,
-        'fecha_hoy': fecha_hoy_formateada,
-        'fecha_hoy_param': fecha_hoy_param,
-        'sedes': sedes,
-        'filtros': {
-            'sede': sede_id,
-            'fecha_desde': fecha_desde,
-            'fecha_hasta': fecha_hasta,
-            'recibo': recibo,
-            'cliente': cliente,
-        }
+        'total_ingresos_hoy': resumen_hoy['total_ingresos'],
+        'total_egresos_hoy': resumen_hoy['total_egresos'],
+        'balance_hoy': resumen_hoy['balance'],
+        'fecha_hoy': hoy.strftime("%d/%m/%Y"),
+        'fecha_hoy_param': hoy.strftime("%Y-%m-%d"),
     }
 
     return render(request, 'caja/listaCaja.html', context)
 
+def _egresos_filtrados(request):
+    """Egresos según los filtros de lista_egresos (también los usa la exportación)."""
+    egresos    = Egreso.objects.all().order_by(*_orden_listado(request))
+    categoria  = request.GET.get('categoria')
+    sede_id, desde, hasta, sin_sede = _alcance_listado(request)
+
+    if sin_sede:
+        return egresos.none()
+    egresos = egresos.filter(filtro_rango(desde, hasta, sede_id))
+    if categoria:   egresos = egresos.filter(categoria=categoria)
+    return egresos
+
+
 @login_required
 def lista_egresos(request):
-    egresos    = Egreso.objects.all().select_related('sede', 'usuario_registro').order_by('-fecha', '-id')
+    egresos    = _egresos_filtrados(request).select_related('sede', 'usuario_registro')
     sede_id    = request.GET.get('sede')
     categoria  = request.GET.get('categoria')
     fecha_desde= request.GET.get('fecha_desde')
     fecha_hasta= request.GET.get('fecha_hasta')
 
-    if sede_id:     egresos = egresos.filter(sede_id=sede_id)
-    if categoria:   egresos = egresos.filter(categoria=categoria)
-    if fecha_desde: egresos = egresos.filter(fecha__gte=fecha_desde)
-    if fecha_hasta: egresos = egresos.filter(fecha__lte=fecha_hasta)
+    # Sin filtro de categoría, el total sale de los cierres y del resumen diario
+    sede_validada, desde, hasta, sin_sede = _alcance_listado(request)
+    if sin_sede:
+        total_egresos = 0
+    elif categoria:
+        total_egresos = egresos.aggregate(Sum('monto'))['monto__sum'] or 0
+    else:
+        total_egresos = totales_periodo(desde, hasta, sede_validada)['total_egresos']
 
-    total_egresos = egresos.aggregate(Sum('monto'))['monto__sum'] or 0
+    # Solo la primera página; el resto llega de api_egresos con scroll infinito
+    egresos, cursor_siguiente = _primera_pagina(egresos, request)
     return render(request, 'caja/listaEgresos.html', {
-        'egresos':        egresos[:100],
-        'total_egresos':  total_egresos,
-        'sedes':          Sede.objects.all().order_by('nombre'),
+        'egresos':          egresos,
+        'cursor_siguiente': cursor_siguiente,
+        'filtros_qs':       _filtros_sin_cursor(request),
+        'total_egresos':    total_egresos,
+        'sedes':          referencias.sedes(),
         'categorias':     Egreso.CATEGORIA_CHOICES,
         'filtros': {'sede': sede_id, 'categoria': categoria, 'fecha_desde': fecha_desde, 'fecha_hasta': fecha_hasta},
     })
 
 
+@login_required
+def api_egresos(request):
+    """Egresos en JSON con los filtros de lista_egresos, por páginas de cursor sobre (fecha, id)."""
+    egresos = _egresos_filtrados(request).select_related('sede')
+    return respuesta_pagina(request, egresos, _orden_listado(request), CAMPOS_EGRESO, 'caja/filaEgreso.html', 'egreso')
+
+
+@login_required
+def exportar_egresos(request):
+    """CSV con todos los egresos que cumplen los filtros de lista_egresos, sin límite de filas."""
+    nombre = f"egresos_{timezone.now():%Y%m%d_%H%M}.csv"
+    return respuesta_csv(nombre, ENCABEZADOS_EGRESOS, filas_egresos(_egresos_filtrados(request)))
+
+
 @login_required
 def registrar_egreso(request):
     if request.method == 'POST':
@@ -1359,7 +1506,11 @@ def eliminar_egreso(request, egreso_uuid):
     if request.method == 'POST':
         if request.user.is_staff:
             comp = egreso.numero_comprobante
-            egreso.delete()
+            try:
+                egreso.delete()
+            except ValidationError as e:
+                messages.error(request, e.messages[0])
+                return redirect('detalle_egreso', egreso_uuid=egreso.uuid)
             if comp:
                 messages.success(request, f'Egreso con comprobante N° {comp} eliminado exitosamente.')
             else:
@@ -1377,30 +1528,15 @@ def eliminar_egreso(request, egreso_uuid):
             return redirect('detalle_egreso', egreso_uuid=egreso.uuid)
     return redirect('lista_egresos')
 
-@login_required
-def informe_caja(request):
-    es_admin = request.user.is_staff
-
-    sede_usuario = None
-    if not es_admin:
-        try:
-            sede_usuario = request.user.perfil.sede
-        except Exception:
-            sede_usuario = None
-
-        if sede_usuario is None:
-            messages.error(
-                request,
-                'Tu usuario no tiene una sede asignada. '
-                'Contactá al administrador para que te asigne una.'
-            )
-            return redirect('lista_caja')
-
+def _alcance_informe_caja(request):
+    """
+    Sede y período del informe de caja. El admin elige sede y rango (por
+    defecto, el mes actual); el resto ve su propia sede en un solo día.
+    Devuelve (sede, fecha_desde, fecha_hasta), o None si el usuario no tiene sede.
+    """
     hoy = timezone.now().date()
-    # Para el cierre de caja necesitamos aware datetime
-    ahora = timezone.now()
 
-    if es_admin:
+    if request.user.is_staff:
         fecha_desde_str = request.GET.get('fecha_desde')
         fecha_hasta_str = request.GET.get('fecha_hasta')
         if fecha_desde_str and fecha_hasta_str:
@@ -1416,50 +1552,67 @@ def informe_caja(request):
 
         sede_id  = request.GET.get('sede')
         sede_obj = get_object_or_404(Sede, id=sede_id) if sede_id else None
+        return sede_obj, fecha_desde, fecha_hasta
 
-        # Para admin, mostramos todo por defecto, o filtramos por fecha
-        ingresos = Pago.objects.filter(fecha__gte=fecha_desde, fecha__lte=fecha_hasta)
-        egresos  = Egreso.objects.filter(fecha__gte=fecha_desde, fecha__lte=fecha_hasta)
-        if sede_obj:
-            ingresos = ingresos.filter(sede=sede_obj)
-            egresos  = egresos.filter(sede=sede_obj)
+    try:
+        sede_usuario = request.user.perfil.sede
+    except Exception:
+        sede_usuario = None
+    if sede_usuario is None:
+        return None
 
+    fecha_seleccionada_str = request.GET.get('fecha')
+    if fecha_seleccionada_str:
+        try:
+            fecha_seleccionada = datetime.strptime(fecha_seleccionada_str, '%Y-%m-%d').date()
+        except (ValueError, TypeError):
+            fecha_seleccionada = hoy
     else:
-        # Lógica de cierre de caja para funcionarios (solo un día)
-        sede_obj = sede_usuario
+        fecha_seleccionada = hoy
+    return sede_usuario, fecha_seleccionada, fecha_seleccionada
 
-        fecha_seleccionada_str = request.GET.get('fecha')
-        if fecha_seleccionada_str:
-            try:
-                fecha_seleccionada = datetime.strptime(fecha_seleccionada_str, '%Y-%m-%d').date()
-            except (ValueError, TypeError):
-                fecha_seleccionada = hoy
-        else:
-            fecha_seleccionada = hoy
 
-        fecha_desde = fecha_seleccionada
-        fecha_hasta = fecha_seleccionada
-
-        # Para funcionarios, filtramos por la fecha seleccionada
-        ingresos = Pago.objects.filter(sede=sede_obj, fecha=fecha_seleccionada)
-        egresos  = Egreso.objects.filter(sede=sede_obj, fecha=fecha_seleccionada)
-
-        # ACCIÓN: Cerrar Caja (Se mantiene como hito de control, aunque el informe sea diario)
-        if request.method == 'POST' and 'cerrar_caja' in request.POST:
-            total_ing = ingresos.aggregate(Sum('importe_total'))['importe_total__sum'] or 0
-            total_egr = egresos.aggregate(Sum('monto'))['monto__sum'] or 0
-            balance_cierre = total_ing - total_egr
-
-            CierreCaja.objects.create(
-                sede=sede_obj,
-                usuario=request.user,
-                fecha_cierre=ahora,
-                total_ingresos=total_ing,
-                total_egresos=total_egr,
-                balance=balance_cierre
-            )
+def _movimientos_informe_caja(sede_obj, fecha_desde, fecha_hasta):
+    """Querysets de ingresos y egresos del alcance del informe."""
+    ingresos = Pago.objects.filter(fecha__gte=fecha_desde, fecha__lte=fecha_hasta)
+    egresos  = Egreso.objects.filter(fecha__gte=fecha_desde, fecha__lte=fecha_hasta)
+    if sede_obj:
+        ingresos = ingresos.filter(sede=sede_obj)
+        egresos  = egresos.filter(sede=sede_obj)
+    return ingresos, egresos
+
+
+@login_required
+def informe_caja(request):
+    es_admin = request.user.is_staff
+
+    alcance = _alcance_informe_caja(request)
+    if alcance is None:
+        messages.error(
+            request,
+            'Tu usuario no tiene una sede asignada. '
+            'Contactá al administrador para que te asigne una.'
+        )
+        return redirect('lista_caja')
+    sede_obj, fecha_desde, fecha_hasta = alcance
+
+    # Para el cierre de caja necesitamos aware datetime
+    ahora = timezone.now()
+
+    ingresos, egresos = _movimientos_informe_caja(sede_obj, fecha_desde, fecha_hasta)
+
+    # ACCIÓN: Cerrar Caja (Se mantiene como hito de control, aunque el informe sea diario)
+    if not es_admin and request.method == 'POST' and 'cerrar_caja' in request.POST:
+        cierre = CierreCaja.cerrar(sede_obj, request.user, fecha_desde, fecha_hasta)
+        if cierre.fecha_desde:
             messages.success(request, f'Caja de la sede {sede_obj.nombre} cerrada exitosamente.')
-            return redirect('informe_caja')
+        else:
+            messages.success(
+                request,
+                f'Cierre de la sede {sede_obj.nombre} registrado. El día en curso sigue abierto a '
+                f'movimientos; queda bloqueado al cerrarlo una vez terminado.'
+            )
+        return redirect('informe_caja')
 
     # ── Ordenamiento por número de recibo respetando fechas descendentes ────────
     sort_recibo = request.GET.get('sort_recibo', '')
@@ -1475,22 +1628,23 @@ def informe_caja(request):
 
     egresos = egresos.select_related('sede', 'usuario_registro').order_by('-fecha')
 
-    # ── Totales generales ──────────────────────────────────────────────────────
-    total_ingresos = ingresos.aggregate(Sum('importe_total'))['importe_total__sum'] or 0
-    total_egresos  = egresos.aggregate(Sum('monto'))['monto__sum'] or 0
-
-    # ── Totales por forma de cobro ─────────────────────────────────────────────
-    total_efectivo = ingresos.aggregate(t=Sum('monto_efectivo'))['t'] or 0
-    total_deposito = ingresos.aggregate(t=Sum('monto_deposito'))['t'] or 0
-
-    balance = total_ingresos - total_egresos
-
-    # Agrupar egresos por categoría
-    egresos_por_categoria = {}
-    for e in egresos:
-        cat = e.get_categoria_display()
-        egresos_por_categoria[cat] = egresos_por_categoria.get(cat, 0) + e.monto
+    # ── Totales generales y por forma de cobro: cierres vigentes + días sin cerrar ──
+    totales = totales_periodo(fecha_desde, fecha_hasta, sede_obj.id if sede_obj else None)
+    total_ingresos = totales['total_ingresos']
+    total_egresos  = totales['total_egresos']
+    total_efectivo = totales['total_efectivo']
+    total_deposito = totales['total_deposito']
+    balance        = totales['balance']
+
+    # Egresos por categoría con un único GROUP BY
+    nombres_categoria = dict(Egreso.CATEGORIA_CHOICES)
+    egresos_por_categoria = {
+        nombres_categoria.get(categoria, categoria): total
+        for categoria, total in egresos.order_by('categoria').values('categoria')
+                                       .annotate(total=Sum('monto')).values_list('categoria', 'total')
+    }
 
+    # Las filas se cargan una sola vez, al renderizar la plantilla
     context = {
         'ingresos':              ingresos,
         'egresos':               egresos,
@@ -1501,9 +1655,10 @@ def informe_caja(request):
         'total_efectivo':        total_efectivo,
         'total_deposito':        total_deposito,
         'balance':               balance,
+        'saldo_acumulado':       saldo_acumulado(sede_obj.id, fecha_hasta) if sede_obj else None,
         'sede':                  sede_obj,
         'egresos_por_categoria': egresos_por_categoria,
-        'sedes':                 Sede.objects.all().order_by('nombre'),
+        'sedes':                 referencias.sedes(),
         'es_admin':              es_admin,
         'sede_forzada':          None if es_admin else sede_obj,
         'fecha_emision':         ahora,
@@ -1515,6 +1670,134 @@ def informe_caja(request):
     return render(request, 'caja/informeCaja.html', context)
 
 
+@login_required
+def exportar_informe_caja(request):
+    """CSV de ingresos y egresos con la misma sede y período que informe_caja."""
+    alcance = _alcance_informe_caja(request)
+    if alcance is None:
+        messages.error(request, 'Tu usuario no tiene una sede asignada. Contactá al administrador para que te asigne una.')
+        return redirect('lista_caja')
+    sede_obj, fecha_desde, fecha_hasta = alcance
+
+    ingresos, egresos = _movimientos_informe_caja(sede_obj, fecha_desde, fecha_hasta)
+    nombre = f"caja_{fecha_desde:%Y%m%d}_{fecha_hasta:%Y%m%d}.csv"
+    return respuesta_csv(
+        nombre, ENCABEZADOS_CAJA,
+        filas_caja(ingresos.order_by('fecha', 'id'), egresos.order_by('fecha', 'id')),
+    )
+
+
+@login_required
+@admin_required
+def cubo_caja(request):
+    """Tabla dinámica sobre el cubo mensual de ingresos o egresos."""
+    hoy = timezone.now().date()
+    nombre_cubo = request.GET.get('cubo') if request.GET.get('cubo') in CUBOS else 'ingresos'
+    cubo = CUBOS[nombre_cubo]
+
+    filas = request.GET.get('filas')
+    if filas not in cubo.dimensiones:
+        filas = 'sede'
+    columnas = request.GET.get('columnas')
+    if columnas == '-' or columnas == filas:
+        columnas = None
+    elif columnas not in cubo.dimensiones:
+        columnas = 'anio' if filas != 'anio' else None
+    medida = request.GET.get('medida')
+    if medida not in cubo.medidas:
+        medida = next(iter(cubo.medidas))
+
+    anio_desde = min(_entero_get(request, 'anio_desde') or hoy.year - 2, MAXYEAR)
+    anio_hasta = min(_entero_get(request, 'anio_hasta') or hoy.year, MAXYEAR)
+    sede_id = _entero_get(request, 'sede')
+
+    tabla = pivotar(
+        nombre_cubo, filas, columnas, medida,
+        desde=date(anio_desde, 1, 1), hasta=date(anio_hasta, 12, 1), sede=sede_id,
+    )
+    return render(request, 'caja/cuboCaja.html', {
+        'tabla':       tabla,
+        'cubos':       [(clave, c.titulo) for clave, c in CUBOS.items()],
+        'cubo':        nombre_cubo,
+        'dimensiones': [(d, NOMBRES_DIMENSION[d]) for d in cubo.dimensiones],
+        'medidas':     list(cubo.medidas.items()),
+        'filas':       filas,
+        'columnas':    columnas or '',
+        'medida':      medida,
+        'es_cantidad': medida == 'cantidad',
+        'anio_desde':  anio_desde,
+        'anio_hasta':  anio_hasta,
+        'sede_id':     sede_id,
+        'sedes':       referencias.sedes(),
+    })
+
+
+@login_required
+@admin_required
+def conciliacion_bancaria(request):
+    """Extractos importados y formulario para importar uno nuevo (CSV)."""
+    if request.method == 'POST':
+        cuenta = CuentaBancaria.objects.filter(pk=request.POST.get('cuenta')).first()
+        archivo = request.FILES.get('archivo')
+        if not cuenta or not archivo:
+            messages.error(request, 'Seleccione la cuenta y el archivo del extracto.')
+            return redirect('conciliacion_bancaria')
+        try:
+            extracto = importar_extracto(cuenta, archivo, usuario=request.user)
+        except ValueError as e:
+            messages.error(request, f'No se pudo importar el extracto: {e}')
+            return redirect('conciliacion_bancaria')
+        messages.success(
+            request,
+            f'Extracto importado: {extracto.cantidad_movimientos} créditos, '
+            f'{extracto.cantidad_conciliados} conciliados automáticamente.',
+        )
+        return redirect('detalle_extracto', pk=extracto.pk)
+
+    return render(request, 'caja/conciliacionBancaria.html', {
+        'extractos': ExtractoBancario.objects.select_related('cuenta', 'usuario')[:100],
+        'cuentas':   referencias.cuentas(),
+    })
+
+
+@login_required
+@admin_required
+def detalle_extracto(request, pk):
+    """Revisión de un extracto: movimientos por estado y conciliación manual por Nº de recibo."""
+    extracto = get_object_or_404(ExtractoBancario.objects.select_related('cuenta'), pk=pk)
+
+    if request.method == 'POST':
+        movimiento = get_object_or_404(MovimientoBancario, pk=request.POST.get('movimiento'), extracto=extracto)
+        pago = Pago.objects.filter(numero_recibo=request.POST.get('numero_recibo', '').strip()).first()
+        if not pago:
+            messages.error(request, 'No existe un pago con ese número de recibo.')
+        else:
+            try:
+                conciliar_manual(movimiento, pago, usuario=request.user)
+                messages.success(request, f'Línea {movimiento.linea} conciliada con el recibo {pago.numero_recibo}.')
+            except ValueError as e:
+                messages.error(request, str(e))
+        estado = request.POST.get('estado', '')
+        if estado in dict(MovimientoBancario.ESTADO_CHOICES):
+            return redirect(f"{request.path}?{urlencode({'estado': estado})}")
+        return redirect(request.path)
+
+    estado = request.GET.get('estado', '')
+    movimientos = extracto.movimientos.select_related('pago', 'pago__alumno').order_by('linea')
+    if estado in dict(MovimientoBancario.ESTADO_CHOICES):
+        movimientos = movimientos.filter(estado=estado)
+    else:
+        estado = ''
+    por_estado = dict(extracto.movimientos.order_by().values_list('estado').annotate(Count('id')))
+
+    return render(request, 'caja/detalleExtracto.html', {
+        'extracto':    extracto,
+        'movimientos': movimientos,
+        'estado':      estado,
+        'estados':     [(clave, nombre, por_estado.get(clave, 0)) for clave, nombre in MovimientoBancario.ESTADO_CHOICES],
+    })
+
+
 #SOLICITUDES DE ELIMINACIÓN
 
 @login_required
@@ -1546,8 +1829,13 @@ def procesar_solicitud_eliminacion(request, solicitud_id):
                     'CARRERA': Carrera, 'MATERIA': Materia,
                     'FUNCIONARIO': Funcionario, 'SEDE': Sede,
                 }
-                modelo_map[solicitud.modelo].objects.get(id=solicitud.objeto_id).delete()
+                with transaction.atomic():
+                    modelo_map[solicitud.modelo].objects.get(id=solicitud.objeto_id).delete()
                 messages.success(request, 'Solicitud aprobada y objeto eliminado.')
+            except ValidationError as e:
+                # El objeto (o algo que se elimina en cascada) cae en un día de caja cerrada
+                messages.error(request, e.messages[0])
+                solicitud.estado = 'PENDIENTE'
             except Exception as e:
                 messages.error(request, f'Error al eliminar el objeto: {str(e)}')
                 solicitud.estado = 'PENDIENTE'
@@ -1564,62 +1852,38 @@ def ficha_alumno(request, alumno_uuid):
     Genera la ficha personal díptico del alumno.
     Calcula las 12 cuotas a partir de fecha_inicio y cruza con pagos reales.
     """
-    alumno = get_object_or_404(Alumno, uuid=alumno_uuid)
+    alumno = get_object_or_404(Alumno.objects.select_related('sede', 'carrera'), uuid=alumno_uuid)
 
-    cuotas = []
-
-    if alumno.fecha_inicio:
-        pagos_alumno = alumno.pagos.filter(
-            es_matricula=False
-        ).exclude(fecha_vencimiento__isnull=True).order_by('fecha_vencimiento')
-
-        for i in range(1, 13):
-            vencimiento = alumno.fecha_inicio + relativedelta(months=i)
-
-            rango_2_desde = vencimiento - timedelta(days=29)
-            rango_2_hasta = vencimiento - timedelta(days=3)
-            rango_1_desde = vencimiento - timedelta(days=2)
-            rango_1_hasta = vencimiento + timedelta(days=5)
-
-            ventana_desde = vencimiento - timedelta(days=15)
-            ventana_hasta = vencimiento + timedelta(days=15)
-
-            pago_cuota = pagos_alumno.filter(
-                fecha_vencimiento__gte=ventana_desde,
-                fecha_vencimiento__lte=ventana_hasta,
-            ).first()
-
-            if not pago_cuota:
-                pago_cuota = pagos_alumno.filter(
-                    numero_cuota__contains=str(i)
-                ).first()
-
-            cuotas.append({
-                'numero':        i,
-                'vencimiento':   vencimiento,
-                'pago':          pago_cuota,
-                'recibo':        pago_cuota.numero_recibo if pago_cuota else None,
-                'fecha_pago':    pago_cuota.fecha         if pago_cuota else None,
-                'puntaje':       pago_cuota.puntos        if pago_cuota else None,
-                'rango_2_desde': rango_2_desde,
-                'rango_2_hasta': rango_2_hasta,
-                'rango_1_desde': rango_1_desde,
-                'rango_1_hasta': rango_1_hasta,
-            })
+    pagos_alumno = list(pagos_ficha([alumno.id])) if alumno.fecha_inicio else []
+    return render(request, 'alumnos/fichaAlumno.html', contexto_ficha(alumno, pagos_alumno))
 
-    cuotas_izq = cuotas[:6]
-    cuotas_der = cuotas[6:]
-    anio = alumno.fecha_inicio.year if alumno.fecha_inicio else timezone.now().year
-
-    return render(request, 'alumnos/fichaAlumno.html', {
-        'alumno':         alumno,
-        'cuotas':         cuotas,
-        'cuotas_izq':     cuotas_izq,
-        'cuotas_der':     cuotas_der,
-        'anio':           anio,
-        'anio_siguiente': anio + 1,
-        'tiene_inicio':   bool(alumno.fecha_inicio),
-    })
+
+@login_required
+def fichas_lote(request):
+    """
+    Fichas díptico de todos los alumnos activos de una sede, carrera y/o curso
+    en un único documento imprimible. La respuesta se envía por partes a
+    medida que se renderiza cada ficha.
+    """
+    sede_id = _entero_get(request, 'sede')
+    carrera_id = _entero_get(request, 'carrera')
+    curso = _entero_get(request, 'curso')
+
+    if not request.user.is_staff:
+        user_sede = getattr(getattr(request.user, 'perfil', None), 'sede', None)
+        if not user_sede:
+            messages.warning(request, 'Tu usuario no tiene una sede asignada. Contacta al administrador.')
+            return redirect('lista_alumnos')
+        sede_id = user_sede.id
+
+    if not (sede_id or carrera_id):
+        messages.warning(request, 'Seleccioná una sede o carrera para generar las fichas.')
+        return redirect('lista_alumnos')
+
+    alumnos = alumnos_lote(sede_id=sede_id, carrera_id=carrera_id, curso=curso)
+    respuesta = StreamingHttpResponse(documento_lote(alumnos), content_type='text/html; charset=utf-8')
+    respuesta['X-Accel-Buffering'] = 'no'
+    return respuesta
 
 @login_required
 def editar_datos_ficha(request, alumno_uuid):
@@ -1730,15 +1994,8 @@ def buscar_alumno(request):
             [:30]
         )
     else:
-        alumnos = (
-            Alumno.objects
-            .select_related('sede', 'carrera')
-            .filter(
-                models.Q(nombre__icontains=q) |
-                models.Q(apellido__icontains=q) |
-                models.Q(cedula__icontains=q)
-            )
-            .order_by('-id')[:30]
+        alumnos = filas_por_ids(
+            Alumno.objects.select_related('sede', 'carrera'), buscar_ids('alumno', q, 30),
         )
 
     resultados = [
@@ -1757,13 +2014,11 @@ def buscar_alumno(request):
 
 def buscar_funcionario(request):
     q = request.GET.get('q', '').strip()
-    qs = Funcionario.objects.all()
+    qs = Funcionario.objects.select_related('sede')
     if q:
-        qs = qs.filter(
-            Q(nombre__icontains=q) |
-            Q(apellido__icontains=q) |
-            Q(cedula__icontains=q)
-        )
+        funcionarios = filas_por_ids(qs, buscar_ids('funcionario', q, 20))
+    else:
+        funcionarios = qs[:20]
     resultados = [
         {
             'id': f.id,
@@ -1772,13 +2027,12 @@ def buscar_funcionario(request):
             'sede': f.sede.nombre if f.sede else '',
             'cedula': f.cedula or '',
         }
-        for f in qs[:20]
+        for f in funcionarios
     ]
     return JsonResponse({'resultados': resultados})
 
 @login_required
 def buscar_global(request):
-    from django.db.models import Q
     from django.urls import reverse
     
     q = request.GET.get('q', '').strip()
@@ -1788,11 +2042,7 @@ def buscar_global(request):
     resultados = []
 
     # 1. Alumnos
-    alumnos = Alumno.objects.filter(
-        Q(nombre__icontains=q) |
-        Q(apellido__icontains=q) |
-        Q(cedula__icontains=q)
-    ).select_related('carrera', 'sede')[:5]
+    alumnos = filas_por_ids(Alumno.objects.select_related('carrera', 'sede'), buscar_ids('alumno', q, 5))
 
     for a in alumnos:
         resultados.append({
@@ -1804,12 +2054,7 @@ def buscar_global(request):
         })
 
     # 2. Pagos
-    pagos = Pago.objects.filter(
-        Q(numero_recibo__icontains=q) |
-        Q(nombre_cliente__icontains=q) |
-        Q(alumno__nombre__icontains=q) |
-        Q(alumno__apellido__icontains=q)
-    ).select_related('alumno')[:5]
+    pagos = filas_por_ids(Pago.objects.select_related('alumno'), buscar_ids('pago', q, 5))
 
     for p in pagos:
         resultados.append({
@@ -1821,10 +2066,7 @@ def buscar_global(request):
         })
 
     # 3. Carreras
-    carreras = Carrera.objects.filter(
-        Q(nombre__icontains=q) |
-        Q(descripcion__icontains=q)
-    )[:5]
+    carreras = filas_por_ids(Carrera.objects.all(), buscar_ids('carrera', q, 5))
 
     for c in carreras:
         resultados.append({
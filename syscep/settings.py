@@ -30,6 +30,7 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'sysapp.invalidacion.InvalidacionMiddleware',
 ]
 
 ROOT_URLCONF = 'syscep.urls'
@@ -45,7 +46,6 @@ TEMPLATES = [
                 'django.template.context_processors.request',
                 'django.contrib.auth.context_processors.auth',
                 'django.contrib.messages.context_processors.messages',
-                'sysapp.views.notifications_processor',
             ],
         },
     },
@@ -113,6 +113,20 @@ LOGIN_URL = 'login'
 LOGIN_REDIRECT_URL = 'dashboard'
 LOGOUT_REDIRECT_URL = 'login'
 
+# Índice de búsqueda en memoria: segundos hasta reconstruirlo desde la base
+BUSQUEDA_INDICE_TTL = config('BUSQUEDA_INDICE_TTL', default=300, cast=int)
+# Filas más nuevas que guarda cada índice (~3 KB por fila); las más viejas se buscan en la base
+BUSQUEDA_INDICE_MAX_FILAS = config('BUSQUEDA_INDICE_MAX_FILAS', default=100000, cast=int)
+
+# Notificaciones de la barra superior: segundos que se reutiliza el contenido por rol
+NOTIFICACIONES_CACHE_TTL = config('NOTIFICACIONES_CACHE_TTL', default=60, cast=int)
+
+# Sedes, carreras, cuentas y docentes en caché (versionados por señales): segundos de vida de cada versión
+REFERENCIAS_CACHE_TTL = config('REFERENCIAS_CACHE_TTL', default=86400, cast=int)
+
+# Cada cuántos segundos (como mucho) un worker relee los contadores de invalidación
+INVALIDACION_INTERVALO = config('INVALIDACION_INTERVALO', default=1, cast=int)
+
 SECURE_PROXY_SSL_HEADER = ('HTTP_X_FORWARDED_PROTO', 'https')
 SESSION_COOKIE_SECURE = True
 CSRF_COOKIE_SECURE = True